@@ -1,16 +1,36 @@
+import asyncio
+import multiprocessing
+import time
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
 from datetime import datetime, timedelta, timezone
-from typing import Annotated
+from threading import Lock
+from typing import Annotated, Callable
 
+from cache_helpers import TTLCache
 from db.models.users import User
-from db.repositories.users import find_user_by_email
-from db.session import get_db
+from db.repositories.aio.users import find_user_by_email
+from db.session import get_async_db
 from fastapi import Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
 from jose import JWTError, jwt
+from metrics import Counter, Gauge, Histogram
 from passlib.context import CryptContext
 from pydantic import BaseModel
-from settings import ACCESS_TOKEN_EXPIRE_MINUTES, ALGORITHM, SECRET_KEY
-from sqlalchemy.orm import Session
+from schemas.users import UserDTO
+from settings import (
+    ACCESS_TOKEN_EXPIRE_MINUTES,
+    ADMIN_EMAILS,
+    ALGORITHM,
+    PASSWORD_HASHING_EXECUTOR,
+    PASSWORD_HASHING_POOL_SIZE,
+    PASSWORD_HASHING_QUEUE_LIMIT,
+    PASSWORD_HASHING_START_METHOD,
+    SECRET_KEY,
+    USER_CACHE_MAX_SIZE,
+    USER_CACHE_TTL_SECONDS,
+)
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import AsyncSession
 
 password_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 
@@ -32,6 +52,7 @@ class Token(BaseModel):
 
 class TokenData(BaseModel):
     email: str | None = None
+    id: int | None = None
 
 
 def create_access_token_from_user(user: User):
@@ -62,13 +83,180 @@ def verify_password(plain_password: str, hashed_password: str) -> bool:
     return password_context.verify(plain_password, hashed_password)
 
 
+PASSWORD_HASHING_EXECUTORS = ("process", "thread")
+
+
+class PasswordHashingPoolFull(Exception):
+    pass
+
+
+def _timed_call(function: Callable, *args) -> tuple[float, object]:
+    # the duration in the worker, the clocks of the processes can't be compared
+    start = time.perf_counter()
+    result = function(*args)
+    return time.perf_counter() - start, result
+
+
+class PasswordHashingPool:
+    """
+    Bounded pool running the password hashing and verification (bcrypt is CPU bound)
+    out of the event loop.
+    At most size jobs run at the same time and queue_limit jobs wait for a worker,
+    over that PasswordHashingPoolFull is raised right away.
+    The process workers use start_method (never fork) and are started by start(),
+    with the application. Its metrics are named after name.
+    An unknown executor raises a ValueError when the pool is created (the module
+    pool is created at startup).
+    """
+
+    def __init__(
+        self,
+        executor: str,
+        size: int,
+        queue_limit: int,
+        name: str = "password_hashing",
+        start_method: str = PASSWORD_HASHING_START_METHOD,
+    ):
+        if executor not in PASSWORD_HASHING_EXECUTORS:
+            raise ValueError(
+                f"Unknown password hashing executor {executor!r} "
+                f"(supported: {', '.join(PASSWORD_HASHING_EXECUTORS)})"
+            )
+        self.executor = executor
+        self.size = size
+        self.queue_limit = queue_limit
+        self.start_method = start_method
+        self._executor: Executor | None = None
+        self._jobs = 0
+        self._lock = Lock()
+        self.jobs = Gauge(
+            f"{name}_jobs",
+            "Password hashing jobs running or waiting for a worker",
+            lambda: self._jobs,
+        )
+        self.rejected = Counter(
+            f"{name}_rejected_total",
+            "Password hashing jobs rejected because the pool was full",
+        )
+        self.wait_time = Histogram(
+            f"{name}_wait_seconds",
+            "Time waited by the password hashing jobs for a worker (and sent to it)",
+        )
+        self.duration = Histogram(
+            f"{name}_duration_seconds",
+            "Duration of the password hashing jobs",
+        )
+
+    def _get_executor(self) -> Executor:
+        # created by start() or on first use, not when the module is imported
+        if self._executor is None:
+            if self.executor == "process":
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.size,
+                    mp_context=multiprocessing.get_context(self.start_method),
+                )
+            else:
+                self._executor = ThreadPoolExecutor(
+                    max_workers=self.size, thread_name_prefix="password-hashing"
+                )
+        return self._executor
+
+    def start(self):
+        executor = self._get_executor()
+        # the workers are started on demand, the first logins don't wait for them
+        for _ in range(self.size):
+            executor.submit(int)
+
+    async def run(self, function: Callable, *args):
+        with self._lock:
+            if self._jobs >= self.size + self.queue_limit:
+                self.rejected.inc()
+                raise PasswordHashingPoolFull()
+            self._jobs += 1
+        try:
+            submitted = time.monotonic()
+            duration, result = await asyncio.wrap_future(
+                self._get_executor().submit(_timed_call, function, *args)
+            )
+            # the rest of the time of the job, measured by this process
+            self.wait_time.observe(max(time.monotonic() - submitted - duration, 0))
+            self.duration.observe(duration)
+            return result
+        finally:
+            with self._lock:
+                self._jobs -= 1
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(cancel_futures=True)
+            self._executor = None
+
+
+password_hashing_pool = PasswordHashingPool(
+    PASSWORD_HASHING_EXECUTOR, PASSWORD_HASHING_POOL_SIZE, PASSWORD_HASHING_QUEUE_LIMIT
+)
+
+
+async def verify_password_async(plain_password: str, hashed_password: str) -> bool:
+    return await password_hashing_pool.run(
+        verify_password, plain_password, hashed_password
+    )
+
+
 # user helpers
 
+# user id -> identity of the user (UserDTO), filled by get_current_user
+authenticated_users_cache = TTLCache(
+    "authenticated_users", USER_CACHE_MAX_SIZE, USER_CACHE_TTL_SECONDS
+)
+
+
+# email -> lookup of the user by a request, the concurrent requests of the user
+# missing from the cache wait for it instead of each querying the database
+user_lookups: dict[str, asyncio.Future] = {}
+
+
+async def _find_identity(db: AsyncSession, email: str) -> UserDTO | None:
+    lookup = user_lookups.get(email)
+    if lookup is not None:
+        await asyncio.wait([lookup])
+        # done again by this request if the first one failed or was cancelled
+        if not lookup.cancelled():
+            return lookup.result()
+    lookup = asyncio.get_running_loop().create_future()
+    user_lookups[email] = lookup
+    try:
+        user = await find_user_by_email(db, email)
+    except BaseException:
+        lookup.cancel()
+        raise
+    finally:
+        del user_lookups[email]
+    identity = None if user is None else UserDTO.model_validate(user)
+    lookup.set_result(identity)
+    return identity
+
+
+def invalidate_authenticated_user(user_id: int):
+    authenticated_users_cache.pop(user_id)
+
+
+@event.listens_for(User, "after_update")
+@event.listens_for(User, "after_delete")
+def _invalidate_changed_user(mapper, connection, user: User):
+    # bulk updates (query.update) don't emit these events,
+    # invalidate_authenticated_user must then be called
+    invalidate_authenticated_user(user.id)
+
 
 async def get_current_user(
     token: Annotated[str, Depends(oauth2_scheme)],
-    db: Session = Depends(get_db),
-):
+    db: AsyncSession = Depends(get_async_db),
+) -> UserDTO:
+    """
+    The identity of the user of the token (not a User of a session: the routes
+    use its id, it can't be loaded, changed or added to a session by mistake).
+    """
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Could not validate credentials",
@@ -79,10 +267,29 @@ async def get_current_user(
         email: str = payload.get("sub")
         if email is None:
             raise credentials_exception
-        token_data = TokenData(email=email)
+        token_data = TokenData(email=email, id=payload.get("id"))
     except JWTError:
         raise credentials_exception
-    user = find_user_by_email(db, token_data.email)
-    if user is None:
-        raise credentials_exception
-    return user
+
+    # the token is still decoded (and its expiration checked) on each request,
+    # only the user lookup is cached
+    identity: UserDTO | None = authenticated_users_cache.get(token_data.id)
+    if identity is None or identity.email != token_data.email:
+        identity = await _find_identity(db, token_data.email)
+        if identity is None:
+            raise credentials_exception
+        authenticated_users_cache.set(identity.id, identity)
+    # the session of the request reads the writes of its user (see ReadWriteSession)
+    db.info["user_id"] = identity.id
+    return identity
+
+
+async def get_current_admin_user(
+    current_user: Annotated[UserDTO, Depends(get_current_user)],
+) -> UserDTO:
+    if current_user.email not in ADMIN_EMAILS:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Admin rights required",
+        )
+    return current_user
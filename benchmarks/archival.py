@@ -0,0 +1,115 @@
+import os
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+from sqlalchemy import create_engine, insert
+from sqlalchemy.orm import sessionmaker
+
+from db import Base
+from db.models.room_reservations import RoomReservation
+from db.models.rooms import Room
+from db.models.users import User
+from db.repositories.room_reservations import (
+    archive_reservations,
+    get_all_reservation_on_room_between_dates,
+    get_all_rooms_reservation_rows_between_dates,
+    get_reservation_rows_by_user,
+)
+from db.session import get_connect_args
+
+ROOMS = 100
+USERS = 200
+# reservations of 1 hour by room and by day, from 9:00
+RESERVATIONS_BY_DAY = 8
+HISTORY_YEARS = (0, 1, 3)
+REPEAT = 20
+NOW = datetime(2030, 1, 1)
+
+
+def create_database(history_days: int) -> sessionmaker:
+    db_path = os.path.join(tempfile.mkdtemp(), "benchmark.db")
+    url = f"sqlite:///{db_path}"
+    engine = create_engine(url, connect_args=get_connect_args(url))
+    Base.metadata.create_all(engine)
+    session_maker = sessionmaker(bind=engine)
+    with session_maker() as db:
+        db.execute(
+            insert(User),
+            [
+                {"email": f"user{i}@test.com", "hashed_password": "-" * 60}
+                for i in range(USERS)
+            ],
+        )
+        db.execute(insert(Room), [{"name": f"Room {i}"} for i in range(ROOMS)])
+        # the history then a week of current reservations
+        for day in range(-history_days, 7):
+            db.execute(
+                insert(RoomReservation),
+                [
+                    {
+                        "room_id": room_id,
+                        "user_id": (room_id * day + hour) % USERS + 1,
+                        "start_date": NOW + timedelta(days=day, hours=9 + hour),
+                        "end_date": NOW + timedelta(days=day, hours=10 + hour),
+                    }
+                    for room_id in range(1, ROOMS + 1)
+                    for hour in range(RESERVATIONS_BY_DAY)
+                ],
+            )
+        db.commit()
+    return session_maker
+
+
+def measure(session_maker, function, *args) -> float:
+    # mean duration in ms, with a new session each time (as by the requests)
+    duration = 0.0
+    for _ in range(REPEAT):
+        with session_maker() as db:
+            start = time.perf_counter()
+            function(db, *args)
+            duration += time.perf_counter() - start
+    return duration / REPEAT * 1000
+
+
+def measure_queries(session_maker) -> tuple[float, float, float]:
+    with session_maker() as db:
+        user = db.get(User, 1)
+        room = db.get(Room, 1)
+    week = (NOW, NOW + timedelta(days=7))
+    return (
+        measure(session_maker, get_all_rooms_reservation_rows_between_dates, *week),
+        measure(session_maker, get_all_reservation_on_room_between_dates, room, *week),
+        measure(session_maker, get_reservation_rows_by_user, user, 20, 0),
+    )
+
+
+def main() -> int:
+    """
+    Latency of the queries of the current week (reservations of all the rooms, of a
+    room as checked before a booking, first page of /users/my-reservations) as the
+    history grows (100 rooms with 8 reservations each day), with the history in
+    room_reservation and once moved to the archive.
+    Usage: python -m benchmarks.archival
+    """
+    print("history      all rooms     one room   my-reservations")
+    for years in HISTORY_YEARS:
+        session_maker = create_database(365 * years)
+        durations = [measure_queries(session_maker)]
+        with session_maker() as db:
+            archive_reservations(db, NOW, batch_size=10_000)
+        durations.append(measure_queries(session_maker))
+        for name, (all_rooms, one_room, my_reservations) in zip(
+            ("", " archived"), durations
+        ):
+            print(
+                f"{years}y{name:<9} {all_rooms:8.2f} ms  {one_room:8.3f} ms"
+                f"  {my_reservations:8.3f} ms"
+            )
+        session_maker.kw["bind"].dispose()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,119 @@
+import asyncio
+import os
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta, timezone
+
+import httpx
+from fastapi import FastAPI
+from sqlalchemy import create_engine
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+from sqlalchemy.orm import sessionmaker
+
+from auth_helpers import create_access_token_from_user
+from db import Base
+from db.models.users import User
+from db.repositories.rooms import create_room
+from db.repositories.users import save_user
+from db.session import get_async_db, get_connect_args
+from routers import rooms_router
+
+OCCURRENCES = 1000
+
+
+def get_occurrences(room_id: int) -> list[dict]:
+    # a daily meeting at 10:00
+    start_date = datetime.now(timezone.utc).replace(
+        hour=10, minute=0, second=0, microsecond=0
+    ) + timedelta(days=1)
+    return [
+        {
+            "room_id": room_id,
+            "start_date": (start_date + timedelta(days=day)).isoformat(),
+            "end_date": (start_date + timedelta(days=day, hours=1)).isoformat(),
+        }
+        for day in range(OCCURRENCES)
+    ]
+
+
+async def create_one_by_one(
+    http_client: httpx.AsyncClient, headers: dict, room_id: int
+) -> float:
+    start = time.perf_counter()
+    for occurrence in get_occurrences(room_id):
+        response = await http_client.post(
+            f"/rooms/{room_id}/create-reservation",
+            headers=headers,
+            json={
+                "start_date": occurrence["start_date"],
+                "end_date": occurrence["end_date"],
+            },
+        )
+        assert response.status_code == 201, response.text
+    return time.perf_counter() - start
+
+
+async def create_in_bulk(
+    http_client: httpx.AsyncClient, headers: dict, room_id: int
+) -> float:
+    start = time.perf_counter()
+    response = await http_client.post(
+        "/rooms/create-reservations",
+        headers=headers,
+        json={"reservations": get_occurrences(room_id)},
+    )
+    assert response.json()["created"] == OCCURRENCES, response.text
+    return time.perf_counter() - start
+
+
+def main() -> int:
+    """
+    Time to create the 1000 occurrences of a daily meeting with one
+    create-reservation request by occurrence and with one create-reservations
+    request.
+    Usage: python -m benchmarks.bulk_reservations
+    """
+    db_path = os.path.join(tempfile.mkdtemp(), "benchmark.db")
+    url = f"sqlite:///{db_path}"
+    engine = create_engine(url, connect_args=get_connect_args(url))
+    Base.metadata.create_all(engine)
+    async_url = f"sqlite+aiosqlite:///{db_path}"
+    async_session_maker = async_sessionmaker(
+        create_async_engine(async_url, connect_args=get_connect_args(async_url)),
+        autoflush=False,
+        expire_on_commit=False,
+    )
+
+    with sessionmaker(bind=engine)() as db:
+        user = save_user(db, User(email="benchmark@test.com", hashed_password="-"))
+        token = create_access_token_from_user(user).access_token
+        rooms = [create_room(db, f"Room {i}") for i in range(2)]
+        room_ids = [room.id for room in rooms]
+
+    async def _get_async_db():
+        async with async_session_maker() as db:
+            yield db
+
+    app = FastAPI()
+    app.include_router(rooms_router, prefix="/rooms")
+    app.dependency_overrides[get_async_db] = _get_async_db
+    headers = {"Authorization": f"Bearer {token}"}
+
+    async def run() -> tuple[float, float]:
+        async with httpx.AsyncClient(
+            transport=httpx.ASGITransport(app=app), base_url="http://benchmark"
+        ) as http_client:
+            return (
+                await create_one_by_one(http_client, headers, room_ids[0]),
+                await create_in_bulk(http_client, headers, room_ids[1]),
+            )
+
+    one_by_one, bulk = asyncio.run(run())
+    print(f"{OCCURRENCES} create-reservation requests: {one_by_one * 1000:8.1f} ms")
+    print(f"1 create-reservations request:     {bulk * 1000:8.1f} ms")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
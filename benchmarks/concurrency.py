@@ -0,0 +1,162 @@
+import asyncio
+import os
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta, timezone
+
+import httpx
+from fastapi import APIRouter, Depends, FastAPI, Path, status
+from sqlalchemy import create_engine
+from sqlalchemy.orm import Session, sessionmaker
+
+from auth_helpers import create_access_token_from_user
+from db import Base
+from db.models.users import User
+from db.repositories.room_reservations import create_room_reservation
+from db.repositories.rooms import create_room, get_all_rooms, get_room_by_id
+from db.repositories.users import find_user_by_email, save_user
+from db.session import (
+    SQLITE_TUNED_PROFILE,
+    create_async_engines,
+    create_async_sessionmaker,
+    get_async_db,
+    get_db,
+)
+from routers import rooms_router
+from schemas.room_reservations import RoomReservationSimpleRequest
+from schemas.rooms import RoomDTO
+
+CLIENTS = 200
+REQUESTS_PER_CLIENT = 10
+# one client out of WRITERS_RATIO creates reservations instead of listing the rooms
+# (0 for a read only workload)
+WRITERS_RATIO = 10
+ROOMS = 50
+EMAIL = "benchmark@test.com"
+
+# routes as they were before the async database layer: sync queries in async routes
+blocking_router = APIRouter()
+
+
+@blocking_router.get("/", status_code=status.HTTP_200_OK)
+async def get_all_blocking(db: Session = Depends(get_db)) -> list[RoomDTO]:
+    find_user_by_email(db, EMAIL)
+    return [RoomDTO.model_validate(room) for room in get_all_rooms(db)]
+
+
+@blocking_router.post(
+    "/{room_id}/create-reservation", status_code=status.HTTP_201_CREATED
+)
+async def create_reservation_blocking(
+    room_reservation: RoomReservationSimpleRequest,
+    room_id: int = Path(..., ge=1),
+    db: Session = Depends(get_db),
+):
+    user = find_user_by_email(db, EMAIL)
+    room = get_room_by_id(db, room_id)
+    reservation = create_room_reservation(
+        db, room, user, room_reservation.start_date, room_reservation.end_date
+    )
+    return {"id": reservation.id}
+
+
+async def run_clients(app: FastAPI, token: str, first_day: int) -> list[float]:
+    headers = {"Authorization": f"Bearer {token}"}
+    start_date = datetime.now(timezone.utc).replace(minute=0, second=0, microsecond=0)
+    latencies: list[float] = []
+
+    async def client(client_id: int):
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(
+            transport=transport, base_url="http://benchmark"
+        ) as http_client:
+            for i in range(REQUESTS_PER_CLIENT):
+                if WRITERS_RATIO and client_id % WRITERS_RATIO == 0:
+                    reservation_start = start_date + timedelta(
+                        days=first_day + client_id, hours=i
+                    )
+                    await http_client.post(
+                        f"/rooms/{client_id % ROOMS + 1}/create-reservation",
+                        headers=headers,
+                        json={
+                            "start_date": reservation_start.isoformat(),
+                            "end_date": (
+                                reservation_start + timedelta(hours=1)
+                            ).isoformat(),
+                        },
+                    )
+                    continue
+                request_start = time.perf_counter()
+                response = await http_client.get("/rooms/", headers=headers)
+                latencies.append(time.perf_counter() - request_start)
+                assert response.status_code == 200, response.text
+
+    await asyncio.gather(*[client(client_id) for client_id in range(CLIENTS)])
+    return latencies
+
+
+def print_latencies(name: str, latencies: list[float]):
+    quantiles = statistics.quantiles(latencies, n=100)
+    print(
+        f"{name:<10} GET /rooms/ p50={quantiles[49] * 1000:8.1f} ms  "
+        f"p99={quantiles[98] * 1000:8.1f} ms  ({len(latencies)} requests)"
+    )
+
+
+def main() -> int:
+    """
+    Latency of GET /rooms/ with 200 concurrent clients, some of them creating
+    reservations at the same time, with the sync (blocking) database layer and
+    with the async one.
+    Usage: python -m benchmarks.concurrency
+    """
+    db_path = os.path.join(tempfile.mkdtemp(), "benchmark.db")
+    # one connection per client, a blocked event loop can't release the connections
+    # so a smaller pool would deadlock the sync layer
+    engine = create_engine(
+        f"sqlite:///{db_path}",
+        connect_args={"check_same_thread": False},
+        pool_size=CLIENTS,
+    )
+    Base.metadata.create_all(engine)
+    session_maker = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+    # the async layer with the sqlite profile of the readme (WAL journal, the reads
+    # on a pool of read-only connections, the writes queued for a single connection)
+    async_session_maker = create_async_sessionmaker(
+        *create_async_engines(f"sqlite:///{db_path}", "benchmark", SQLITE_TUNED_PROFILE)
+    )
+
+    with session_maker() as db:
+        user = save_user(db, User(email=EMAIL, hashed_password="-"))
+        token = create_access_token_from_user(user).access_token
+        for i in range(ROOMS):
+            create_room(db, f"Room {i}")
+
+    def _get_db():
+        db = session_maker()
+        try:
+            yield db
+        finally:
+            db.close()
+
+    async def _get_async_db():
+        async with async_session_maker() as db:
+            yield db
+
+    blocking_app = FastAPI()
+    blocking_app.include_router(blocking_router, prefix="/rooms")
+    blocking_app.dependency_overrides[get_db] = _get_db
+
+    async_app = FastAPI()
+    async_app.include_router(rooms_router, prefix="/rooms")
+    async_app.dependency_overrides[get_async_db] = _get_async_db
+
+    print_latencies("sync", asyncio.run(run_clients(blocking_app, token, 1)))
+    print_latencies("async", asyncio.run(run_clients(async_app, token, 1000)))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
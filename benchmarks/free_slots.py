@@ -0,0 +1,162 @@
+import asyncio
+import os
+import random
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta, timezone
+
+import httpx
+from fastapi import FastAPI
+from sqlalchemy import create_engine, insert
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+from sqlalchemy.orm import sessionmaker
+
+from auth_helpers import create_access_token_from_user
+from db import Base
+from db.models.room_reservations import RoomReservation
+from db.models.rooms import Room
+from db.models.users import User
+from db.repositories.users import save_user
+from db.session import get_async_db, get_connect_args
+from routers import rooms_router
+
+ROOMS = 100
+DAYS = 14
+DURATION_HOURS = 3
+SLOTS = 5
+
+
+def create_busy_calendar(db, user: User, first_day: datetime):
+    """
+    Book every room back to back with reservations of 1 to 3 hours, with a few
+    gaps of 1 hour and rare gaps of 3 hours.
+    """
+    random.seed(0)
+    reservations = []
+    for room_id in range(1, ROOMS + 1):
+        start_date = first_day
+        while start_date < first_day + timedelta(days=DAYS):
+            end_date = start_date + timedelta(hours=random.randint(1, 3))
+            reservations.append(
+                {
+                    "room_id": room_id,
+                    "user_id": user.id,
+                    "start_date": start_date,
+                    "end_date": end_date,
+                }
+            )
+            gap = random.random()
+            start_date = end_date + timedelta(
+                hours=3 if gap < 0.001 else 1 if gap < 0.25 else 0
+            )
+    db.execute(insert(RoomReservation), reservations)
+    db.commit()
+
+
+async def search_with_availables(
+    http_client: httpx.AsyncClient, headers: dict, first_day: datetime
+) -> tuple[float, list[tuple[int, str]], int]:
+    # what a client does today: one availables request by candidate start
+    start = time.perf_counter()
+    slots: list[tuple[int, str]] = []
+    start_date = first_day
+    requests = 0
+    end_date = first_day + timedelta(days=DAYS)
+    while (
+        len(slots) < SLOTS and start_date + timedelta(hours=DURATION_HOURS) <= end_date
+    ):
+        response = await http_client.get(
+            "/rooms/availables",
+            headers=headers,
+            params={
+                "start_date": start_date.isoformat(),
+                "end_date": (start_date + timedelta(hours=DURATION_HOURS)).isoformat(),
+            },
+        )
+        requests += 1
+        slots += [(room["id"], start_date.isoformat()) for room in response.json()]
+        start_date += timedelta(hours=1)
+    return time.perf_counter() - start, slots[:SLOTS], requests
+
+
+async def search_with_free_slots(
+    http_client: httpx.AsyncClient, headers: dict, first_day: datetime
+) -> tuple[float, list[tuple[int, str]]]:
+    start = time.perf_counter()
+    response = await http_client.get(
+        "/rooms/free-slots",
+        headers=headers,
+        params={
+            "start_date": first_day.isoformat(),
+            "end_date": (first_day + timedelta(days=DAYS)).isoformat(),
+            "duration_hours": DURATION_HOURS,
+            "limit": SLOTS,
+        },
+    )
+    slots = [
+        (
+            slot["room"]["id"],
+            datetime.fromisoformat(slot["start_date"]).isoformat(),
+        )
+        for slot in response.json()
+    ]
+    return time.perf_counter() - start, slots
+
+
+def main() -> int:
+    """
+    Time to find the 5 earliest free slots of 3 hours in a busy calendar (100
+    rooms booked back to back for 2 weeks), with one availables request by
+    candidate start and with one free-slots request.
+    Usage: python -m benchmarks.free_slots
+    """
+    db_path = os.path.join(tempfile.mkdtemp(), "benchmark.db")
+    url = f"sqlite:///{db_path}"
+    engine = create_engine(url, connect_args=get_connect_args(url))
+    Base.metadata.create_all(engine)
+    async_url = f"sqlite+aiosqlite:///{db_path}"
+    async_session_maker = async_sessionmaker(
+        create_async_engine(async_url, connect_args=get_connect_args(async_url)),
+        autoflush=False,
+        expire_on_commit=False,
+    )
+
+    first_day = datetime.now(timezone.utc).replace(
+        hour=0, minute=0, second=0, microsecond=0
+    ) + timedelta(days=1)
+    with sessionmaker(bind=engine)() as db:
+        user = save_user(db, User(email="benchmark@test.com", hashed_password="-"))
+        token = create_access_token_from_user(user).access_token
+        db.execute(insert(Room), [{"name": f"Room {i}"} for i in range(ROOMS)])
+        create_busy_calendar(db, user, first_day.replace(tzinfo=None))
+
+    async def _get_async_db():
+        async with async_session_maker() as db:
+            yield db
+
+    app = FastAPI()
+    app.include_router(rooms_router, prefix="/rooms")
+    app.dependency_overrides[get_async_db] = _get_async_db
+    headers = {"Authorization": f"Bearer {token}"}
+
+    async def run():
+        async with httpx.AsyncClient(
+            transport=httpx.ASGITransport(app=app), base_url="http://benchmark"
+        ) as http_client:
+            return (
+                await search_with_availables(http_client, headers, first_day),
+                await search_with_free_slots(http_client, headers, first_day),
+            )
+
+    (availables, availables_slots, requests), (free_slots, slots) = asyncio.run(run())
+    assert sorted(availables_slots) == sorted(slots), (availables_slots, slots)
+    print(
+        f"{requests} availables requests: {availables * 1000:8.1f} ms\n"
+        f"1 free-slots request:     {free_slots * 1000:8.1f} ms"
+    )
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
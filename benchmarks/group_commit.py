@@ -0,0 +1,128 @@
+import asyncio
+import os
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta, timezone
+
+import httpx
+from fastapi import FastAPI
+from sqlalchemy import create_engine, insert
+from sqlalchemy.orm import sessionmaker
+
+from auth_helpers import authenticated_users_cache, create_access_token_from_user
+from db import Base
+from db.models.rooms import Room
+from db.models.users import User
+from db.repositories.users import save_user
+from db.reservation_index import reservation_index
+from db.room_catalog import room_catalog
+from db.room_occupancy import room_occupancy
+from db.session import (
+    create_async_engines,
+    create_async_sessionmaker,
+    get_async_db,
+    get_async_sessionmaker,
+    get_connect_args,
+)
+from http_helpers import ORJSONResponse
+from reservation_group_commit import reservation_group_commit
+from routers import rooms_router
+
+CLIENTS = 100
+BOOKINGS_PER_CLIENT = 10
+ROOMS = 100
+
+
+def create_database() -> tuple[str, str]:
+    db_path = os.path.join(tempfile.mkdtemp(), "benchmark.db")
+    url = f"sqlite:///{db_path}"
+    engine = create_engine(url, connect_args=get_connect_args(url))
+    Base.metadata.create_all(engine)
+    with sessionmaker(bind=engine)() as db:
+        user = save_user(db, User(email="benchmark@test.com", hashed_password="-"))
+        token = create_access_token_from_user(user).access_token
+        db.execute(insert(Room), [{"name": f"Room {i}"} for i in range(ROOMS)])
+        db.commit()
+    engine.dispose()
+    return url, token
+
+
+async def run_clients(url: str, token: str, name: str) -> tuple[int, float]:
+    # the pools of each run publish their own metrics
+    writer, reader = create_async_engines(url, name)
+    session_maker = create_async_sessionmaker(writer, reader)
+
+    async def _get_async_db():
+        async with session_maker() as db:
+            yield db
+
+    app = FastAPI(default_response_class=ORJSONResponse)
+    app.include_router(rooms_router, prefix="/rooms")
+    app.dependency_overrides[get_async_db] = _get_async_db
+    app.dependency_overrides[get_async_sessionmaker] = lambda: session_maker
+    headers = {"Authorization": f"Bearer {token}"}
+    start_date = datetime(2030, 1, 1, tzinfo=timezone.utc)
+
+    async def client(client_id: int) -> int:
+        created = 0
+        async with httpx.AsyncClient(
+            transport=httpx.ASGITransport(app=app), base_url="http://benchmark"
+        ) as http_client:
+            for i in range(BOOKINGS_PER_CLIENT):
+                reservation_start = start_date + timedelta(days=client_id, hours=i)
+                response = await http_client.post(
+                    f"/rooms/{client_id % ROOMS + 1}/create-reservation",
+                    headers=headers,
+                    json={
+                        "start_date": reservation_start.isoformat(),
+                        "end_date": (
+                            reservation_start + timedelta(hours=1)
+                        ).isoformat(),
+                    },
+                )
+                created += response.status_code == 201
+        return created
+
+    start = time.perf_counter()
+    created = await asyncio.gather(*[client(client_id) for client_id in range(CLIENTS)])
+    duration = time.perf_counter() - start
+    await writer.dispose()
+    await reader.dispose()
+    return sum(created), duration
+
+
+def clear_caches():
+    reservation_index.clear()
+    room_occupancy.clear()
+    room_catalog.clear()
+    authenticated_users_cache.clear()
+
+
+def main() -> int:
+    """
+    Bookings/sec of /rooms/{room_id}/create-reservation with 100 concurrent
+    clients booking free slots, with a commit by reservation and with the group
+    commit (RESERVATION_GROUP_COMMIT).
+    Usage: python -m benchmarks.group_commit
+    """
+    for enabled in (False, True):
+        url, token = create_database()
+        clear_caches()
+        reservation_group_commit.enabled = enabled
+        groups = reservation_group_commit.group_size.count
+        created, duration = asyncio.run(
+            run_clients(url, token, f"benchmark_{'group' if enabled else 'single'}")
+        )
+        assert CLIENTS * BOOKINGS_PER_CLIENT == created
+        name = "group commit" if enabled else "commit by booking"
+        groups = reservation_group_commit.group_size.count - groups
+        print(
+            f"{name:<17} {created / duration:7.0f} bookings/s"
+            + (f"  ({created / groups:.1f} bookings by commit)" if enabled else "")
+        )
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,141 @@
+import asyncio
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+import httpx
+from fastapi import FastAPI
+from sqlalchemy import create_engine
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+from sqlalchemy.orm import sessionmaker
+
+import routers.auth
+from auth_helpers import (
+    create_access_token_from_user,
+    encode_password,
+    password_hashing_pool,
+    verify_password,
+)
+from db import Base
+from db.models.users import User
+from db.repositories.rooms import create_room
+from db.repositories.users import save_user
+from db.session import get_async_db
+from routers import auth_router, rooms_router
+
+LOGIN_CLIENTS = 50
+READ_CLIENTS = 10
+DURATION_SECONDS = 5
+EMAIL = "benchmark@test.com"
+PASSWORD = "password"
+
+
+async def run_storm(app: FastAPI, token: str, login_clients: int) -> list[float]:
+    transport = httpx.ASGITransport(app=app)
+    deadline = time.perf_counter() + DURATION_SECONDS
+    latencies: list[float] = []
+
+    async def login_client():
+        async with httpx.AsyncClient(
+            transport=transport, base_url="http://benchmark"
+        ) as http_client:
+            while time.perf_counter() < deadline:
+                response = await http_client.post(
+                    "/api/auth", json={"email": EMAIL, "password": PASSWORD}
+                )
+                if response.status_code == 503:
+                    await asyncio.sleep(float(response.headers["Retry-After"]))
+
+    async def read_client():
+        async with httpx.AsyncClient(
+            transport=transport, base_url="http://benchmark"
+        ) as http_client:
+            while time.perf_counter() < deadline:
+                request_start = time.perf_counter()
+                response = await http_client.get(
+                    "/rooms/", headers={"Authorization": f"Bearer {token}"}
+                )
+                latencies.append(time.perf_counter() - request_start)
+                assert response.status_code == 200, response.text
+                await asyncio.sleep(0.01)
+
+    await asyncio.gather(
+        *[login_client() for _ in range(login_clients)],
+        *[read_client() for _ in range(READ_CLIENTS)],
+    )
+    return latencies
+
+
+def print_latencies(name: str, latencies: list[float]):
+    quantiles = statistics.quantiles(latencies, n=100)
+    print(
+        f"{name:<28} GET /rooms/ p50={quantiles[49] * 1000:8.1f} ms  "
+        f"p99={quantiles[98] * 1000:8.1f} ms  ({len(latencies)} requests)"
+    )
+
+
+def main() -> int:
+    """
+    Latency of GET /rooms/ while 50 clients are logging in continuously, with the
+    password verification run in the event loop and in the password hashing pool.
+    Usage: python -m benchmarks.login_storm
+    """
+    db_path = os.path.join(tempfile.mkdtemp(), "benchmark.db")
+    engine = create_engine(
+        f"sqlite:///{db_path}", connect_args={"check_same_thread": False}
+    )
+    Base.metadata.create_all(engine)
+    async_session_maker = async_sessionmaker(
+        create_async_engine(
+            f"sqlite+aiosqlite:///{db_path}", connect_args={"check_same_thread": False}
+        ),
+        autoflush=False,
+        expire_on_commit=False,
+    )
+
+    with sessionmaker(bind=engine)() as db:
+        user = save_user(
+            db, User(email=EMAIL, hashed_password=encode_password(PASSWORD))
+        )
+        token = create_access_token_from_user(user).access_token
+        for i in range(50):
+            create_room(db, f"Room {i}")
+
+    async def _get_async_db():
+        async with async_session_maker() as db:
+            yield db
+
+    app = FastAPI()
+    app.include_router(auth_router)
+    app.include_router(rooms_router, prefix="/rooms")
+    app.dependency_overrides[get_async_db] = _get_async_db
+
+    print_latencies("no login", asyncio.run(run_storm(app, token, 0)))
+
+    check_password = routers.auth.check_password
+
+    async def check_password_in_event_loop(plain_password, hashed_password):
+        return verify_password(plain_password, hashed_password)
+
+    routers.auth.check_password = check_password_in_event_loop
+    print_latencies(
+        "logins in the event loop", asyncio.run(run_storm(app, token, LOGIN_CLIENTS))
+    )
+    routers.auth.check_password = check_password
+
+    print_latencies(
+        f"logins in the pool ({password_hashing_pool.executor})",
+        asyncio.run(run_storm(app, token, LOGIN_CLIENTS)),
+    )
+    print(
+        f"rejected logins: {password_hashing_pool.rejected.value}, "
+        f"verifications: {password_hashing_pool.duration.count}"
+    )
+    password_hashing_pool.shutdown()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,114 @@
+import os
+import random
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta, timezone
+
+from sqlalchemy import create_engine, insert
+from sqlalchemy.orm import sessionmaker
+
+from db import Base
+from db.models.room_reservations import RoomReservation
+from db.models.rooms import Room
+from db.models.users import User
+from db.repositories.rooms import get_all_rooms_without_reservations_between_dates
+from db.repositories.users import save_user
+from db.room_occupancy import room_occupancy
+from db.session import get_connect_args
+
+ROOMS = 10_000
+DAYS = 365
+REPEAT = 5
+
+
+def timed(function, *args) -> tuple[float, object]:
+    start = time.perf_counter()
+    for _ in range(REPEAT):
+        result = function(*args)
+    return (time.perf_counter() - start) / REPEAT, result
+
+
+def main() -> int:
+    """
+    Time to find the available rooms among 10k rooms with one reservation by room
+    and by day during a year, with a range scan of the reservations (SQL) and with
+    the occupancy bitmaps.
+    Usage: python -m benchmarks.occupancy
+    """
+    db_path = os.path.join(tempfile.mkdtemp(), "benchmark.db")
+    url = f"sqlite:///{db_path}"
+    engine = create_engine(url, connect_args=get_connect_args(url))
+    Base.metadata.create_all(engine)
+
+    random.seed(0)
+    first_day = datetime.now(timezone.utc).replace(
+        tzinfo=None, hour=0, minute=0, second=0, microsecond=0
+    ) + timedelta(days=1)
+    with sessionmaker(bind=engine)() as db:
+        user = save_user(db, User(email="benchmark@test.com", hashed_password="-"))
+        db.execute(insert(Room), [{"name": f"Room {i}"} for i in range(ROOMS)])
+        for day in range(DAYS):
+            # a reservation of 1 to 3 hours by room, between 8:00 and 18:00
+            day_start = first_day + timedelta(days=day)
+            reservations = []
+            for room_id in range(1, ROOMS + 1):
+                start_date = day_start + timedelta(hours=random.randint(8, 15))
+                reservations.append(
+                    {
+                        "room_id": room_id,
+                        "user_id": user.id,
+                        "start_date": start_date,
+                        "end_date": start_date + timedelta(hours=random.randint(1, 3)),
+                    }
+                )
+            db.execute(insert(RoomReservation), reservations)
+        db.commit()
+
+        windows = {
+            "1 hour tomorrow": (first_day + timedelta(hours=9), 1),
+            "1 hour in 6 months": (first_day + timedelta(days=180, hours=9), 1),
+            "1 week in 6 months": (first_day + timedelta(days=180), 24 * 7),
+        }
+        start = time.perf_counter()
+        room_occupancy.load(db)
+        load_duration = time.perf_counter() - start
+        print(
+            f"occupancy of {ROOMS} rooms x {DAYS} days loaded in "
+            f"{load_duration:.1f} s"
+        )
+
+        for name, (start_date, hours) in windows.items():
+            end_date = start_date + timedelta(hours=hours)
+            # the range scan is used while the occupancy isn't loaded
+            room_occupancy.loaded = False
+            sql_duration, sql_rooms = timed(
+                get_all_rooms_without_reservations_between_dates,
+                db,
+                start_date,
+                end_date,
+            )
+            room_occupancy.loaded = True
+            bitmaps_duration, bitmaps_rooms = timed(
+                get_all_rooms_without_reservations_between_dates,
+                db,
+                start_date,
+                end_date,
+            )
+            occupied_duration, _ = timed(
+                room_occupancy.find_occupied_room_ids, start_date, end_date
+            )
+            assert {room.id for room in sql_rooms} == {
+                room.id for room in bitmaps_rooms
+            }
+            print(
+                f"{name:20} {len(sql_rooms):5} available rooms: "
+                f"SQL {sql_duration * 1000:7.1f} ms, "
+                f"bitmaps {bitmaps_duration * 1000:7.1f} ms "
+                f"(bitwise ANDs {occupied_duration * 1000:5.1f} ms)"
+            )
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,68 @@
+import sys
+import timeit
+from datetime import datetime, timedelta
+
+import numpy as np
+
+from db.models.room_reservations import get_overlap, get_overlaps
+
+
+def get_hours_between_dates(start_date, end_date) -> set[int]:
+    # previous implementation, walking the reservation hour by hour
+    current_date = start_date
+    hours = set()
+    while current_date < end_date:
+        hours.add(current_date.hour)
+        current_date += timedelta(hours=1)
+    return hours
+
+
+def main() -> int:
+    """
+    Micro-benchmark of the overlap computation between a requested reservation and
+    existing reservations (of 1 hour, 1 day and 3 weeks).
+    Usage: python -m benchmarks.overlap
+    """
+    start_date = datetime.fromisoformat("2024-01-01T08:00")
+    end_date = start_date + timedelta(hours=4)
+    candidates = 10_000
+
+    for duration in (timedelta(hours=1), timedelta(days=1), timedelta(weeks=3)):
+        reservation_start_dates = [
+            start_date - duration + timedelta(hours=i % 8) for i in range(candidates)
+        ]
+        reservation_end_dates = [date + duration for date in reservation_start_dates]
+        start_dates = np.array(reservation_start_dates, dtype="datetime64[us]")
+        end_dates = np.array(reservation_end_dates, dtype="datetime64[us]")
+
+        def hour_walk():
+            requested_hours = get_hours_between_dates(start_date, end_date)
+            for reservation in zip(reservation_start_dates, reservation_end_dates):
+                get_hours_between_dates(*reservation).intersection(requested_hours)
+
+        def arithmetic():
+            for reservation in zip(reservation_start_dates, reservation_end_dates):
+                get_overlap(*reservation, start_date, end_date)
+
+        def vectorized():
+            get_overlaps(
+                start_dates,
+                end_dates,
+                np.datetime64(start_date),
+                np.datetime64(end_date),
+            )
+
+        print(f"{candidates} reservations of {duration}:")
+        for name, function in (
+            ("hour walk", hour_walk),
+            ("get_overlap", arithmetic),
+            ("get_overlaps (numpy)", vectorized),
+        ):
+            number = 3 if function is hour_walk else 20
+            elapsed = timeit.timeit(function, number=number) / number
+            print(f"  {name:<22} {elapsed * 1000:10.3f} ms")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,82 @@
+import os
+import sys
+import tempfile
+import timeit
+from datetime import datetime, timedelta
+
+from sqlalchemy import create_engine, insert
+from sqlalchemy.orm import sessionmaker
+
+from db import Base
+from db.models.room_reservations import RoomReservation
+from db.models.rooms import Room
+from db.models.users import User
+from db.repositories.room_reservations import (
+    get_reservation_rows_by_user,
+    get_reservation_rows_by_user_before,
+)
+
+RESERVATIONS = 100_000
+LIMIT = 10
+START_DATE = datetime(2030, 1, 1)
+
+
+def main() -> int:
+    """
+    Time to get a page of the reservations of a user with 100 000 reservations,
+    by page number (with and without the total) and by cursor, at growing depths.
+    Usage: python -m benchmarks.pagination
+    """
+    db_path = os.path.join(tempfile.mkdtemp(), "benchmark.db")
+    engine = create_engine(f"sqlite:///{db_path}")
+    Base.metadata.create_all(engine)
+
+    with sessionmaker(bind=engine)() as db:
+        db.execute(insert(User), [{"email": "user@test.com", "hashed_password": "-"}])
+        db.execute(insert(Room), [{"name": "Room"}])
+        db.execute(
+            insert(RoomReservation),
+            [
+                {
+                    "room_id": 1,
+                    "user_id": 1,
+                    "start_date": START_DATE + timedelta(hours=i),
+                    "end_date": START_DATE + timedelta(hours=i + 1),
+                }
+                for i in range(RESERVATIONS)
+            ],
+        )
+        db.commit()
+        user = db.get(User, 1)
+
+        for page in (0, 100, 1000, RESERVATIONS // LIMIT - 1):
+            # the cursor the client would have received with the previous page
+            before = None
+            if page:
+                rows, _, _, _ = get_reservation_rows_by_user(
+                    db, user, 1, page * LIMIT - 1, with_total=False
+                )
+                before = (rows[0].start_date, rows[0].id)
+
+            timings = {
+                "page+total": lambda: get_reservation_rows_by_user(
+                    db, user, LIMIT, page
+                ),
+                "page": lambda: get_reservation_rows_by_user(
+                    db, user, LIMIT, page, with_total=False
+                ),
+                "cursor": lambda: get_reservation_rows_by_user_before(
+                    db, user, LIMIT, before
+                ),
+            }
+            results = []
+            for name, function in timings.items():
+                number = 20
+                duration = min(timeit.repeat(function, number=number, repeat=3))
+                results.append(f"{name}={duration / number * 1000:7.2f} ms")
+            print(f"page {page:>5}  " + "  ".join(results))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,161 @@
+import asyncio
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta, timezone
+
+import httpx
+import websockets
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from auth_helpers import create_access_token_from_user
+from db import Base
+from db.models.rooms import Room
+from db.models.users import User
+from db.repositories.users import save_user
+from db.session import get_connect_args
+
+SUBSCRIBERS = 10_000
+# connections opened at once
+CONNECTION_BATCH = 500
+
+
+def get_free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def get_rss_mb(pid: int) -> float:
+    with open(f"/proc/{pid}/status") as status:
+        for line in status:
+            if line.startswith("VmRSS:"):
+                return int(line.split()[1]) / 1024
+    return 0.0
+
+
+async def wait_for_server(base_url: str):
+    async with httpx.AsyncClient(base_url=base_url) as http_client:
+        for _ in range(100):
+            try:
+                await http_client.get("/docs")
+                return
+            except httpx.TransportError:
+                await asyncio.sleep(0.1)
+    raise RuntimeError("The server didn't start")
+
+
+async def run(server: subprocess.Popen, port: int, token: str, room_id: int):
+    base_url = f"http://127.0.0.1:{port}"
+    headers = {"Authorization": f"Bearer {token}"}
+    await wait_for_server(base_url)
+    idle_rss = get_rss_mb(server.pid)
+
+    feed_url = f"ws://127.0.0.1:{port}/room-reservations/feed?token={token}"
+    start = time.perf_counter()
+    connections = []
+    for _ in range(0, SUBSCRIBERS, CONNECTION_BATCH):
+        connections += await asyncio.gather(
+            *[
+                websockets.connect(feed_url, ping_interval=None, open_timeout=60)
+                for _ in range(CONNECTION_BATCH)
+            ]
+        )
+    connect_duration = time.perf_counter() - start
+    subscribed_rss = get_rss_mb(server.pid)
+    print(
+        f"{SUBSCRIBERS} subscribers connected in {connect_duration:.1f} s, "
+        f"server memory {idle_rss:.0f} MB -> {subscribed_rss:.0f} MB "
+        f"({(subscribed_rss - idle_rss) * 1024 / SUBSCRIBERS:.1f} KB by subscriber)"
+    )
+
+    async with httpx.AsyncClient(base_url=base_url, headers=headers) as http_client:
+        # the worker stays responsive with the idle subscribers
+        start = time.perf_counter()
+        for _ in range(20):
+            assert 200 == (await http_client.get("/rooms/")).status_code
+        request_duration = (time.perf_counter() - start) / 20
+
+        start_date = (datetime.now(timezone.utc) + timedelta(days=1)).replace(
+            minute=0, second=0, microsecond=0
+        )
+        received = asyncio.gather(*[connection.recv() for connection in connections])
+        start = time.perf_counter()
+        response = await http_client.post(
+            f"/rooms/{room_id}/create-reservation",
+            json={
+                "start_date": start_date.isoformat(),
+                "end_date": (start_date + timedelta(hours=1)).isoformat(),
+            },
+        )
+        assert 201 == response.status_code, response.text
+        # the events are queued for all the subscribers before the response
+        created_duration = time.perf_counter() - start
+        messages = await received
+        fan_out_duration = time.perf_counter() - start
+    assert all('"created"' in message for message in messages)
+    print(
+        f"GET /rooms/ with the subscribers connected: "
+        f"{request_duration * 1000:.1f} ms\n"
+        f"reservation created (and queued for the subscribers) in "
+        f"{created_duration * 1000:.0f} ms, received by the {len(messages)} "
+        f"subscribers in {fan_out_duration * 1000:.0f} ms"
+    )
+
+    await asyncio.gather(*[connection.close() for connection in connections])
+
+
+def main() -> int:
+    """
+    Load test of the reservation feed: 10k idle WebSocket subscribers on a single
+    uvicorn worker (memory by subscriber, latency of a regular request), then the
+    time for a created reservation to reach all of them.
+    Usage: python -m benchmarks.reservation_feed (the limit of open files must be
+    over 10k, see ulimit -n)
+    """
+    db_path = os.path.join(tempfile.mkdtemp(), "benchmark.db")
+    url = f"sqlite:///{db_path}"
+    engine = create_engine(url, connect_args=get_connect_args(url))
+    Base.metadata.create_all(engine)
+    with sessionmaker(bind=engine)() as db:
+        user = save_user(db, User(email="benchmark@test.com", hashed_password="-"))
+        token = create_access_token_from_user(user).access_token
+        room = Room(name="Room 1")
+        db.add(room)
+        db.commit()
+        room_id = room.id
+
+    port = get_free_port()
+    server = subprocess.Popen(
+        [
+            sys.executable,
+            "-m",
+            "uvicorn",
+            "main:app",
+            "--port",
+            str(port),
+            "--log-level",
+            "warning",
+            "--ws",
+            "websockets",
+            # the feed sends small messages, compressing them isn't worth a
+            # deflate context (about 90 KB) by connection
+            "--ws-per-message-deflate",
+            "false",
+        ],
+        env={**os.environ, "DB_URL": url},
+    )
+    try:
+        asyncio.run(run(server, port, token, room_id))
+    finally:
+        server.terminate()
+        server.wait()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
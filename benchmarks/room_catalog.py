@@ -0,0 +1,112 @@
+import asyncio
+import os
+import sys
+import tempfile
+import time
+
+import httpx
+from fastapi import APIRouter, Depends, FastAPI, status
+from sqlalchemy import create_engine, insert
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+from sqlalchemy.orm import sessionmaker
+
+from auth_helpers import create_access_token_from_user, get_current_user
+from db import Base
+from db.models.rooms import Room
+from db.models.users import User
+from db.repositories.rooms import get_all_rooms
+from db.repositories.users import save_user
+from db.session import get_async_db, get_connect_args
+from routers import rooms_router
+from schemas.rooms import RoomDTO
+from schemas.users import UserDTO
+
+ROOMS = 5000
+DURATION_SECONDS = 3
+
+# route as it was before the room catalog: the rooms queried on each request
+query_router = APIRouter()
+
+
+@query_router.get("/", status_code=status.HTTP_200_OK)
+async def get_all_queried(
+    current_user: UserDTO = Depends(get_current_user),
+    db: AsyncSession = Depends(get_async_db),
+) -> list[RoomDTO]:
+    rooms = await db.run_sync(get_all_rooms)
+    return [RoomDTO.model_validate(room) for room in rooms]
+
+
+async def measure(
+    http_client: httpx.AsyncClient, url: str, headers: dict, status_code: int
+) -> float:
+    # requests by second during DURATION_SECONDS
+    requests = 0
+    start = time.perf_counter()
+    while time.perf_counter() - start < DURATION_SECONDS:
+        response = await http_client.get(url, headers=headers)
+        assert status_code == response.status_code, response.text
+        requests += 1
+    return requests / (time.perf_counter() - start)
+
+
+def main() -> int:
+    """
+    Requests by second on /rooms/ with 5000 rooms, with the rooms queried on each
+    request, served from the room catalog, and answered with a 304 Not Modified.
+    Usage: python -m benchmarks.room_catalog
+    """
+    db_path = os.path.join(tempfile.mkdtemp(), "benchmark.db")
+    url = f"sqlite:///{db_path}"
+    engine = create_engine(url, connect_args=get_connect_args(url))
+    Base.metadata.create_all(engine)
+    async_url = f"sqlite+aiosqlite:///{db_path}"
+    async_session_maker = async_sessionmaker(
+        create_async_engine(async_url, connect_args=get_connect_args(async_url)),
+        autoflush=False,
+        expire_on_commit=False,
+    )
+
+    with sessionmaker(bind=engine)() as db:
+        user = save_user(db, User(email="benchmark@test.com", hashed_password="-"))
+        token = create_access_token_from_user(user).access_token
+        db.execute(insert(Room), [{"name": f"Room {i}"} for i in range(ROOMS)])
+        db.commit()
+
+    async def _get_async_db():
+        async with async_session_maker() as db:
+            yield db
+
+    app = FastAPI()
+    app.include_router(rooms_router, prefix="/rooms")
+    app.include_router(query_router, prefix="/queried-rooms")
+    app.dependency_overrides[get_async_db] = _get_async_db
+    headers = {"Authorization": f"Bearer {token}"}
+
+    async def run() -> dict[str, float]:
+        async with httpx.AsyncClient(
+            transport=httpx.ASGITransport(app=app), base_url="http://benchmark"
+        ) as http_client:
+            queried = await measure(http_client, "/queried-rooms/", headers, 200)
+            response = await http_client.get("/rooms/", headers=headers)
+            # same response as before the catalog
+            queried_response = await http_client.get("/queried-rooms/", headers=headers)
+            assert queried_response.content == response.content
+            return {
+                "rooms queried": queried,
+                "room catalog": await measure(http_client, "/rooms/", headers, 200),
+                "room catalog, 304": await measure(
+                    http_client,
+                    "/rooms/",
+                    {**headers, "If-None-Match": response.headers["etag"]},
+                    304,
+                ),
+            }
+
+    for name, requests_per_second in asyncio.run(run()).items():
+        print(f"{name:20} {requests_per_second:8.1f} requests/s")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,141 @@
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime, timedelta
+
+from sqlalchemy import create_engine, insert
+from sqlalchemy.orm import joinedload, sessionmaker
+
+from db import Base
+from db.models.room_reservations import RoomReservation
+from db.models.rooms import Room
+from db.models.users import User
+from db.repositories.room_reservations import (
+    get_all_rooms_reservation_rows_between_dates,
+)
+from db.session import get_connect_args
+from http_helpers import dump_json
+from schemas.room_reservations import RoomReservationDTO, dump_room_reservation_row
+
+ROOMS = 100
+USERS = 200
+DAYS = 30
+# reservations of 1 hour by room and by day, from 9:00
+RESERVATIONS_BY_DAY = 8
+REPEAT = 3
+
+
+def get_all_rooms_reservations_between_dates(
+    db, start_date: datetime, end_date: datetime
+) -> list[RoomReservation]:
+    # the reservations as they were read before: entities with their user and room
+    return (
+        db.query(RoomReservation)
+        .options(joinedload(RoomReservation.user), joinedload(RoomReservation.room))
+        .filter(RoomReservation.start_date < end_date)
+        .filter(RoomReservation.end_date > start_date)
+        .order_by(RoomReservation.start_date)
+        .all()
+    )
+
+
+def summary_from_entities(db, start_date: datetime, end_date: datetime) -> bytes:
+    return dump_json(
+        [
+            RoomReservationDTO.model_validate(reservation).model_dump(mode="json")
+            for reservation in get_all_rooms_reservations_between_dates(
+                db, start_date, end_date
+            )
+        ]
+    )
+
+
+def summary_from_rows(db, start_date: datetime, end_date: datetime) -> bytes:
+    return dump_json(
+        [
+            dump_room_reservation_row(row)
+            for row in get_all_rooms_reservation_rows_between_dates(
+                db, start_date, end_date
+            )
+        ]
+    )
+
+
+def measure(session_maker, function, *args) -> tuple[float, float, bytes]:
+    # duration and peak of memory allocated, with a new session each time (as by
+    # the requests)
+    duration = 0.0
+    for _ in range(REPEAT):
+        with session_maker() as db:
+            start = time.perf_counter()
+            content = function(db, *args)
+            duration += time.perf_counter() - start
+    with session_maker() as db:
+        tracemalloc.start()
+        function(db, *args)
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+    return duration / REPEAT, peak / 1024 / 1024, content
+
+
+def main() -> int:
+    """
+    Time and peak memory to read and serialize the reservations of a busy month
+    (100 rooms with 8 reservations each day) with ORM entities (and their user and
+    room) and with the rows of the needed columns.
+    Usage: python -m benchmarks.row_queries
+    """
+    db_path = os.path.join(tempfile.mkdtemp(), "benchmark.db")
+    url = f"sqlite:///{db_path}"
+    engine = create_engine(url, connect_args=get_connect_args(url))
+    Base.metadata.create_all(engine)
+    session_maker = sessionmaker(bind=engine)
+
+    first_day = datetime(2030, 1, 1)
+    with session_maker() as db:
+        db.execute(
+            insert(User),
+            [
+                # a bcrypt hash is 60 characters long
+                {"email": f"user{i}@test.com", "hashed_password": "-" * 60}
+                for i in range(USERS)
+            ],
+        )
+        db.execute(insert(Room), [{"name": f"Room {i}"} for i in range(ROOMS)])
+        db.execute(
+            insert(RoomReservation),
+            [
+                {
+                    "room_id": room_id,
+                    "user_id": (room_id * day + hour) % USERS + 1,
+                    "start_date": first_day + timedelta(days=day, hours=9 + hour),
+                    "end_date": first_day + timedelta(days=day, hours=10 + hour),
+                }
+                for room_id in range(1, ROOMS + 1)
+                for day in range(DAYS)
+                for hour in range(RESERVATIONS_BY_DAY)
+            ],
+        )
+        db.commit()
+
+    end_date = first_day + timedelta(days=DAYS)
+    entities_duration, entities_memory, entities_content = measure(
+        session_maker, summary_from_entities, first_day, end_date
+    )
+    rows_duration, rows_memory, rows_content = measure(
+        session_maker, summary_from_rows, first_day, end_date
+    )
+    assert entities_content == rows_content
+    print(
+        f"{ROOMS * DAYS * RESERVATIONS_BY_DAY} reservations\n"
+        f"entities: {entities_duration * 1000:7.1f} ms, "
+        f"peak {entities_memory:6.1f} MB\n"
+        f"rows:     {rows_duration * 1000:7.1f} ms, peak {rows_memory:6.1f} MB"
+    )
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
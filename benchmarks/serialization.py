@@ -0,0 +1,174 @@
+import asyncio
+import os
+import sys
+import tempfile
+import time
+from collections import defaultdict
+from datetime import datetime, timedelta, timezone
+
+import httpx
+from fastapi import APIRouter, Depends, FastAPI, status
+from sqlalchemy import create_engine, insert
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+from sqlalchemy.orm import joinedload, sessionmaker
+
+from auth_helpers import create_access_token_from_user, get_current_user
+from db import Base
+from db.models.room_reservations import RoomReservation
+from db.models.rooms import Room
+from db.models.users import User
+from db.repositories.users import save_user
+from db.room_catalog import room_catalog
+from db.session import ensure_loaded_once, get_async_db, get_connect_args
+from routers import rooms_router
+from schemas.room_reservations import (
+    RoomReservationDTO,
+    RoomReservationSummaryForADay,
+)
+from schemas.users import UserDTO
+
+ROOMS = 100
+RESERVATIONS_BY_ROOM = 50
+REPEAT = 10
+
+# summary as it was serialized before: validated response models, validated again
+# by FastAPI and written by the JSONResponse
+validated_router = APIRouter()
+
+
+def get_all_rooms_reservations_between_dates(
+    db, start_date: datetime, end_date: datetime
+) -> list[RoomReservation]:
+    # the reservations as they were read before: entities with their user and room
+    return (
+        db.query(RoomReservation)
+        .options(joinedload(RoomReservation.user), joinedload(RoomReservation.room))
+        .filter(RoomReservation.start_date < end_date)
+        .filter(RoomReservation.end_date > start_date)
+        .order_by(RoomReservation.start_date)
+        .all()
+    )
+
+
+@validated_router.get("/all-rooms-reservations", status_code=status.HTTP_200_OK)
+async def get_all_rooms_reservations_validated(
+    start_date: datetime,
+    end_date: datetime,
+    current_user: UserDTO = Depends(get_current_user),
+    db: AsyncSession = Depends(get_async_db),
+) -> list[RoomReservationSummaryForADay]:
+    await ensure_loaded_once(db, room_catalog.ensure_loaded)
+    rooms_reservations = defaultdict(list)
+    for reservation in await db.run_sync(
+        get_all_rooms_reservations_between_dates, start_date, end_date
+    ):
+        rooms_reservations[reservation.room_id].append(reservation)
+    return [
+        RoomReservationSummaryForADay(
+            id=room.id,
+            name=room.name,
+            reservations=[
+                RoomReservationDTO.model_validate(reservation)
+                for reservation in rooms_reservations[room.id]
+            ],
+            occurrences=[],
+        )
+        for room in room_catalog.current.rooms
+    ]
+
+
+async def measure(
+    http_client: httpx.AsyncClient, url: str, params: dict, headers: dict
+) -> tuple[float, bytes]:
+    start = time.perf_counter()
+    for _ in range(REPEAT):
+        response = await http_client.get(url, params=params, headers=headers)
+        assert 200 == response.status_code, response.text
+    return (time.perf_counter() - start) / REPEAT, response.content
+
+
+def main() -> int:
+    """
+    Time of /rooms/all-rooms-reservations with 5000 reservations (100 rooms with
+    50 reservations each), with the validated response models and with the
+    reservations written as dicts by orjson.
+    Usage: python -m benchmarks.serialization
+    """
+    db_path = os.path.join(tempfile.mkdtemp(), "benchmark.db")
+    url = f"sqlite:///{db_path}"
+    engine = create_engine(url, connect_args=get_connect_args(url))
+    Base.metadata.create_all(engine)
+    async_url = f"sqlite+aiosqlite:///{db_path}"
+    async_session_maker = async_sessionmaker(
+        create_async_engine(async_url, connect_args=get_connect_args(async_url)),
+        autoflush=False,
+        expire_on_commit=False,
+    )
+
+    first_day = datetime(2030, 1, 1)
+    with sessionmaker(bind=engine)() as db:
+        user = save_user(db, User(email="benchmark@test.com", hashed_password="-"))
+        token = create_access_token_from_user(user).access_token
+        db.execute(insert(Room), [{"name": f"Room {i}"} for i in range(ROOMS)])
+        db.execute(
+            insert(RoomReservation),
+            [
+                {
+                    "room_id": room_id,
+                    "user_id": user.id,
+                    "start_date": first_day + timedelta(hours=hour),
+                    "end_date": first_day + timedelta(hours=hour + 1),
+                }
+                for room_id in range(1, ROOMS + 1)
+                for hour in range(RESERVATIONS_BY_ROOM)
+            ],
+        )
+        db.commit()
+
+    async def _get_async_db():
+        async with async_session_maker() as db:
+            yield db
+
+    app = FastAPI()
+    app.include_router(rooms_router, prefix="/rooms")
+    app.include_router(validated_router, prefix="/validated")
+    app.dependency_overrides[get_async_db] = _get_async_db
+    headers = {"Authorization": f"Bearer {token}"}
+    params = {
+        "start_date": first_day.replace(tzinfo=timezone.utc).isoformat(),
+        "end_date": (first_day + timedelta(days=7))
+        .replace(tzinfo=timezone.utc)
+        .isoformat(),
+    }
+
+    async def run():
+        async with httpx.AsyncClient(
+            transport=httpx.ASGITransport(app=app), base_url="http://benchmark"
+        ) as http_client:
+            # warm up (authenticated user, room catalog)
+            await http_client.get("/rooms/", headers=headers)
+            return (
+                await measure(
+                    http_client,
+                    "/validated/all-rooms-reservations",
+                    params,
+                    headers,
+                ),
+                await measure(
+                    http_client, "/rooms/all-rooms-reservations", params, headers
+                ),
+            )
+
+    (validated, validated_content), (dumped, content) = asyncio.run(run())
+    # same JSON, byte for byte
+    assert validated_content == content
+    print(
+        f"{ROOMS * RESERVATIONS_BY_ROOM} reservations, {len(content)} bytes\n"
+        f"validated response models: {validated * 1000:7.1f} ms\n"
+        f"dicts written by orjson:   {dumped * 1000:7.1f} ms"
+    )
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,177 @@
+import asyncio
+import os
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta, timezone
+
+import httpx
+from fastapi import FastAPI
+from sqlalchemy import create_engine, insert
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+from sqlalchemy.orm import sessionmaker
+
+from auth_helpers import authenticated_users_cache, create_access_token_from_user
+from db import Base
+from db.availability_cache import availability_cache
+from db.models.room_reservations import RoomReservation
+from db.models.rooms import Room
+from db.models.users import User
+from db.repositories.users import save_user
+from db.reservation_index import reservation_index
+from db.room_catalog import room_catalog
+from db.room_occupancy import room_occupancy
+from db.session import (
+    SQLITE_TUNED_PROFILE,
+    create_async_engines,
+    create_async_sessionmaker,
+    get_async_db,
+    get_async_sessionmaker,
+    get_connect_args,
+)
+from http_helpers import ORJSONResponse
+from routers import rooms_router
+
+CLIENTS = 50
+REQUESTS_PER_CLIENT = 20
+# one client out of WRITERS_RATIO creates reservations instead of reading them
+WRITERS_RATIO = 5
+ROOMS = 50
+RESERVATIONS_BY_ROOM = 20
+
+
+def create_database() -> tuple[str, str]:
+    # each configuration has its own file: the WAL journal mode is persistent
+    db_path = os.path.join(tempfile.mkdtemp(), "benchmark.db")
+    url = f"sqlite:///{db_path}"
+    engine = create_engine(url, connect_args=get_connect_args(url))
+    Base.metadata.create_all(engine)
+    first_day = datetime(2030, 1, 1)
+    with sessionmaker(bind=engine)() as db:
+        user = save_user(db, User(email="benchmark@test.com", hashed_password="-"))
+        token = create_access_token_from_user(user).access_token
+        db.execute(insert(Room), [{"name": f"Room {i}"} for i in range(ROOMS)])
+        db.execute(
+            insert(RoomReservation),
+            [
+                {
+                    "room_id": room_id,
+                    "user_id": user.id,
+                    "start_date": first_day + timedelta(hours=hour),
+                    "end_date": first_day + timedelta(hours=hour + 1),
+                }
+                for room_id in range(1, ROOMS + 1)
+                for hour in range(RESERVATIONS_BY_ROOM)
+            ],
+        )
+        db.commit()
+    engine.dispose()
+    return url, token
+
+
+def clear_caches():
+    # the databases are different, the in-memory state isn't shared between runs
+    reservation_index.clear()
+    room_occupancy.clear()
+    availability_cache.clear()
+    room_catalog.clear()
+    authenticated_users_cache.clear()
+
+
+async def run_clients(session_maker: async_sessionmaker, token: str) -> dict:
+    async def _get_async_db():
+        async with session_maker() as db:
+            yield db
+
+    app = FastAPI(default_response_class=ORJSONResponse)
+    app.include_router(rooms_router, prefix="/rooms")
+    app.dependency_overrides[get_async_db] = _get_async_db
+    app.dependency_overrides[get_async_sessionmaker] = lambda: session_maker
+
+    headers = {"Authorization": f"Bearer {token}"}
+    params = {"start_date": "2030-01-01T00:00Z", "end_date": "2030-01-01T02:00Z"}
+    start_date = datetime(2031, 1, 1, tzinfo=timezone.utc)
+    counts = {"reads": 0, "writes": 0, "errors": 0}
+
+    async def client(client_id: int):
+        # errors are counted rather than raised
+        transport = httpx.ASGITransport(app=app, raise_app_exceptions=False)
+        async with httpx.AsyncClient(
+            transport=transport, base_url="http://benchmark", headers=headers
+        ) as http_client:
+            for i in range(REQUESTS_PER_CLIENT):
+                if client_id % WRITERS_RATIO == 0:
+                    reservation_start = start_date + timedelta(days=client_id, hours=i)
+                    response = await http_client.post(
+                        f"/rooms/{client_id % ROOMS + 1}/create-reservation",
+                        json={
+                            "start_date": reservation_start.isoformat(),
+                            "end_date": (
+                                reservation_start + timedelta(hours=1)
+                            ).isoformat(),
+                        },
+                    )
+                    kind = "writes" if response.status_code == 201 else "errors"
+                else:
+                    response = await http_client.get(
+                        "/rooms/all-rooms-reservations", params=params
+                    )
+                    kind = "reads" if response.status_code == 200 else "errors"
+                counts[kind] += 1
+
+    start = time.perf_counter()
+    await asyncio.gather(*[client(client_id) for client_id in range(CLIENTS)])
+    counts["duration"] = time.perf_counter() - start
+    return counts
+
+
+def print_counts(name: str, counts: dict):
+    duration = counts["duration"]
+    print(
+        f"{name:<8} {(counts['reads'] + counts['writes']) / duration:7.0f} req/s  "
+        f"reads {counts['reads'] / duration:7.0f}/s  "
+        f"writes {counts['writes'] / duration:6.0f}/s  errors {counts['errors']}"
+    )
+
+
+def main() -> int:
+    """
+    Throughput of a mixed load (50 concurrent clients, one out of five creating
+    reservations while the others read the reservations of two hours) on a sqlite file
+    with the default journal and a single pool, and with the WAL journal, the tuned
+    pragmas, the read-only pool and the single writer connection.
+    Usage: python -m benchmarks.sqlite_tuning
+    """
+    url, token = create_database()
+    async_url = url.replace("sqlite://", "sqlite+aiosqlite://")
+    default_engine = create_async_engine(
+        async_url, connect_args=get_connect_args(async_url)
+    )
+
+    async def run_default():
+        counts = await run_clients(
+            async_sessionmaker(default_engine, autoflush=False, expire_on_commit=False),
+            token,
+        )
+        await default_engine.dispose()
+        return counts
+
+    clear_caches()
+    print_counts("default", asyncio.run(run_default()))
+
+    url, token = create_database()
+    writer, reader = create_async_engines(url, "benchmark", SQLITE_TUNED_PROFILE)
+
+    async def run_tuned():
+        counts = await run_clients(create_async_sessionmaker(writer, reader), token)
+        await writer.dispose()
+        await reader.dispose()
+        return counts
+
+    clear_caches()
+    print_counts("tuned", asyncio.run(run_tuned()))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
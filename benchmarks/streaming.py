@@ -0,0 +1,166 @@
+import asyncio
+import multiprocessing
+import os
+import resource
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+from urllib.parse import urlencode
+
+from fastapi import FastAPI
+from sqlalchemy import create_engine, insert
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+from sqlalchemy.orm import sessionmaker
+
+from auth_helpers import create_access_token_from_user
+from db import Base
+from db.models.room_reservations import RoomReservation
+from db.models.rooms import Room
+from db.models.users import User
+from db.session import get_async_db, get_async_sessionmaker
+from routers import rooms_router
+
+ROOMS = 200
+DAYS = 30
+RESERVATIONS_PER_DAY = 8
+START_DATE = datetime(2030, 1, 1)
+
+
+def create_data(db_path: str):
+    engine = create_engine(f"sqlite:///{db_path}")
+    Base.metadata.create_all(engine)
+    with sessionmaker(bind=engine)() as db:
+        db.execute(insert(User), [{"email": "user@test.com", "hashed_password": "-"}])
+        db.execute(insert(Room), [{"name": f"Room {i}"} for i in range(ROOMS)])
+        db.execute(
+            insert(RoomReservation),
+            [
+                {
+                    "room_id": room_id,
+                    "user_id": 1,
+                    "start_date": START_DATE + timedelta(days=day, hours=8 + hour),
+                    "end_date": START_DATE + timedelta(days=day, hours=9 + hour),
+                }
+                for room_id in range(1, ROOMS + 1)
+                for day in range(DAYS)
+                for hour in range(RESERVATIONS_PER_DAY)
+            ],
+        )
+        db.commit()
+
+
+def get_max_rss_mb() -> float:
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def measure(db_path: str, accept: str) -> tuple[float, float, int, float, float]:
+    """
+    Run in a new process so that the peak RSS is the one of a single request.
+    """
+    async_session_maker = async_sessionmaker(
+        create_async_engine(f"sqlite+aiosqlite:///{db_path}"),
+        autoflush=False,
+        expire_on_commit=False,
+    )
+
+    async def _get_async_db():
+        async with async_session_maker() as db:
+            yield db
+
+    app = FastAPI()
+    app.include_router(rooms_router, prefix="/rooms")
+    app.dependency_overrides[get_async_db] = _get_async_db
+    app.dependency_overrides[get_async_sessionmaker] = lambda: async_session_maker
+    token = create_access_token_from_user(User(id=1, email="user@test.com"))
+    query_string = urlencode(
+        {
+            "start_date": START_DATE.isoformat(),
+            "end_date": (START_DATE + timedelta(days=DAYS)).isoformat(),
+        }
+    )
+    scope = {
+        "type": "http",
+        "asgi": {"version": "3.0"},
+        "http_version": "1.1",
+        "method": "GET",
+        "scheme": "http",
+        "path": "/rooms/all-rooms-reservations",
+        "raw_path": b"/rooms/all-rooms-reservations",
+        "root_path": "",
+        "query_string": query_string.encode(),
+        "headers": [
+            (b"authorization", f"Bearer {token.access_token}".encode()),
+            (b"accept", accept.encode()),
+        ],
+        "client": ("benchmark", 1),
+        "server": ("benchmark", 80),
+    }
+    first_byte_time = None
+    body_size = 0
+    request_sent = False
+    response_complete: asyncio.Event
+
+    async def receive():
+        nonlocal request_sent
+        if not request_sent:
+            request_sent = True
+            return {"type": "http.request", "body": b"", "more_body": False}
+        # the streamed response listens for the client disconnection
+        await response_complete.wait()
+        return {"type": "http.disconnect"}
+
+    async def send(message):
+        nonlocal first_byte_time, body_size
+        if message["type"] == "http.response.body":
+            if message.get("body"):
+                if first_byte_time is None:
+                    first_byte_time = time.perf_counter()
+                body_size += len(message["body"])
+            if not message.get("more_body", False):
+                response_complete.set()
+
+    async def run():
+        nonlocal response_complete
+        response_complete = asyncio.Event()
+        await app(scope, receive, send)
+
+    baseline_rss = get_max_rss_mb()
+    start = time.perf_counter()
+    asyncio.run(run())
+    end = time.perf_counter()
+    return (
+        first_byte_time - start,
+        end - start,
+        body_size,
+        baseline_rss,
+        get_max_rss_mb(),
+    )
+
+
+def main() -> int:
+    """
+    Time to first byte, total time and peak RSS of /rooms/all-rooms-reservations
+    over a month (200 rooms, 48 000 reservations) with the JSON response and with
+    the streamed NDJSON response.
+    Usage: python -m benchmarks.streaming
+    """
+    db_path = os.path.join(tempfile.mkdtemp(), "benchmark.db")
+    create_data(db_path)
+
+    context = multiprocessing.get_context("spawn")
+    for accept in ("application/json", "application/x-ndjson"):
+        with context.Pool(1) as pool:
+            ttfb, total, size, baseline_rss, peak_rss = pool.apply(
+                measure, (db_path, accept)
+            )
+        print(
+            f"{accept:<22} first byte={ttfb * 1000:8.1f} ms  "
+            f"total={total * 1000:8.1f} ms  body={size / 1e6:5.1f} MB  "
+            f"peak RSS={peak_rss:6.1f} MB (+{peak_rss - baseline_rss:.1f} MB)"
+        )
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
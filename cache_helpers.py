@@ -0,0 +1,73 @@
+import time
+from collections import OrderedDict
+from collections.abc import Hashable
+from threading import Lock
+from typing import Any
+
+from metrics import Counter, Gauge
+
+
+class TTLCache:
+    """
+    Bounded LRU cache whose entries expire after ttl seconds.
+    Hits and misses are published as metrics named after the cache.
+    """
+
+    def __init__(self, name: str, max_size: int, ttl: float):
+        self.name = name
+        self.max_size = max_size
+        self.ttl = ttl
+        self._entries: OrderedDict[Hashable, tuple[float, Any]] = OrderedDict()
+        self._lock = Lock()
+        self.hits = Counter(f"{name}_cache_hits_total", f"Hits of the {name} cache")
+        self.misses = Counter(
+            f"{name}_cache_misses_total", f"Misses of the {name} cache"
+        )
+        self.size = Gauge(
+            f"{name}_cache_size", f"Entries of the {name} cache", lambda: len(self)
+        )
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[0] <= time.monotonic():
+                if entry is not None:
+                    del self._entries[key]
+                self.misses.inc()
+                return default
+            self._entries.move_to_end(key)
+        self.hits.inc()
+        return entry[1]
+
+    def set(self, key: Hashable, value: Any, ttl: float | None = None):
+        expire_at = time.monotonic() + (self.ttl if ttl is None else ttl)
+        with self._lock:
+            self._entries[key] = (expire_at, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def pop(self, key: Hashable):
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def keys(self) -> list[Hashable]:
+        with self._lock:
+            return list(self._entries)
+
+    def items(self) -> list[tuple[Hashable, Any]]:
+        # the entries not expired, without counting hits or misses
+        now = time.monotonic()
+        with self._lock:
+            return [
+                (key, value)
+                for key, (expire_at, value) in self._entries.items()
+                if expire_at > now
+            ]
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
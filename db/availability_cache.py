@@ -0,0 +1,165 @@
+from collections.abc import Iterable
+from datetime import datetime
+from threading import Lock
+from typing import Any
+
+from cache_helpers import TTLCache
+from db.reservation_index import to_naive_utc
+from settings import AVAILABILITY_CACHE_MAX_SIZE, AVAILABILITY_CACHE_TTL_SECONDS
+
+# the longer windows aren't indexed by day, they are checked on each room freed
+MAX_INDEXED_DAYS = 31
+
+Key = tuple[datetime, datetime]
+
+
+class AvailabilityCache:
+    """
+    Short-lived cache of the available rooms by (start_date, end_date).
+    The repositories invalidate only the answers changed by a reservation: the
+    windows overlapping it where its room was available (created) or not
+    (deleted).
+
+    The answers are indexed by available room (found when the room is reserved)
+    and by day (found when the room is freed, the answers overlapping one of its
+    reservations couldn't list it), so an invalidation doesn't scan the cache.
+
+    Each invalidation increments the generation: an answer computed from the
+    database before a change can't be cached after it.
+    Its metrics are named after name (see TTLCache).
+    """
+
+    def __init__(self, max_size: int, ttl: float, name: str = "availability"):
+        self._cache = TTLCache(name, max_size, ttl)
+        self._lock = Lock()
+        self.generation = 0
+        # the available room ids of the indexed keys, the keys evicted by the
+        # cache are unindexed once they are twice as many as max_size
+        self._room_ids: dict[Key, frozenset[int]] = {}
+        self._keys_by_room: dict[int, set[Key]] = {}
+        # by ordinal of the days overlapped
+        self._keys_by_day: dict[int, set[Key]] = {}
+        self._long_keys: set[Key] = set()
+
+    @staticmethod
+    def _get_key(start_date: datetime, end_date: datetime) -> Key:
+        return to_naive_utc(start_date), to_naive_utc(end_date)
+
+    @staticmethod
+    def _get_days(start_date: datetime, end_date: datetime) -> range:
+        return range(start_date.toordinal(), end_date.toordinal() + 1)
+
+    def _index(self, key: Key, room_ids: frozenset[int]):
+        self._room_ids[key] = room_ids
+        for room_id in room_ids:
+            self._keys_by_room.setdefault(room_id, set()).add(key)
+        days = self._get_days(*key)
+        if len(days) > MAX_INDEXED_DAYS:
+            self._long_keys.add(key)
+            return
+        for day in days:
+            self._keys_by_day.setdefault(day, set()).add(key)
+
+    def _unindex(self, key: Key):
+        room_ids = self._room_ids.pop(key, None)
+        if room_ids is None:
+            return
+        for index, values in (
+            (self._keys_by_room, room_ids),
+            (self._keys_by_day, self._get_days(*key)),
+        ):
+            for value in values:
+                keys = index.get(value)
+                if keys is not None:
+                    keys.discard(key)
+                    if not keys:
+                        del index[value]
+        self._long_keys.discard(key)
+
+    def _get_keys_between(self, start_date: datetime, end_date: datetime) -> set[Key]:
+        # the keys of the days overlapped (without iterating over the days of the
+        # long invalidations, as the deletion of a rule without end)
+        days = self._get_days(start_date, end_date)
+        if len(days) <= len(self._keys_by_day):
+            keys_of_days = (self._keys_by_day.get(day, ()) for day in days)
+        else:
+            keys_of_days = (
+                keys for day, keys in self._keys_by_day.items() if day in days
+            )
+        return self._long_keys.union(*keys_of_days)
+
+    @property
+    def hits(self):
+        return self._cache.hits
+
+    @property
+    def misses(self):
+        return self._cache.misses
+
+    def get(self, start_date: datetime, end_date: datetime) -> Any:
+        entry = self._cache.get(self._get_key(start_date, end_date))
+        return None if entry is None else entry[1]
+
+    def set(
+        self,
+        start_date: datetime,
+        end_date: datetime,
+        room_ids: Iterable[int],
+        value: Any,
+        generation: int,
+    ):
+        """
+        Cache the answer (value) listing the available room_ids, computed when the
+        generation was the given one.
+        """
+        key = self._get_key(start_date, end_date)
+        room_ids = frozenset(room_ids)
+        with self._lock:
+            if generation != self.generation:
+                return
+            self._unindex(key)
+            self._cache.set(key, (room_ids, value))
+            self._index(key, room_ids)
+            if len(self._room_ids) > 2 * self._cache.max_size:
+                cached_keys = set(self._cache.keys())
+                for indexed_key in list(self._room_ids):
+                    if indexed_key not in cached_keys:
+                        self._unindex(indexed_key)
+
+    def invalidate(
+        self, room_id: int, start_date: datetime, end_date: datetime, available: bool
+    ):
+        """
+        The room was reserved (available=False) or freed (available=True) between
+        the dates.
+        """
+        start_date, end_date = self._get_key(start_date, end_date)
+        with self._lock:
+            self.generation += 1
+            if available:
+                keys = self._get_keys_between(start_date, end_date)
+            else:
+                keys = self._keys_by_room.get(room_id, set()).copy()
+            for key in keys:
+                entry_start_date, entry_end_date = key
+                if (
+                    entry_start_date < end_date
+                    and entry_end_date > start_date
+                    and (room_id in self._room_ids[key]) != available
+                ):
+                    self._cache.pop(key)
+                    self._unindex(key)
+
+    def clear(self):
+        with self._lock:
+            self.generation += 1
+            self._cache.clear()
+            self._room_ids.clear()
+            self._keys_by_room.clear()
+            self._keys_by_day.clear()
+            self._long_keys.clear()
+
+
+availability_cache = AvailabilityCache(
+    AVAILABILITY_CACHE_MAX_SIZE, AVAILABILITY_CACHE_TTL_SECONDS
+)
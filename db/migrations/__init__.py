@@ -0,0 +1,33 @@
+import os
+
+from alembic import command
+from alembic.config import Config
+from sqlalchemy import URL
+
+from db.session import get_sync_url
+from settings import DB_URL
+
+ALEMBIC_INI_PATH = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))),
+    "alembic.ini",
+)
+
+
+def get_migrations_url(url: str | URL = DB_URL) -> str:
+    # the migrations are run with the sync driver
+    return get_sync_url(url).render_as_string(hide_password=False)
+
+
+def get_alembic_config(url: str | URL = DB_URL) -> Config:
+    config = Config(ALEMBIC_INI_PATH)
+    # % is the interpolation character of the ini files
+    config.set_main_option("sqlalchemy.url", get_migrations_url(url).replace("%", "%%"))
+    return config
+
+
+def upgrade_database(url: str | URL = DB_URL, revision: str = "head"):
+    command.upgrade(get_alembic_config(url), revision)
+
+
+def downgrade_database(url: str | URL = DB_URL, revision: str = "base"):
+    command.downgrade(get_alembic_config(url), revision)
@@ -0,0 +1,52 @@
+from alembic import context
+from sqlalchemy import create_engine, pool
+
+from db import Base
+from db.migrations import get_migrations_url
+
+# the models must be imported to be part of the metadata
+from db.models.room_reservation_rules import RoomReservationRule  # noqa: F401
+from db.models.room_reservations import RoomReservation  # noqa: F401
+from db.models.rooms import Room  # noqa: F401
+from db.models.users import User  # noqa: F401
+
+config = context.config
+# the url is set by get_alembic_config, or read from the settings when alembic is
+# run from the command line
+url = config.get_main_option("sqlalchemy.url") or get_migrations_url()
+
+target_metadata = Base.metadata
+
+
+def run_migrations_offline() -> None:
+    context.configure(
+        url=url,
+        target_metadata=target_metadata,
+        literal_binds=True,
+        dialect_opts={"paramstyle": "named"},
+        render_as_batch=True,
+    )
+
+    with context.begin_transaction():
+        context.run_migrations()
+
+
+def run_migrations_online() -> None:
+    connectable = create_engine(url, poolclass=pool.NullPool)
+
+    with connectable.connect() as connection:
+        context.configure(
+            connection=connection,
+            target_metadata=target_metadata,
+            # sqlite can't alter tables, they are copied
+            render_as_batch=True,
+        )
+
+        with context.begin_transaction():
+            context.run_migrations()
+
+
+if context.is_offline_mode():
+    run_migrations_offline()
+else:
+    run_migrations_online()
@@ -0,0 +1,54 @@
+"""reservation indexes
+
+Indexes of the reservations of a user (keyset pagination) and of the overlap
+queries (start_date < end AND end_date > start, with or without the room).
+
+Revision ID: 0002
+Revises: 0001
+Create Date: 2026-10-18 08:12:41.305127
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "0002"
+down_revision: Union[str, None] = "0001"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_index(
+        "ix_room_reservation_user_id_start_date_id",
+        "room_reservation",
+        ["user_id", "start_date", "id"],
+        unique=False,
+    )
+    op.create_index(
+        "ix_room_reservation_room_id_end_date_start_date",
+        "room_reservation",
+        ["room_id", "end_date", "start_date"],
+        unique=False,
+    )
+    op.create_index(
+        "ix_room_reservation_end_date_start_date",
+        "room_reservation",
+        ["end_date", "start_date"],
+        unique=False,
+    )
+
+
+def downgrade() -> None:
+    op.drop_index(
+        "ix_room_reservation_end_date_start_date", table_name="room_reservation"
+    )
+    op.drop_index(
+        "ix_room_reservation_room_id_end_date_start_date",
+        table_name="room_reservation",
+    )
+    op.drop_index(
+        "ix_room_reservation_user_id_start_date_id", table_name="room_reservation"
+    )
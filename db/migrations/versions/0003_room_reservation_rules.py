@@ -0,0 +1,85 @@
+"""room reservation rules
+
+Recurring reservations and their cancelled occurrences.
+
+Revision ID: 0003
+Revises: 0002
+Create Date: 2026-10-18 08:17:58.847115
+
+"""
+
+from typing import Sequence, Union
+
+import sqlalchemy as sa
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "0003"
+down_revision: Union[str, None] = "0002"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "room_reservation_rule",
+        sa.Column("id", sa.Integer(), nullable=False),
+        sa.Column("start_date", sa.DateTime(), nullable=False),
+        sa.Column("end_date", sa.DateTime(), nullable=False),
+        sa.Column("frequency", sa.String(), nullable=False),
+        sa.Column("interval", sa.Integer(), nullable=False),
+        sa.Column("until", sa.DateTime(), nullable=True),
+        sa.Column("room_id", sa.Integer(), nullable=False),
+        sa.Column("user_id", sa.Integer(), nullable=False),
+        sa.ForeignKeyConstraint(["room_id"], ["room.id"]),
+        sa.ForeignKeyConstraint(["user_id"], ["user.id"]),
+        sa.PrimaryKeyConstraint("id"),
+    )
+    op.create_index(
+        "ix_room_reservation_rule_id", "room_reservation_rule", ["id"], unique=False
+    )
+    op.create_index(
+        "ix_room_reservation_rule_room_id_until",
+        "room_reservation_rule",
+        ["room_id", "until"],
+        unique=False,
+    )
+
+    op.create_table(
+        "room_reservation_rule_exception",
+        sa.Column("id", sa.Integer(), nullable=False),
+        sa.Column("rule_id", sa.Integer(), nullable=False),
+        sa.Column("start_date", sa.DateTime(), nullable=False),
+        sa.Column("end_date", sa.DateTime(), nullable=False),
+        sa.ForeignKeyConstraint(["rule_id"], ["room_reservation_rule.id"]),
+        sa.PrimaryKeyConstraint("id"),
+    )
+    op.create_index(
+        "ix_room_reservation_rule_exception_id",
+        "room_reservation_rule_exception",
+        ["id"],
+        unique=False,
+    )
+    op.create_index(
+        "ix_room_reservation_rule_exception_rule_id_start_date",
+        "room_reservation_rule_exception",
+        ["rule_id", "start_date"],
+        unique=True,
+    )
+
+
+def downgrade() -> None:
+    op.drop_index(
+        "ix_room_reservation_rule_exception_rule_id_start_date",
+        table_name="room_reservation_rule_exception",
+    )
+    op.drop_index(
+        "ix_room_reservation_rule_exception_id",
+        table_name="room_reservation_rule_exception",
+    )
+    op.drop_table("room_reservation_rule_exception")
+    op.drop_index(
+        "ix_room_reservation_rule_room_id_until", table_name="room_reservation_rule"
+    )
+    op.drop_index("ix_room_reservation_rule_id", table_name="room_reservation_rule")
+    op.drop_table("room_reservation_rule")
@@ -0,0 +1,68 @@
+"""archived room reservations
+
+Reservations ended for a while, moved out of room_reservation with their ids.
+
+Revision ID: 0004
+Revises: 0003
+Create Date: 2026-10-18 09:41:06.518203
+
+"""
+
+from typing import Sequence, Union
+
+import sqlalchemy as sa
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "0004"
+down_revision: Union[str, None] = "0003"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "archived_room_reservation",
+        sa.Column("id", sa.Integer(), autoincrement=False, nullable=False),
+        sa.Column("start_date", sa.DateTime(), nullable=False),
+        sa.Column("end_date", sa.DateTime(), nullable=False),
+        sa.Column("room_id", sa.Integer(), nullable=False),
+        sa.Column("user_id", sa.Integer(), nullable=False),
+        sa.ForeignKeyConstraint(["room_id"], ["room.id"]),
+        sa.ForeignKeyConstraint(["user_id"], ["user.id"]),
+        sa.PrimaryKeyConstraint("id"),
+    )
+    op.create_index(
+        "ix_archived_room_reservation_user_id_start_date_id",
+        "archived_room_reservation",
+        ["user_id", "start_date", "id"],
+        unique=False,
+    )
+    op.create_index(
+        "ix_archived_room_reservation_room_id_end_date_start_date",
+        "archived_room_reservation",
+        ["room_id", "end_date", "start_date"],
+        unique=False,
+    )
+    op.create_index(
+        "ix_archived_room_reservation_end_date_start_date",
+        "archived_room_reservation",
+        ["end_date", "start_date"],
+        unique=False,
+    )
+
+
+def downgrade() -> None:
+    op.drop_index(
+        "ix_archived_room_reservation_end_date_start_date",
+        table_name="archived_room_reservation",
+    )
+    op.drop_index(
+        "ix_archived_room_reservation_room_id_end_date_start_date",
+        table_name="archived_room_reservation",
+    )
+    op.drop_index(
+        "ix_archived_room_reservation_user_id_start_date_id",
+        table_name="archived_room_reservation",
+    )
+    op.drop_table("archived_room_reservation")
@@ -0,0 +1,55 @@
+"""room reservation autoincrement
+
+The ids of the room reservations are never reused with sqlite, they must stay
+unique with the archived ones.
+
+Revision ID: 0005
+Revises: 0004
+Create Date: 2026-10-18 11:02:37.190425
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "0005"
+down_revision: Union[str, None] = "0004"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # the other backends use a sequence, which never reuses the ids
+    if op.get_bind().dialect.name != "sqlite":
+        return
+    with op.batch_alter_table(
+        "room_reservation",
+        recreate="always",
+        table_kwargs={"sqlite_autoincrement": True},
+    ):
+        pass
+    # the next id follows the archived ones too
+    op.execute(
+        "INSERT INTO sqlite_sequence (name, seq) "
+        "SELECT 'room_reservation', 0 WHERE NOT EXISTS "
+        "(SELECT 1 FROM sqlite_sequence WHERE name = 'room_reservation')"
+    )
+    op.execute(
+        "UPDATE sqlite_sequence SET seq = max(seq, "
+        "(SELECT coalesce(max(id), 0) FROM room_reservation), "
+        "(SELECT coalesce(max(id), 0) FROM archived_room_reservation)) "
+        "WHERE name = 'room_reservation'"
+    )
+
+
+def downgrade() -> None:
+    if op.get_bind().dialect.name != "sqlite":
+        return
+    with op.batch_alter_table(
+        "room_reservation",
+        recreate="always",
+        table_kwargs={"sqlite_autoincrement": False},
+    ):
+        pass
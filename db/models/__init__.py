@@ -1,5 +1,15 @@
-from .room_reservations import RoomReservation
+from .reservation_revisions import ReservationRevision
+from .room_reservation_rules import RoomReservationRule, RoomReservationRuleException
+from .room_reservations import ArchivedRoomReservation, RoomReservation
 from .rooms import Room
 from .users import User
 
-__all__ = ["RoomReservation", "Room", "User"]
+__all__ = [
+    "ArchivedRoomReservation",
+    "ReservationRevision",
+    "RoomReservation",
+    "RoomReservationRule",
+    "RoomReservationRuleException",
+    "Room",
+    "User",
+]
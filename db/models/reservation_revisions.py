@@ -0,0 +1,21 @@
+from sqlalchemy import Column, Integer
+from sqlalchemy.orm import mapped_column
+
+from db.base_class import Base
+
+# user_id of the revision of all the reservations
+ALL_USERS = 0
+
+
+class ReservationRevision(Base):
+    """
+    Counter of the changes of the reservations (and of the recurring
+    reservations) of a user, incremented in the transaction of each change, or of
+    all of them (ALL_USERS), incremented right after its commit: all the workers
+    see the same revisions.
+    """
+
+    __tablename__ = "reservation_revision"
+
+    user_id = mapped_column(Integer, primary_key=True, autoincrement=False)
+    revision = Column(Integer, nullable=False)
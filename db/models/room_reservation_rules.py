@@ -0,0 +1,165 @@
+from collections.abc import Iterator
+from datetime import datetime, timedelta
+from math import lcm
+
+from db.base_class import Base
+from sqlalchemy import Column, DateTime, ForeignKey, Index, Integer, String
+from sqlalchemy.orm import Mapped, mapped_column, relationship
+
+# period of the occurrences for an interval of 1
+FREQUENCIES = {"daily": timedelta(days=1), "weekly": timedelta(weeks=1)}
+
+
+def get_occurrences(
+    start_date: datetime,
+    end_date: datetime,
+    period: timedelta,
+    until: datetime | None,
+    window_start_date: datetime,
+    window_end_date: datetime,
+) -> Iterator[tuple[datetime, datetime]]:
+    """
+    Generate the occurrences overlapping [window_start_date, window_end_date) of a
+    series whose first occurrence is [start_date, end_date), repeated every period
+    and ending at until (None if endless).
+    The first occurrence of the window is computed, so the cost only depends on
+    the size of the window, not on the length of the series.
+    """
+    duration = end_date - start_date
+    # first occurrence ending after the start of the window
+    position = 0
+    if window_start_date >= end_date:
+        position = (window_start_date - end_date) // period + 1
+    occurrence_start_date = start_date + position * period
+    while occurrence_start_date < window_end_date:
+        occurrence_end_date = occurrence_start_date + duration
+        if until is not None and occurrence_end_date > until:
+            return
+        yield occurrence_start_date, occurrence_end_date
+        occurrence_start_date += period
+
+
+class RoomReservationRule(Base):
+    """
+    Recurring reservation of a room: the first occurrence [start_date, end_date)
+    is repeated every interval days or weeks until the until date (the end of the
+    last occurrence, None if endless).
+    The occurrences are not stored, they are generated in the queried windows.
+    """
+
+    __tablename__ = "room_reservation_rule"
+    __table_args__ = (
+        Index("ix_room_reservation_rule_room_id_until", "room_id", "until"),
+    )
+
+    id = mapped_column(Integer, primary_key=True, index=True, nullable=False)
+    start_date = Column(DateTime, nullable=False)
+    end_date = Column(DateTime, nullable=False)
+    # daily or weekly
+    frequency = Column(String, nullable=False)
+    interval = Column(Integer, nullable=False, default=1)
+    until = Column(DateTime, nullable=True)
+
+    # Foreign keys
+    room_id: Mapped[int] = mapped_column(ForeignKey("room.id"))
+    user_id: Mapped[int] = mapped_column(ForeignKey("user.id"))
+
+    # Foreign
+    room: Mapped["Room"] = relationship()
+    user: Mapped["User"] = relationship()
+    exceptions: Mapped[list["RoomReservationRuleException"]] = relationship(
+        cascade="all, delete-orphan"
+    )
+
+    @property
+    def period(self) -> timedelta:
+        return FREQUENCIES[self.frequency] * self.interval
+
+    def get_occurrences(
+        self,
+        window_start_date: datetime,
+        window_end_date: datetime,
+        excluded_start_dates: set[datetime] | None = None,
+    ) -> Iterator[tuple[datetime, datetime]]:
+        """
+        Occurrences of the rule overlapping the window (naive UTC dates), without
+        the excluded ones (the rule exceptions if not given).
+        """
+        if excluded_start_dates is None:
+            excluded_start_dates = {
+                exception.start_date for exception in self.exceptions
+            }
+        for start_date, end_date in get_occurrences(
+            self.start_date,
+            self.end_date,
+            self.period,
+            self.until,
+            window_start_date,
+            window_end_date,
+        ):
+            if start_date not in excluded_start_dates:
+                yield start_date, end_date
+
+    def get_overlap_with_rule(
+        self, other: "RoomReservationRule"
+    ) -> tuple[datetime, datetime] | None:
+        """
+        Return the first occurrence of the rule overlapping an occurrence of the
+        other one (exceptions included), or None if they never overlap.
+        Once both rules have started, their occurrences repeat the same pattern
+        every least common multiple of their periods, which bounds the search.
+        """
+        hour = timedelta(hours=1)
+        pattern_length = hour * lcm(self.period // hour, other.period // hour)
+        # an exception removes the overlaps of at most 2 patterns, the search goes
+        # on over enough patterns to skip them
+        patterns = 2 * (len(self.exceptions) + len(other.exceptions)) + 1
+        window_start_date = max(self.start_date, other.start_date)
+        window_end_date = (
+            window_start_date
+            + pattern_length * patterns
+            + (self.end_date - self.start_date)
+            + (other.end_date - other.start_date)
+        )
+        other_occurrences = list(
+            other.get_occurrences(window_start_date, window_end_date)
+        )
+        position = 0
+        for start_date, end_date in self.get_occurrences(
+            window_start_date, window_end_date
+        ):
+            # both are sorted, the other occurrences ended before this one can't
+            # overlap the next ones
+            while (
+                position < len(other_occurrences)
+                and other_occurrences[position][1] <= start_date
+            ):
+                position += 1
+            if (
+                position < len(other_occurrences)
+                and other_occurrences[position][0] < end_date
+            ):
+                return start_date, end_date
+        return None
+
+
+class RoomReservationRuleException(Base):
+    """
+    Cancelled occurrence [start_date, end_date) of a rule.
+    """
+
+    __tablename__ = "room_reservation_rule_exception"
+    __table_args__ = (
+        Index(
+            "ix_room_reservation_rule_exception_rule_id_start_date",
+            "rule_id",
+            "start_date",
+            unique=True,
+        ),
+    )
+
+    id = mapped_column(Integer, primary_key=True, index=True, nullable=False)
+    rule_id: Mapped[int] = mapped_column(ForeignKey("room_reservation_rule.id"))
+    start_date = Column(DateTime, nullable=False)
+    # the exceptions are loaded with the same overlap condition as the reservations
+    end_date = Column(DateTime, nullable=False)
@@ -1,22 +1,107 @@
-from datetime import timedelta, timezone
+from collections.abc import Iterable, Iterator
+from datetime import datetime, timedelta
 
+import numpy as np
 from db.base_class import Base
-from sqlalchemy import Column, DateTime, ForeignKey, Integer, event
+from sqlalchemy import Column, DateTime, ForeignKey, Index, Integer
 from sqlalchemy.orm import Mapped, mapped_column, relationship
-from sqlalchemy.orm.attributes import set_committed_value
 
 
-def get_hours_between_dates(start_date, end_date) -> set[int]:
-    current_date = start_date
-    hours = set()
-    while current_date < end_date:
-        hours.add(current_date.hour)
-        current_date += timedelta(hours=1)
-    return hours
+def get_overlap(
+    start_date: datetime,
+    end_date: datetime,
+    other_start_date: datetime,
+    other_end_date: datetime,
+) -> tuple[datetime, datetime] | None:
+    """
+    Return the interval shared by [start_date, end_date) and
+    [other_start_date, other_end_date), or None if they don't overlap.
+    """
+    overlap_start = max(start_date, other_start_date)
+    overlap_end = min(end_date, other_end_date)
+    if overlap_start < overlap_end:
+        return overlap_start, overlap_end
+    return None
+
+
+def get_overlaps(
+    start_dates: np.ndarray,
+    end_dates: np.ndarray,
+    start_date: np.datetime64,
+    end_date: np.datetime64,
+) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Vectorized version of get_overlap for many reservations at once.
+    start_dates and end_dates are datetime64 arrays (naive UTC dates).
+    Return the starts and the ends of the overlaps and the mask of the reservations
+    actually overlapping [start_date, end_date).
+    """
+    overlap_starts = np.maximum(start_dates, start_date)
+    overlap_ends = np.minimum(end_dates, end_date)
+    return overlap_starts, overlap_ends, overlap_starts < overlap_ends
+
+
+def merge_date_ranges(
+    date_ranges: list[tuple[datetime, datetime]]
+) -> list[tuple[datetime, datetime]]:
+    merged: list[tuple[datetime, datetime]] = []
+    for start_date, end_date in sorted(date_ranges):
+        if merged and start_date <= merged[-1][1]:
+            merged[-1] = (merged[-1][0], max(merged[-1][1], end_date))
+        else:
+            merged.append((start_date, end_date))
+    return merged
+
+
+def get_free_start_dates(
+    busy_date_ranges: Iterable[tuple[datetime, datetime]],
+    start_date: datetime,
+    end_date: datetime,
+    duration: timedelta,
+    step: timedelta,
+) -> Iterator[datetime]:
+    """
+    Sweep line over the busy date ranges of a room, sorted by start date (they can
+    overlap): generate the start dates, every step from start_date, of the free
+    ranges of duration inside [start_date, end_date).
+    """
+    candidate = start_date
+    for busy_start_date, busy_end_date in busy_date_ranges:
+        if candidate + duration > end_date:
+            return
+        # free range before the busy one
+        while candidate + duration <= min(busy_start_date, end_date):
+            yield candidate
+            candidate += step
+        if busy_end_date > candidate:
+            # first step after the busy range
+            candidate += -((candidate - busy_end_date) // step) * step
+    while candidate + duration <= end_date:
+        yield candidate
+        candidate += step
 
 
 class RoomReservation(Base):
     __tablename__ = "room_reservation"
+    __table_args__ = (
+        # reservations of a user sorted by date (see select_reservation_rows_by_user)
+        Index(
+            "ix_room_reservation_user_id_start_date_id", "user_id", "start_date", "id"
+        ),
+        # overlap queries (start_date < end AND end_date > start): the past
+        # reservations keep growing while the future ones stay few, so the range
+        # is taken on end_date, and start_date is filtered from the index
+        Index(
+            "ix_room_reservation_room_id_end_date_start_date",
+            "room_id",
+            "end_date",
+            "start_date",
+        ),
+        Index("ix_room_reservation_end_date_start_date", "end_date", "start_date"),
+        # the ids of the deleted and archived reservations are never reused by
+        # sqlite (max(rowid) + 1 otherwise)
+        {"sqlite_autoincrement": True},
+    )
 
     id = mapped_column(Integer, primary_key=True, index=True, nullable=False)
     start_date = Column(DateTime, nullable=False)
@@ -30,7 +115,44 @@ class RoomReservation(Base):
     room: Mapped["Room"] = relationship(back_populates="reservations")
     user: Mapped["User"] = relationship(back_populates="reservations")
 
-    def get_hours_in_common(self, start_date, end_date) -> set[int]:
-        return get_hours_between_dates(self.start_date, self.end_date).intersection(
-            get_hours_between_dates(start_date, end_date)
-        )
+    def get_overlap(
+        self, start_date: datetime, end_date: datetime
+    ) -> tuple[datetime, datetime] | None:
+        return get_overlap(self.start_date, self.end_date, start_date, end_date)
+
+
+class ArchivedRoomReservation(Base):
+    """
+    Reservations ended for a while, moved out of room_reservation by
+    archive_reservations (same ids and columns): the overlap queries of the current
+    reservations read a table which doesn't grow with the history.
+    """
+
+    __tablename__ = "archived_room_reservation"
+    __table_args__ = (
+        Index(
+            "ix_archived_room_reservation_user_id_start_date_id",
+            "user_id",
+            "start_date",
+            "id",
+        ),
+        Index(
+            "ix_archived_room_reservation_room_id_end_date_start_date",
+            "room_id",
+            "end_date",
+            "start_date",
+        ),
+        # also gives the end of the archived dates (see archive_overlaps)
+        Index(
+            "ix_archived_room_reservation_end_date_start_date",
+            "end_date",
+            "start_date",
+        ),
+    )
+
+    id = mapped_column(Integer, primary_key=True, autoincrement=False)
+    start_date = Column(DateTime, nullable=False)
+    end_date = Column(DateTime, nullable=False)
+
+    room_id: Mapped[int] = mapped_column(ForeignKey("room.id"))
+    user_id: Mapped[int] = mapped_column(ForeignKey("user.id"))
@@ -0,0 +1,109 @@
+import time
+
+from sqlalchemy import URL, exc, make_url
+from sqlalchemy.pool import Pool, QueuePool
+
+from metrics import Counter, Gauge, Histogram
+from settings import (
+    DB_MAX_OVERFLOW,
+    DB_POOL_PRE_PING,
+    DB_POOL_RECYCLE_SECONDS,
+    DB_POOL_SIZE,
+    DB_POOL_TIMEOUT_SECONDS,
+)
+
+# a checkout is usually immediate, the waits for a busy pool go up to its timeout
+CHECKOUT_WAIT_BUCKETS = (0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0, 10.0, 30.0)
+
+
+class PoolMetrics:
+    """
+    Metrics of the connection pool of an engine, to tell the time waited for a
+    connection from the time of the queries.
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+        # the current pool of the engine (dispose() replaces it)
+        self.pool: Pool | None = None
+        self.checked_out = Gauge(
+            f"db_{name}_pool_checked_out",
+            f"Connections of the {name} pool in use",
+            self._get_checked_out,
+        )
+        self.checkout_wait = Histogram(
+            f"db_{name}_pool_checkout_wait_seconds",
+            f"Time waited for a connection of the {name} pool",
+            CHECKOUT_WAIT_BUCKETS,
+        )
+        self.overflows = Counter(
+            f"db_{name}_pool_overflows_total",
+            f"Connections opened over the size of the {name} pool",
+        )
+        self.timeouts = Counter(
+            f"db_{name}_pool_timeouts_total",
+            f"Checkouts of the {name} pool which timed out",
+        )
+
+    def _get_checked_out(self) -> int:
+        # only counted by the queue pools
+        if isinstance(self.pool, QueuePool):
+            return self.pool.checkedout()
+        return 0
+
+
+class InstrumentedPoolMixin:
+    metrics: PoolMetrics
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.metrics.pool = self
+
+    def connect(self):
+        start = time.perf_counter()
+        try:
+            return super().connect()
+        except exc.TimeoutError:
+            self.metrics.timeouts.inc()
+            raise
+        finally:
+            self.metrics.checkout_wait.observe(time.perf_counter() - start)
+
+    def _inc_overflow(self) -> bool:
+        # called by a QueuePool before opening a connection
+        opened = super()._inc_overflow()
+        if opened and self._overflow > 0:
+            self.metrics.overflows.inc()
+        return opened
+
+
+def get_instrumented_pool_class(pool_class: type[Pool], name: str) -> type[Pool]:
+    # a class by engine, the pool recreated by dispose() keeps it
+    return type(
+        f"Instrumented{pool_class.__name__}",
+        (InstrumentedPoolMixin, pool_class),
+        {"metrics": PoolMetrics(name)},
+    )
+
+
+def get_pool_args(url: str | URL, name: str, **pool_args) -> dict:
+    """
+    Return the pool arguments of create_engine (or create_async_engine) for the
+    url: the pool class of the dialect (or poolclass) publishing the metrics of
+    name, with the DB_POOL_* settings when it's a queue pool. pool_args override
+    the settings.
+    """
+    url = make_url(url)
+    pool_class = pool_args.pop("poolclass", None) or url.get_dialect().get_pool_class(
+        url
+    )
+    args = {"poolclass": get_instrumented_pool_class(pool_class, name)}
+    if issubclass(pool_class, QueuePool):
+        args.update(
+            pool_size=DB_POOL_SIZE,
+            max_overflow=DB_MAX_OVERFLOW,
+            pool_timeout=DB_POOL_TIMEOUT_SECONDS,
+        )
+    args.update(pool_pre_ping=DB_POOL_PRE_PING, pool_recycle=DB_POOL_RECYCLE_SECONDS)
+    args.update(pool_args)
+    return args
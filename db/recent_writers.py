@@ -0,0 +1,66 @@
+import time
+from threading import Lock
+
+from settings import DB_REPLICA_MAX_LAG_SECONDS
+
+
+class RecentWriters:
+    """
+    Users who committed a change in the last max_lag seconds, recorded by the
+    ReadWriteSession: their reads go to the primary database, so they see their
+    changes even when the replicas haven't received them yet (read your writes).
+    Kept in the memory of the process, like the other caches: the clients also
+    send back the time of their last write in a cookie (LAST_WRITE_COOKIE, set
+    after their changes) for the other workers, checked with is_recent.
+    """
+
+    def __init__(self, max_lag: float):
+        self.max_lag = max_lag
+        self._lock = Lock()
+        # time of the last write of any user
+        self.last_write: float | None = None
+        # user id -> time of the last write, the oldest first
+        self._last_writes: dict[int, float] = {}
+
+    def lagging(self) -> bool:
+        """
+        Return True if the replicas may still miss a write.
+        """
+        return (
+            self.last_write is not None
+            and self.last_write > time.monotonic() - self.max_lag
+        )
+
+    def is_recent(self, last_write: float | None) -> bool:
+        # last_write in seconds since the epoch, the clocks of the workers agree
+        return last_write is not None and last_write > time.time() - self.max_lag
+
+    def add(self, user_id: int | None):
+        now = time.monotonic()
+        with self._lock:
+            self.last_write = now
+            if user_id is None:
+                return
+            self._last_writes.pop(user_id, None)
+            self._last_writes[user_id] = now
+            # the expired writers are dropped from the oldest one
+            while self._last_writes:
+                old_user_id, last_write = next(iter(self._last_writes.items()))
+                if last_write > now - self.max_lag:
+                    break
+                del self._last_writes[old_user_id]
+
+    def __contains__(self, user_id: int) -> bool:
+        last_write = self._last_writes.get(user_id)
+        return last_write is not None and last_write > time.monotonic() - self.max_lag
+
+    def __len__(self) -> int:
+        return len(self._last_writes)
+
+    def clear(self):
+        with self._lock:
+            self.last_write = None
+            self._last_writes.clear()
+
+
+recent_writers = RecentWriters(DB_REPLICA_MAX_LAG_SECONDS)
@@ -0,0 +1,2 @@
+# async versions of the repositories, the sync functions are run through
+# AsyncSession.run_sync so the queries don't block the event loop
@@ -0,0 +1,7 @@
+from db.models.reservation_revisions import ALL_USERS
+from db.repositories import reservation_revisions
+from sqlalchemy.ext.asyncio import AsyncSession
+
+
+async def get_revision(db: AsyncSession, user_id: int = ALL_USERS) -> int:
+    return await db.run_sync(reservation_revisions.get_revision, user_id)
@@ -0,0 +1,56 @@
+from datetime import datetime
+
+from db.models.room_reservation_rules import RoomReservationRule
+from db.repositories import room_reservation_rules
+from sqlalchemy.ext.asyncio import AsyncSession
+
+
+async def get_rules_between_dates(
+    db: AsyncSession,
+    start_date: datetime,
+    end_date: datetime,
+    room_ids: list[int] | None = None,
+) -> list[RoomReservationRule]:
+    return await db.run_sync(
+        room_reservation_rules.get_rules_between_dates, start_date, end_date, room_ids
+    )
+
+
+async def get_occurrences_between_dates(
+    db: AsyncSession,
+    start_date: datetime,
+    end_date: datetime,
+    room_ids: list[int] | None = None,
+) -> list[tuple[RoomReservationRule, datetime, datetime]]:
+    return await db.run_sync(
+        room_reservation_rules.get_occurrences_between_dates,
+        start_date,
+        end_date,
+        room_ids,
+    )
+
+
+async def get_room_reservation_rule_by_id(
+    db: AsyncSession, rule_id: int
+) -> RoomReservationRule | None:
+    return await db.run_sync(
+        room_reservation_rules.get_room_reservation_rule_by_id, rule_id
+    )
+
+
+async def add_room_reservation_rule_exception(
+    db: AsyncSession,
+    rule: RoomReservationRule,
+    start_date: datetime,
+    end_date: datetime,
+) -> RoomReservationRule:
+    return await db.run_sync(
+        room_reservation_rules.add_room_reservation_rule_exception,
+        rule,
+        start_date,
+        end_date,
+    )
+
+
+async def delete_room_reservation_rule(db: AsyncSession, rule: RoomReservationRule):
+    await db.run_sync(room_reservation_rules.delete_room_reservation_rule, rule)
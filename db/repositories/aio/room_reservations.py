@@ -0,0 +1,194 @@
+from collections.abc import AsyncIterator
+from datetime import date, datetime
+
+from db.models.room_reservation_rules import RoomReservationRule
+from db.models.room_reservations import RoomReservation
+from db.models.rooms import Room
+from db.repositories import room_reservations
+from schemas.users import UserDTO
+from sqlalchemy import Row, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+# rows fetched at once by the streamed queries
+STREAM_YIELD_PER = 500
+
+
+async def count_reservations_by_user(db: AsyncSession, user: UserDTO) -> int:
+    return await db.run_sync(room_reservations.count_reservations_by_user, user)
+
+
+async def get_all_reservation_on_room_between_dates(
+    db: AsyncSession, room: Room, start_date, end_date
+) -> list[RoomReservation]:
+    return await db.run_sync(
+        room_reservations.get_all_reservation_on_room_between_dates,
+        room,
+        start_date,
+        end_date,
+    )
+
+
+async def create_room_reservation(
+    db: AsyncSession,
+    room: Room,
+    user: UserDTO,
+    start_date: datetime,
+    end_date: datetime,
+) -> RoomReservation:
+    # the room of the reservation is set, not its user (the user given is an
+    # identity): relationships can't be lazy loaded with an AsyncSession
+    return await db.run_sync(
+        room_reservations.create_room_reservation, room, user, start_date, end_date
+    )
+
+
+async def reserve_room(
+    db: AsyncSession,
+    room: Room,
+    user: UserDTO,
+    start_date: datetime,
+    end_date: datetime,
+) -> RoomReservation:
+    return await db.run_sync(
+        room_reservations.reserve_room, room, user, start_date, end_date
+    )
+
+
+async def reserve_rooms(
+    db: AsyncSession,
+    user: UserDTO,
+    requests: list[tuple[int, datetime, datetime]],
+    all_or_nothing: bool = True,
+) -> tuple[list[int | None], list[list[tuple[datetime, datetime, int]]]]:
+    return await db.run_sync(
+        room_reservations.reserve_rooms, user, requests, all_or_nothing
+    )
+
+
+async def reserve_rooms_of_users(
+    db: AsyncSession,
+    requests: list[tuple[int, int, datetime, datetime]],
+    all_or_nothing: bool = True,
+) -> tuple[list[int | None], list[list[tuple[datetime, datetime, int]]]]:
+    return await db.run_sync(
+        room_reservations.reserve_rooms_of_users, requests, all_or_nothing
+    )
+
+
+async def reserve_room_with_rule(
+    db: AsyncSession,
+    room: Room,
+    user: UserDTO,
+    start_date: datetime,
+    end_date: datetime,
+    frequency: str,
+    interval: int,
+    until: datetime | None,
+) -> RoomReservationRule:
+    rule = await db.run_sync(
+        room_reservations.reserve_room_with_rule,
+        room,
+        user,
+        start_date,
+        end_date,
+        frequency,
+        interval,
+        until,
+    )
+    await db.refresh(rule, ["room", "user", "exceptions"])
+    return rule
+
+
+async def delete_room_reservation(db: AsyncSession, reservation: RoomReservation):
+    await db.run_sync(room_reservations.delete_room_reservation, reservation)
+
+
+async def get_room_reservation_by_id(
+    db: AsyncSession, reservation_id: int
+) -> RoomReservation | None:
+    return await db.run_sync(
+        room_reservations.get_room_reservation_by_id, reservation_id
+    )
+
+
+async def get_reservation_rows_by_user(
+    db: AsyncSession, user: UserDTO, limit: int, page: int, with_total: bool = True
+) -> tuple[list[Row], int | None, int, int]:
+    return await db.run_sync(
+        room_reservations.get_reservation_rows_by_user, user, limit, page, with_total
+    )
+
+
+async def get_reservation_rows_by_user_before(
+    db: AsyncSession,
+    user: UserDTO,
+    limit: int,
+    before: tuple[datetime, int] | None = None,
+) -> list[Row]:
+    return await db.run_sync(
+        room_reservations.get_reservation_rows_by_user_before, user, limit, before
+    )
+
+
+async def get_all_rooms_reservation_rows_between_dates(
+    db: AsyncSession, start_date: date, end_date: date
+) -> list[Row]:
+    return await db.run_sync(
+        room_reservations.get_all_rooms_reservation_rows_between_dates,
+        start_date,
+        end_date,
+    )
+
+
+async def archive_reservations(
+    db: AsyncSession, before: datetime, batch_size: int
+) -> int:
+    return await db.run_sync(room_reservations.archive_reservations, before, batch_size)
+
+
+# the streamed queries can't be run through run_sync, they are written for the
+# AsyncSession directly
+
+
+async def stream_reservation_rows_by_user(
+    db: AsyncSession,
+    user: UserDTO,
+    limit: int,
+    page: int,
+    before: tuple[datetime, int] | None = None,
+) -> AsyncIterator[Row]:
+    query = room_reservations.select_reservation_rows_by_user(
+        user, limit, page * limit if before is None else 0, before
+    )
+    rows = await db.stream(query.execution_options(yield_per=STREAM_YIELD_PER))
+    async for row in rows:
+        yield row
+
+
+async def stream_all_rooms_with_reservation_rows_between_dates(
+    db: AsyncSession, start_date: date, end_date: date
+) -> AsyncIterator[tuple[Row, list[Row]]]:
+    """
+    Streamed rooms (id, name) with the rows of their reservations between the
+    dates: only the reservations of one room are kept in memory at once.
+    """
+    rooms = (await db.execute(select(Room.id, Room.name).order_by(Room.id))).all()
+    query = room_reservations.select_all_rooms_reservation_rows_between_dates(
+        start_date, end_date
+    )
+    rows = await db.stream(
+        query.order_by(
+            query.selected_columns.room_id, query.selected_columns.start_date
+        ).execution_options(yield_per=STREAM_YIELD_PER)
+    )
+
+    # both rooms and reservations are sorted by room id
+    row = await anext(rows, None)
+    for room in rooms:
+        room_rows: list[Row] = []
+        while row is not None and row.room_id <= room.id:
+            # reservations of a room created after the rooms were loaded are skipped
+            if row.room_id == room.id:
+                room_rows.append(row)
+            row = await anext(rows, None)
+        yield room, room_rows
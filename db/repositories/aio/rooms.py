@@ -0,0 +1,38 @@
+from datetime import datetime, timedelta
+
+from db.models.rooms import Room
+from db.repositories import rooms
+from sqlalchemy.ext.asyncio import AsyncSession
+
+
+async def get_room_by_id(db: AsyncSession, room_id: int) -> Room:
+    return await db.run_sync(rooms.get_room_by_id, room_id)
+
+
+async def get_rooms_by_ids(db: AsyncSession, room_ids: list[int]) -> list[Room]:
+    return await db.run_sync(rooms.get_rooms_by_ids, room_ids)
+
+
+async def get_all_rooms_without_reservations_between_dates(
+    db: AsyncSession, start_date: datetime, end_date: datetime
+) -> list[Room]:
+    return await db.run_sync(
+        rooms.get_all_rooms_without_reservations_between_dates, start_date, end_date
+    )
+
+
+async def get_free_slots(
+    db: AsyncSession,
+    start_date: datetime,
+    end_date: datetime,
+    duration: timedelta,
+    limit: int,
+    room_ids: list[int] | None = None,
+) -> list[tuple[Room, datetime]]:
+    return await db.run_sync(
+        rooms.get_free_slots, start_date, end_date, duration, limit, room_ids
+    )
+
+
+async def create_room(db: AsyncSession, name: str) -> Room:
+    return await db.run_sync(rooms.create_room, name)
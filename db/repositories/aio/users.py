@@ -0,0 +1,11 @@
+from db.models.users import User
+from db.repositories import users
+from sqlalchemy.ext.asyncio import AsyncSession
+
+
+async def save_user(db: AsyncSession, user: User) -> User:
+    return await db.run_sync(users.save_user, user)
+
+
+async def find_user_by_email(db: AsyncSession, email: str) -> User:
+    return await db.run_sync(users.find_user_by_email, email)
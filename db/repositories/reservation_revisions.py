@@ -0,0 +1,57 @@
+from collections.abc import Iterable
+
+from db.models.reservation_revisions import ALL_USERS, ReservationRevision
+from sqlalchemy import select
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.orm import Session
+
+# inserts with ON CONFLICT DO UPDATE
+UPSERTS = {"sqlite": sqlite.insert, "postgresql": postgresql.insert}
+
+
+def _upsert_revisions(db: Session, user_ids: Iterable[int]):
+    upsert = UPSERTS[db.get_bind().dialect.name]
+    statement = upsert(ReservationRevision).values(
+        [{"user_id": user_id, "revision": 1} for user_id in user_ids]
+    )
+    return statement.on_conflict_do_update(
+        index_elements=[ReservationRevision.user_id],
+        set_={"revision": ReservationRevision.revision + 1},
+    )
+
+
+def bump_revisions(db: Session, user_ids: Iterable[int]):
+    """
+    The reservations of these users change in the transaction: their revisions
+    are incremented with it. The revision of all the reservations is incremented
+    once the change is committed (bump_all_revision): its row would be locked by
+    every transaction until its commit, serializing the changes of all the rooms.
+    """
+    # the rows are locked in the same order by all the transactions
+    db.execute(_upsert_revisions(db, sorted(set(user_ids))))
+
+
+def bump_all_revision(db: Session) -> int:
+    """
+    Increment the revision of all the reservations after a committed change, in
+    its own transaction (its row is only locked by the statement). Return the new
+    revision.
+    """
+    revision = db.scalar(
+        _upsert_revisions(db, [ALL_USERS]).returning(ReservationRevision.revision)
+    )
+    db.commit()
+    return revision
+
+
+def get_revision(db: Session, user_id: int = ALL_USERS) -> int:
+    """
+    Revision of the last change of the reservations of the user (or of all of
+    them), a single lookup of the primary key.
+    """
+    revision = db.scalar(
+        select(ReservationRevision.revision).where(
+            ReservationRevision.user_id == user_id
+        )
+    )
+    return revision or 0
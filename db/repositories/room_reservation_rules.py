@@ -0,0 +1,129 @@
+from datetime import datetime
+
+from db.availability_cache import availability_cache
+from db.models.room_reservation_rules import (
+    RoomReservationRule,
+    RoomReservationRuleException,
+)
+from db.repositories.reservation_revisions import bump_all_revision, bump_revisions
+from db.reservation_index import Interval, to_naive_utc
+from db.room_occupancy import room_occupancy
+from sqlalchemy import or_
+from sqlalchemy.orm import Session, joinedload, selectinload
+
+# the occurrences of the rules aren't stored, they have this id in the intervals
+RULE_OCCURRENCE_ID = 0
+
+
+def get_rules_between_dates(
+    db: Session,
+    start_date: datetime,
+    end_date: datetime,
+    room_ids: list[int] | None = None,
+) -> list[RoomReservationRule]:
+    """
+    Return the rules which can have occurrences between the dates, with only their
+    exceptions between the dates.
+    """
+    start_date, end_date = to_naive_utc(start_date), to_naive_utc(end_date)
+    query = (
+        db.query(RoomReservationRule)
+        .options(
+            joinedload(RoomReservationRule.user),
+            joinedload(RoomReservationRule.room),
+            selectinload(
+                RoomReservationRule.exceptions.and_(
+                    RoomReservationRuleException.start_date < end_date,
+                    RoomReservationRuleException.end_date > start_date,
+                )
+            ),
+        )
+        .filter(RoomReservationRule.start_date < end_date)
+        .filter(
+            or_(
+                RoomReservationRule.until.is_(None),
+                RoomReservationRule.until > start_date,
+            )
+        )
+    )
+    if room_ids is not None:
+        query = query.filter(RoomReservationRule.room_id.in_(room_ids))
+    return query.order_by(RoomReservationRule.room_id, RoomReservationRule.id).all()
+
+
+def get_occurrences_between_dates(
+    db: Session,
+    start_date: datetime,
+    end_date: datetime,
+    room_ids: list[int] | None = None,
+) -> list[tuple[RoomReservationRule, datetime, datetime]]:
+    """
+    Return the occurrences of the rules overlapping the dates, as (rule, start_date,
+    end_date) sorted by room, they are generated only inside the dates.
+    """
+    start_date, end_date = to_naive_utc(start_date), to_naive_utc(end_date)
+    return [
+        (rule, occurrence_start_date, occurrence_end_date)
+        for rule in get_rules_between_dates(db, start_date, end_date, room_ids)
+        for occurrence_start_date, occurrence_end_date in rule.get_occurrences(
+            start_date, end_date
+        )
+    ]
+
+
+def get_occurrence_intervals_on_room_between_dates(
+    db: Session, room_id: int, start_date: datetime, end_date: datetime
+) -> list[Interval]:
+    return [
+        (occurrence_start_date, occurrence_end_date, RULE_OCCURRENCE_ID)
+        for _, occurrence_start_date, occurrence_end_date in (
+            get_occurrences_between_dates(db, start_date, end_date, [room_id])
+        )
+    ]
+
+
+def get_room_reservation_rule_by_id(
+    db: Session, rule_id: int
+) -> RoomReservationRule | None:
+    return (
+        db.query(RoomReservationRule)
+        .options(
+            joinedload(RoomReservationRule.user),
+            joinedload(RoomReservationRule.room),
+            selectinload(RoomReservationRule.exceptions),
+        )
+        .filter(RoomReservationRule.id == rule_id)
+        .first()
+    )
+
+
+def add_room_reservation_rule_exception(
+    db: Session, rule: RoomReservationRule, start_date: datetime, end_date: datetime
+) -> RoomReservationRule:
+    rule.exceptions.append(
+        RoomReservationRuleException(
+            start_date=to_naive_utc(start_date), end_date=to_naive_utc(end_date)
+        )
+    )
+    bump_revisions(db, [rule.user_id])
+    db.commit()
+    # the occurrences of the rules aren't in the bitmaps
+    room_occupancy.follow(bump_all_revision(db))
+    availability_cache.invalidate(rule.room_id, start_date, end_date, True)
+    return get_room_reservation_rule_by_id(db, rule.id)
+
+
+def delete_room_reservation_rule(db: Session, rule: RoomReservationRule):
+    user_id = rule.user_id
+    invalidated_values = (
+        rule.room_id,
+        rule.start_date,
+        rule.until or datetime.max,
+        True,
+    )
+    db.delete(rule)
+    bump_revisions(db, [user_id])
+    db.commit()
+    # the occurrences of the rules aren't in the bitmaps
+    room_occupancy.follow(bump_all_revision(db))
+    availability_cache.invalidate(*invalidated_values)
@@ -1,28 +1,55 @@
 from datetime import date, datetime
 
-from db.models.room_reservations import RoomReservation
+from db.availability_cache import availability_cache
+from db.models.room_reservation_rules import RoomReservationRule
+from db.models.room_reservations import ArchivedRoomReservation, RoomReservation
 from db.models.rooms import Room
 from db.models.users import User
-from sqlalchemy import desc
+from db.repositories.reservation_revisions import bump_all_revision, bump_revisions
+from db.repositories.room_reservation_rules import (
+    RULE_OCCURRENCE_ID,
+    get_occurrence_intervals_on_room_between_dates,
+    get_rules_between_dates,
+)
+from db.reservation_index import (
+    Interval,
+    RoomIntervals,
+    reservation_index,
+    to_naive_utc,
+)
+from db.room_occupancy import HOUR, room_occupancy
+from schemas.users import UserDTO
+from sqlalchemy import (
+    ColumnElement,
+    Row,
+    Select,
+    and_,
+    delete,
+    desc,
+    func,
+    insert,
+    or_,
+    select,
+    union_all,
+    update,
+)
 from sqlalchemy.orm import Session
+from sqlalchemy.orm.attributes import set_committed_value
 
 
-def get_all_reservation_by_user(
-    db: Session, user: User, limit: int, page: int
-) -> tuple[list[RoomReservation], int, int, int]:
-    reservations_query = db.query(RoomReservation).filter(
-        RoomReservation.user_id == user.id
-    )
+class RoomAlreadyReservedError(Exception):
+    def __init__(self, intervals: list[Interval]):
+        super().__init__("Room is already reserved")
+        # (start_date, end_date, id) of the conflicting reservations
+        self.intervals = intervals
 
-    total = reservations_query.count()
 
-    reservations = (
-        reservations_query.order_by(desc(RoomReservation.start_date))
-        .limit(limit)
-        .offset(page * limit)
-        .all()
+def count_reservations_by_user(db: Session, user: UserDTO) -> int:
+    # archived ones included
+    return sum(
+        db.query(model).filter(model.user_id == user.id).count()
+        for model in (RoomReservation, ArchivedRoomReservation)
     )
-    return reservations, total, limit, page
 
 
 def get_all_reservation_on_room_between_dates(
@@ -38,20 +65,281 @@ def get_all_reservation_on_room_between_dates(
 
 
 def create_room_reservation(
-    db: Session, room: Room, user: User, start_date: datetime, end_date: datetime
+    db: Session, room: Room, user: UserDTO, start_date: datetime, end_date: datetime
 ) -> RoomReservation:
+    # the dates are kept as stored (naive UTC) and the id comes from the insert:
+    # the reservation doesn't need a refresh
     reservation = RoomReservation(
-        room_id=room.id, user_id=user.id, start_date=start_date, end_date=end_date
+        room_id=room.id,
+        user_id=user.id,
+        start_date=to_naive_utc(start_date),
+        end_date=to_naive_utc(end_date),
     )
     db.add(reservation)
+    bump_revisions(db, [reservation.user_id])
     db.commit()
-    db.refresh(reservation)
+    revision = bump_all_revision(db)
+    # the user given is an identity (see get_current_user), only the room is set
+    set_committed_value(reservation, "room", room)
+    reservation_index.add(
+        reservation.room_id,
+        reservation.start_date,
+        reservation.end_date,
+        reservation.id,
+    )
+    room_occupancy.add(
+        reservation.room_id, reservation.start_date, reservation.end_date
+    )
+    room_occupancy.follow(revision)
+    availability_cache.invalidate(
+        reservation.room_id, reservation.start_date, reservation.end_date, False
+    )
     return reservation
 
 
+def lock_room(db: Session, room_id: int):
+    """
+    Lock the room until the end of the transaction, to check and create its
+    reservations without concurrent changes.
+    """
+    # a no-op update locks the row (and takes the write lock with sqlite)
+    db.execute(
+        update(Room)
+        .where(Room.id == room_id)
+        .values(id=Room.id)
+        .execution_options(synchronize_session=False)
+    )
+
+
+def reserve_room(
+    db: Session, room: Room, user: UserDTO, start_date: datetime, end_date: datetime
+) -> RoomReservation:
+    """
+    Create a reservation if the room is free between the dates, or raise a
+    RoomAlreadyReservedError (the transaction is then rolled back).
+    The row of the room is locked before the check, so concurrent reservations of
+    the same room are serialized until the commit while the other rooms aren't
+    blocked (sqlite serializes all the writes anyway).
+    """
+    lock_room(db, room.id)
+    overlapping = [
+        (reservation.start_date, reservation.end_date, reservation.id)
+        for reservation in get_all_reservation_on_room_between_dates(
+            db, room, start_date, end_date
+        )
+    ] + get_occurrence_intervals_on_room_between_dates(
+        db, room.id, start_date, end_date
+    )
+    if overlapping:
+        db.rollback()
+        raise RoomAlreadyReservedError(overlapping)
+    return create_room_reservation(db, room, user, start_date, end_date)
+
+
+def reserve_rooms(
+    db: Session,
+    user: UserDTO,
+    requests: list[tuple[int, datetime, datetime]],
+    all_or_nothing: bool = True,
+) -> tuple[list[int | None], list[list[Interval]]]:
+    """
+    Create the reservations of many (room_id, start_date, end_date) at once, with
+    the rooms locked like reserve_room, one query by room to find the conflicts
+    and a single insert.
+    A request conflicts with the existing reservations and with the previous
+    requests of the list, which are reported with the id -(position + 1).
+    If all_or_nothing, nothing is created when a request conflicts.
+    Return the id of the created reservation (or None) and the conflicting
+    intervals of each request.
+    """
+    return reserve_rooms_of_users(
+        db,
+        [
+            (user.id, room_id, start_date, end_date)
+            for room_id, start_date, end_date in requests
+        ],
+        all_or_nothing,
+    )
+
+
+def reserve_rooms_of_users(
+    db: Session,
+    requests: list[tuple[int, int, datetime, datetime]],
+    all_or_nothing: bool = True,
+) -> tuple[list[int | None], list[list[Interval]]]:
+    """
+    reserve_rooms for (user_id, room_id, start_date, end_date) requests of
+    different users, in a single transaction.
+    """
+    # dates are stored in the database without timezone as UTC
+    requests = [
+        (user_id, room_id, to_naive_utc(start_date), to_naive_utc(end_date))
+        for user_id, room_id, start_date, end_date in requests
+    ]
+    rooms_bounds: dict[int, tuple[datetime, datetime]] = {}
+    for _, room_id, start_date, end_date in requests:
+        bounds = rooms_bounds.get(room_id, (start_date, end_date))
+        rooms_bounds[room_id] = (min(bounds[0], start_date), max(bounds[1], end_date))
+
+    rooms_intervals: dict[int, RoomIntervals] = {}
+    # the rooms are locked in the same order by all the transactions
+    for room_id, (start_date, end_date) in sorted(rooms_bounds.items()):
+        lock_room(db, room_id)
+        rooms_intervals[room_id] = RoomIntervals()
+        for interval in get_occurrence_intervals_on_room_between_dates(
+            db, room_id, start_date, end_date
+        ):
+            rooms_intervals[room_id].add(interval)
+        for interval in (
+            db.query(
+                RoomReservation.start_date,
+                RoomReservation.end_date,
+                RoomReservation.id,
+            )
+            .filter(RoomReservation.room_id == room_id)
+            .filter(RoomReservation.start_date < end_date)
+            .filter(RoomReservation.end_date > start_date)
+        ):
+            rooms_intervals[room_id].add(tuple(interval))
+
+    conflicts: list[list[Interval]] = []
+    for position, (_, room_id, start_date, end_date) in enumerate(requests):
+        overlapping = rooms_intervals[room_id].overlapping(start_date, end_date)
+        if not overlapping:
+            rooms_intervals[room_id].add((start_date, end_date, -(position + 1)))
+        conflicts.append(overlapping)
+
+    accepted = [
+        position for position, overlapping in enumerate(conflicts) if not overlapping
+    ]
+    if not accepted or (all_or_nothing and len(accepted) < len(requests)):
+        db.rollback()
+        return [None] * len(requests), conflicts
+
+    ids = db.scalars(
+        insert(RoomReservation).returning(
+            RoomReservation.id, sort_by_parameter_order=True
+        ),
+        [
+            {
+                "room_id": requests[position][1],
+                "user_id": requests[position][0],
+                "start_date": requests[position][2],
+                "end_date": requests[position][3],
+            }
+            for position in accepted
+        ],
+    ).all()
+    bump_revisions(db, {requests[position][0] for position in accepted})
+    db.commit()
+    revision = bump_all_revision(db)
+
+    created_ids: list[int | None] = [None] * len(requests)
+    for position, id_ in zip(accepted, ids):
+        _, room_id, start_date, end_date = requests[position]
+        reservation_index.add(room_id, start_date, end_date, id_)
+        room_occupancy.add(room_id, start_date, end_date)
+        availability_cache.invalidate(room_id, start_date, end_date, False)
+        created_ids[position] = id_
+    room_occupancy.follow(revision)
+    return created_ids, conflicts
+
+
+def reserve_room_with_rule(
+    db: Session,
+    room: Room,
+    user: UserDTO,
+    start_date: datetime,
+    end_date: datetime,
+    frequency: str,
+    interval: int,
+    until: datetime | None,
+) -> RoomReservationRule:
+    """
+    Create a recurring reservation if none of its occurrences conflicts with the
+    reservations and the occurrences of the other rules of the room, or raise a
+    RoomAlreadyReservedError like reserve_room.
+    """
+    rule = RoomReservationRule(
+        room_id=room.id,
+        user_id=user.id,
+        start_date=to_naive_utc(start_date),
+        end_date=to_naive_utc(end_date),
+        frequency=frequency,
+        interval=interval,
+        until=to_naive_utc(until) if until is not None else None,
+    )
+    lock_room(db, room.id)
+
+    overlapping: list[Interval] = []
+    # the stored reservations bound the search, whatever the length of the series
+    reservations_query = (
+        db.query(
+            RoomReservation.start_date, RoomReservation.end_date, RoomReservation.id
+        )
+        .filter(RoomReservation.room_id == room.id)
+        .filter(RoomReservation.end_date > rule.start_date)
+    )
+    if rule.until is not None:
+        reservations_query = reservations_query.filter(
+            RoomReservation.start_date < rule.until
+        )
+    for (
+        reservation_start_date,
+        reservation_end_date,
+        reservation_id,
+    ) in reservations_query:
+        if next(
+            rule.get_occurrences(reservation_start_date, reservation_end_date), None
+        ):
+            overlapping.append(
+                (reservation_start_date, reservation_end_date, reservation_id)
+            )
+    for other_rule in get_rules_between_dates(
+        db, rule.start_date, rule.until or datetime.max, [room.id]
+    ):
+        overlap = rule.get_overlap_with_rule(other_rule)
+        if overlap is not None:
+            overlapping.append((*overlap, RULE_OCCURRENCE_ID))
+    if overlapping:
+        db.rollback()
+        raise RoomAlreadyReservedError(sorted(overlapping))
+
+    db.add(rule)
+    bump_revisions(db, [rule.user_id])
+    db.commit()
+    # the occurrences of the rules aren't in the bitmaps
+    room_occupancy.follow(bump_all_revision(db))
+    db.refresh(rule)
+    availability_cache.invalidate(
+        rule.room_id, rule.start_date, rule.until or datetime.max, False
+    )
+    return rule
+
+
 def delete_room_reservation(db: Session, reservation: RoomReservation):
+    user_id = reservation.user_id
+    indexed_values = (
+        reservation.room_id,
+        reservation.start_date,
+        reservation.end_date,
+        reservation.id,
+    )
     db.delete(reservation)
+    bump_revisions(db, [user_id])
     db.commit()
+    revision = bump_all_revision(db)
+    reservation_index.remove(*indexed_values)
+    room_id, start_date, end_date, _ = indexed_values
+    # the reservations sharing an hour with the deleted one keep it occupied
+    room_occupancy.remove(
+        room_id,
+        start_date,
+        end_date,
+        reservation_index.find_overlapping(room_id, start_date - HOUR, end_date + HOUR),
+    )
+    room_occupancy.follow(revision)
+    availability_cache.invalidate(room_id, start_date, end_date, True)
 
 
 def get_room_reservation_by_id(
@@ -62,14 +350,168 @@ def get_room_reservation_by_id(
     )
 
 
-def get_all_rooms_reservations_between_dates(
-    db: Session, start_date: date, end_date: date
-) -> list[RoomReservation]:
+# read-only listings: the reservations are read as rows of the columns sent to the
+# clients, without the ORM entities (identity map, unit of work, lazy loads) nor
+# the unused columns (hashed_password of the users)
 
+
+def select_reservation_rows(
+    model: type[RoomReservation | ArchivedRoomReservation] = RoomReservation,
+) -> Select:
+    """
+    Rows (id, start_date, end_date, room_id, room_name, user_id, user_email) of the
+    reservations (or of the archived ones), see dump_room_reservation_row.
+    """
     return (
-        db.query(RoomReservation)
-        .filter(RoomReservation.start_date < end_date)
-        .filter(RoomReservation.end_date > start_date)
-        .order_by(RoomReservation.start_date)
-        .all()
+        select(
+            model.id,
+            model.start_date,
+            model.end_date,
+            model.room_id,
+            Room.name.label("room_name"),
+            model.user_id,
+            User.email.label("user_email"),
+        )
+        .join(Room, Room.id == model.room_id)
+        .join(User, User.id == model.user_id)
+    )
+
+
+def select_table_reservation_rows_by_user(
+    model: type[RoomReservation | ArchivedRoomReservation],
+    user: UserDTO,
+    before: tuple[datetime, int] | None = None,
+) -> Select:
+    # sorted by date, newest first: keyset pagination with before, the
+    # (start_date, id) of the last reservation of the previous page, the index on
+    # (user_id, start_date, id) is used to seek the first reservation
+    query = select_reservation_rows(model).where(model.user_id == user.id)
+    if before is not None:
+        before_start_date, before_id = before
+        # the first condition alone can be used as an index range
+        query = query.where(model.start_date <= before_start_date).where(
+            or_(
+                model.start_date < before_start_date,
+                and_(model.start_date == before_start_date, model.id < before_id),
+            )
+        )
+    return query.order_by(desc(model.start_date), desc(model.id))
+
+
+def select_reservation_rows_by_user(
+    user: UserDTO,
+    limit: int,
+    offset: int = 0,
+    before: tuple[datetime, int] | None = None,
+) -> Select:
+    """
+    A page of the reservations of a user, current and archived: each table gives
+    its offset + limit first rows (a seek in its (user_id, start_date, id) index)
+    and only these rows are merged and sorted.
+    """
+    tables = [
+        select_table_reservation_rows_by_user(model, user, before)
+        .limit(offset + limit)
+        .subquery()
+        for model in (RoomReservation, ArchivedRoomReservation)
+    ]
+    rows = union_all(*(select(table) for table in tables)).subquery()
+    return (
+        select(rows)
+        .order_by(desc(rows.c.start_date), desc(rows.c.id))
+        .limit(limit)
+        .offset(offset)
     )
+
+
+def get_reservation_rows_by_user(
+    db: Session, user: UserDTO, limit: int, page: int, with_total: bool = True
+) -> tuple[list[Row], int | None, int, int]:
+    # archived reservations included
+    total = count_reservations_by_user(db, user) if with_total else None
+    rows = db.execute(select_reservation_rows_by_user(user, limit, page * limit)).all()
+    return rows, total, limit, page
+
+
+def get_reservation_rows_by_user_before(
+    db: Session, user: UserDTO, limit: int, before: tuple[datetime, int] | None = None
+) -> list[Row]:
+    # keyset pagination, archived reservations included: deep pages are as fast
+    # as the first one
+    return db.execute(select_reservation_rows_by_user(user, limit, before=before)).all()
+
+
+def archive_overlaps(start_date: date) -> ColumnElement[bool]:
+    """
+    Pruning of the archive: it only has reservations ended by its last end date,
+    the ones overlapping dates from start_date are read in it only if start_date
+    is before (never for the current dates). The condition doesn't depend on the
+    rows, it's checked once before reading the table.
+    """
+    return (
+        select(func.max(ArchivedRoomReservation.end_date)).scalar_subquery()
+        > start_date
+    )
+
+
+def select_all_rooms_reservation_rows_between_dates(
+    start_date: date, end_date: date
+) -> Select:
+    # current and archived reservations, the columns to sort by are in the
+    # selected_columns of the query
+    return select(
+        union_all(
+            select_reservation_rows()
+            .where(RoomReservation.start_date < end_date)
+            .where(RoomReservation.end_date > start_date),
+            select_reservation_rows(ArchivedRoomReservation)
+            .where(archive_overlaps(start_date))
+            .where(ArchivedRoomReservation.start_date < end_date)
+            .where(ArchivedRoomReservation.end_date > start_date),
+        ).subquery()
+    )
+
+
+def get_all_rooms_reservation_rows_between_dates(
+    db: Session, start_date: date, end_date: date
+) -> list[Row]:
+    # archived reservations included
+    query = select_all_rooms_reservation_rows_between_dates(start_date, end_date)
+    return db.execute(query.order_by(query.selected_columns.start_date)).all()
+
+
+def archive_reservations(db: Session, before: datetime, batch_size: int) -> int:
+    """
+    Move the reservations ended before the date to archived_room_reservation, by
+    batches of a transaction each. Return the number of archived reservations.
+    The ended reservations can't change anymore (nor conflict with a new one) and
+    the listings read both tables: the caches are left as they are.
+    """
+    archived = 0
+    while True:
+        ids = db.scalars(
+            select(RoomReservation.id)
+            .where(RoomReservation.end_date <= to_naive_utc(before))
+            .order_by(RoomReservation.end_date)
+            .limit(batch_size)
+        ).all()
+        if not ids:
+            return archived
+        columns = ["id", "start_date", "end_date", "room_id", "user_id"]
+        db.execute(
+            insert(ArchivedRoomReservation).from_select(
+                columns,
+                select(*(getattr(RoomReservation, column) for column in columns)).where(
+                    RoomReservation.id.in_(ids)
+                ),
+            )
+        )
+        db.execute(
+            delete(RoomReservation)
+            .where(RoomReservation.id.in_(ids))
+            .execution_options(synchronize_session=False)
+        )
+        db.commit()
+        archived += len(ids)
+        if len(ids) < batch_size:
+            return archived
@@ -1,8 +1,21 @@
-from datetime import datetime
+import heapq
+from collections.abc import Iterator
+from datetime import datetime, timedelta
+from itertools import islice
 
-from db.models.room_reservations import RoomReservation
+from db.availability_cache import availability_cache
+from db.models.room_reservations import (
+    ArchivedRoomReservation,
+    RoomReservation,
+    get_free_start_dates,
+)
 from db.models.rooms import Room
-from sqlalchemy import not_
+from db.repositories.room_reservation_rules import get_occurrences_between_dates
+from db.repositories.room_reservations import archive_overlaps
+from db.reservation_index import to_naive_utc
+from db.room_catalog import room_catalog
+from db.room_occupancy import room_occupancy
+from sqlalchemy import exists
 from sqlalchemy.orm import Session
 
 
@@ -14,22 +27,117 @@ def get_room_by_id(db: Session, room_id: int) -> Room:
     return db.query(Room).filter(Room.id == room_id).first()
 
 
+def get_rooms_by_ids(db: Session, room_ids: list[int]) -> list[Room]:
+    return db.query(Room).filter(Room.id.in_(room_ids)).all()
+
+
 def get_all_rooms_without_reservations_between_dates(
     db: Session, start_date: datetime, end_date: datetime
 ) -> list[Room]:
-    overlapping_reservations = (
-        db.query(RoomReservation.room_id)
-        .filter(
-            RoomReservation.start_date < end_date, RoomReservation.end_date > start_date
+    # the occurrences of the rules are generated only between the dates
+    reserved_room_ids = {
+        rule.room_id
+        for rule, _, _ in get_occurrences_between_dates(db, start_date, end_date)
+    }
+    # the occupancy bitmaps answer without scanning the reservations, while no
+    # other process changed them
+    occupied_room_ids = room_occupancy.find_occupied_room_ids(start_date, end_date)
+    if occupied_room_ids is not None and room_occupancy.is_current(db):
+        reserved_room_ids |= occupied_room_ids
+        query = db.query(Room)
+    else:
+        # anti-join: a room is available if no reservation of the room overlaps
+        # the dates, each room is checked with a seek in the overlap index (of the
+        # archive too for the past dates)
+        query = db.query(Room).filter(
+            ~exists()
+            .where(RoomReservation.room_id == Room.id)
+            .where(RoomReservation.start_date < end_date)
+            .where(RoomReservation.end_date > start_date),
+            ~exists()
+            .where(archive_overlaps(start_date))
+            .where(ArchivedRoomReservation.room_id == Room.id)
+            .where(ArchivedRoomReservation.start_date < end_date)
+            .where(ArchivedRoomReservation.end_date > start_date),
+        )
+    return [room for room in query.all() if room.id not in reserved_room_ids]
+
+
+def get_free_slots(
+    db: Session,
+    start_date: datetime,
+    end_date: datetime,
+    duration: timedelta,
+    limit: int,
+    room_ids: list[int] | None = None,
+    step: timedelta = timedelta(hours=1),
+) -> list[tuple[Room, datetime]]:
+    """
+    Return the earliest limit (room, start_date) where the room is free for
+    duration inside [start_date, end_date), the start dates being every step from
+    start_date, sorted by start date and room id.
+    The reservations overlapping the dates are read with a single query sorted by
+    room, each room is swept once and the rooms are merged lazily, so only the
+    slots up to the limit are generated.
+    """
+    start_date, end_date = to_naive_utc(start_date), to_naive_utc(end_date)
+    rooms_query = db.query(Room)
+    reservations_query = (
+        db.query(
+            RoomReservation.room_id,
+            RoomReservation.start_date,
+            RoomReservation.end_date,
         )
-        .subquery()
+        .filter(RoomReservation.start_date < end_date)
+        .filter(RoomReservation.end_date > start_date)
     )
-    return db.query(Room).filter(not_(Room.id.in_(overlapping_reservations))).all()
+    if room_ids is not None:
+        rooms_query = rooms_query.filter(Room.id.in_(room_ids))
+        reservations_query = reservations_query.filter(
+            RoomReservation.room_id.in_(room_ids)
+        )
+    rooms = rooms_query.order_by(Room.id).all()
+
+    busy_date_ranges: dict[int, list[tuple[datetime, datetime]]] = {}
+    for (
+        room_id,
+        reservation_start_date,
+        reservation_end_date,
+    ) in reservations_query.order_by(
+        RoomReservation.room_id, RoomReservation.start_date
+    ):
+        busy_date_ranges.setdefault(room_id, []).append(
+            (reservation_start_date, reservation_end_date)
+        )
+    occurrences = get_occurrences_between_dates(db, start_date, end_date, room_ids)
+    for rule, occurrence_start_date, occurrence_end_date in occurrences:
+        busy_date_ranges.setdefault(rule.room_id, []).append(
+            (occurrence_start_date, occurrence_end_date)
+        )
+    if occurrences:
+        for room_busy_date_ranges in busy_date_ranges.values():
+            room_busy_date_ranges.sort()
+
+    def get_room_free_slots(room: Room) -> Iterator[tuple[datetime, int]]:
+        for free_start_date in get_free_start_dates(
+            busy_date_ranges.get(room.id, []), start_date, end_date, duration, step
+        ):
+            yield free_start_date, room.id
+
+    rooms_by_id = {room.id: room for room in rooms}
+    free_slots = heapq.merge(*(get_room_free_slots(room) for room in rooms))
+    return [
+        (rooms_by_id[room_id], free_start_date)
+        for free_start_date, room_id in islice(free_slots, limit)
+    ]
 
 
 def create_room(db: Session, name: str) -> Room:
     room = Room(name=name)
+    # the id comes from the insert, no refresh needed
     db.add(room)
     db.commit()
-    db.refresh(room)
+    # a new room is available in all the cached windows
+    availability_cache.clear()
+    room_catalog.add(room)
     return room
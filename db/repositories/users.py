@@ -4,9 +4,9 @@ from db.models.users import User
 
 
 def save_user(db: Session, user: User) -> User:
+    # the id comes from the insert, no refresh needed
     db.add(user)
     db.commit()
-    db.refresh(user)
     return user
 
 
@@ -0,0 +1,177 @@
+from bisect import bisect_left, insort
+from datetime import datetime, timedelta, timezone
+from threading import RLock
+
+from db.models.room_reservations import RoomReservation
+from db.session import reading_writer
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+Interval = tuple[datetime, datetime, int]
+
+
+def to_naive_utc(value: datetime) -> datetime:
+    # dates are stored in the database without timezone as UTC
+    if value.tzinfo is not None and value.tzinfo.utcoffset(value) is not None:
+        return value.astimezone(timezone.utc).replace(tzinfo=None)
+    return value
+
+
+class RoomIntervals:
+    """
+    Reservations of a single room as (start_date, end_date, reservation_id) tuples
+    sorted by start_date.
+    """
+
+    def __init__(self):
+        self.intervals: list[Interval] = []
+        # longest reservation ever added, used to bound the lookups
+        self.max_duration = timedelta(0)
+
+    def add(self, interval: Interval):
+        insort(self.intervals, interval)
+        self.max_duration = max(self.max_duration, interval[1] - interval[0])
+
+    def remove(self, interval: Interval):
+        position = bisect_left(self.intervals, interval)
+        if position < len(self.intervals) and self.intervals[position] == interval:
+            del self.intervals[position]
+
+    def overlapping(self, start_date: datetime, end_date: datetime) -> list[Interval]:
+        # a reservation overlapping [start_date, end_date) starts before end_date and
+        # can't start before start_date - max_duration, so only this slice is inspected
+        low = bisect_left(self.intervals, (start_date - self.max_duration,))
+        high = bisect_left(self.intervals, (end_date,), lo=low)
+        return [
+            interval
+            for interval in self.intervals[low:high]
+            if interval[1] > start_date
+        ]
+
+
+class RoomReservationIndex:
+    """
+    In-memory index of the reservations per room, used to detect conflicts without
+    querying the database.
+    The database stays the source of truth: the index is loaded from it and is only
+    updated once a change has been committed. The conflicts it finds are confirmed
+    by the database (see confirm_overlapping), the other workers change it too.
+
+    Only the reservations which are not ended are indexed, a new reservation must
+    start in the future so it can't conflict with a past one.
+    """
+
+    def __init__(self):
+        self._rooms: dict[int, RoomIntervals] = {}
+        self._lock = RLock()
+        self.loaded = False
+
+    @staticmethod
+    def _query_reservations(db: Session) -> list[tuple[int, Interval]]:
+        now = datetime.now(timezone.utc).replace(tzinfo=None)
+        rows = (
+            db.query(
+                RoomReservation.room_id,
+                RoomReservation.start_date,
+                RoomReservation.end_date,
+                RoomReservation.id,
+            )
+            .filter(RoomReservation.end_date > now)
+            .all()
+        )
+        return [
+            (room_id, (to_naive_utc(start_date), to_naive_utc(end_date), id_))
+            for room_id, start_date, end_date, id_ in rows
+        ]
+
+    def load(self, db: Session):
+        rooms: dict[int, RoomIntervals] = {}
+        with reading_writer(db):
+            reservations = self._query_reservations(db)
+        for room_id, interval in reservations:
+            rooms.setdefault(room_id, RoomIntervals()).add(interval)
+        with self._lock:
+            self._rooms = rooms
+            self.loaded = True
+
+    def ensure_loaded(self, db: Session):
+        if not self.loaded:
+            self.load(db)
+
+    def clear(self):
+        with self._lock:
+            self._rooms = {}
+            self.loaded = False
+
+    def add(self, room_id: int, start_date: datetime, end_date: datetime, id_: int):
+        interval = (to_naive_utc(start_date), to_naive_utc(end_date), id_)
+        with self._lock:
+            self._rooms.setdefault(room_id, RoomIntervals()).add(interval)
+
+    def remove(self, room_id: int, start_date: datetime, end_date: datetime, id_: int):
+        interval = (to_naive_utc(start_date), to_naive_utc(end_date), id_)
+        with self._lock:
+            room_intervals = self._rooms.get(room_id)
+            if room_intervals is not None:
+                room_intervals.remove(interval)
+
+    def find_overlapping(
+        self, room_id: int, start_date: datetime, end_date: datetime
+    ) -> list[Interval]:
+        with self._lock:
+            room_intervals = self._rooms.get(room_id)
+            if room_intervals is None:
+                return []
+            return room_intervals.overlapping(
+                to_naive_utc(start_date), to_naive_utc(end_date)
+            )
+
+    def confirm_overlapping(
+        self, db: Session, room_id: int, start_date: datetime, end_date: datetime
+    ) -> list[Interval]:
+        """
+        find_overlapping, with the reservations found checked in the database: the
+        index only follows the changes of this process, the ones deleted by another
+        worker are removed from it.
+        """
+        overlapping = self.find_overlapping(room_id, start_date, end_date)
+        if not overlapping:
+            return []
+        with reading_writer(db):
+            stored_ids = set(
+                db.scalars(
+                    select(RoomReservation.id).where(
+                        RoomReservation.id.in_([id_ for _, _, id_ in overlapping])
+                    )
+                )
+            )
+        for interval in overlapping:
+            if interval[2] not in stored_ids:
+                self.remove(room_id, *interval)
+        return [interval for interval in overlapping if interval[2] in stored_ids]
+
+    def check(self, db: Session) -> tuple[list[int], list[int]]:
+        """
+        Compare the index with the database.
+        Return the ids of the reservations missing from the index and the ids of the
+        reservations indexed but not (or differently) stored in the database.
+        """
+        with reading_writer(db):
+            expected = set(self._query_reservations(db))
+        now = datetime.now(timezone.utc).replace(tzinfo=None)
+        with self._lock:
+            indexed = {
+                (room_id, interval)
+                for room_id, room_intervals in self._rooms.items()
+                for interval in room_intervals.intervals
+                if interval[1] > now
+            }
+        missing = sorted(interval[2] for _, interval in expected - indexed)
+        stale = sorted(interval[2] for _, interval in indexed - expected)
+        return missing, stale
+
+    def rebuild(self, db: Session):
+        self.load(db)
+
+
+reservation_index = RoomReservationIndex()
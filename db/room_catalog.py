@@ -0,0 +1,80 @@
+import hashlib
+import time
+from dataclasses import dataclass, field
+from threading import Lock
+
+from db.models.rooms import Room
+from db.session import reading_writer
+from pydantic import TypeAdapter
+from schemas.rooms import RoomDTO
+from settings import ROOM_CATALOG_TTL_SECONDS
+from sqlalchemy.orm import Session
+
+_rooms_adapter = TypeAdapter(list[RoomDTO])
+
+
+@dataclass(frozen=True)
+class RoomCatalogVersion:
+    # incremented on each change of the catalog
+    version: int = 0
+    rooms: list[RoomDTO] = field(default_factory=list)
+    # rooms serialized like the /rooms/ response
+    content: bytes = b"[]"
+    # derived from the content, so it stays the same across restarts and workers
+    etag: str = '"empty"'
+
+
+class RoomCatalog:
+    """
+    In-memory catalog of the rooms, which almost never change: loaded from the
+    database and refreshed by create_room, with the rooms already serialized.
+    It's reloaded ttl seconds after the last load, so the rooms created by the
+    other processes show up (with the same etag while nothing changed).
+    Each change replaces the whole RoomCatalogVersion, a reader always gets
+    consistent rooms, content and etag.
+    """
+
+    def __init__(self, ttl: float = ROOM_CATALOG_TTL_SECONDS):
+        self.current = RoomCatalogVersion()
+        self._lock = Lock()
+        self.ttl = ttl
+        self.loaded_at: float | None = None
+        self.loaded = False
+
+    def _set(self, rooms: list[RoomDTO]):
+        content = _rooms_adapter.dump_json(rooms)
+        etag = f'"{hashlib.blake2b(content, digest_size=16).hexdigest()}"'
+        if etag == self.current.etag:
+            return
+        self.current = RoomCatalogVersion(
+            self.current.version + 1, rooms, content, etag
+        )
+
+    def load(self, db: Session):
+        with reading_writer(db):
+            rooms = [
+                RoomDTO.model_validate(room)
+                for room in db.query(Room).order_by(Room.id).all()
+            ]
+        with self._lock:
+            self._set(rooms)
+            self.loaded_at = time.monotonic()
+            self.loaded = True
+
+    def ensure_loaded(self, db: Session):
+        if not self.loaded or time.monotonic() - self.loaded_at > self.ttl:
+            self.load(db)
+
+    def clear(self):
+        with self._lock:
+            self.current = RoomCatalogVersion()
+            self.loaded_at = None
+            self.loaded = False
+
+    def add(self, room: Room):
+        with self._lock:
+            if self.loaded:
+                self._set(self.current.rooms + [RoomDTO.model_validate(room)])
+
+
+room_catalog = RoomCatalog()
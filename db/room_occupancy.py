@@ -0,0 +1,277 @@
+from datetime import date, datetime, time, timedelta, timezone
+from threading import RLock
+
+import numpy as np
+from db.models.room_reservations import RoomReservation
+from db.repositories.reservation_revisions import get_revision
+from db.reservation_index import Interval, to_naive_utc
+from db.session import reading_writer
+from sqlalchemy.orm import Session
+
+HOUR = timedelta(hours=1)
+DAY = timedelta(days=1)
+
+
+def get_day_masks(start_date: datetime, end_date: datetime) -> dict[date, int]:
+    """
+    Split [start_date, end_date) (naive UTC dates) into the bitmaps of the hours it
+    covers by day, partial hours are counted as reserved.
+    """
+    # the hours are rounded outward: for a query on whole hours, the rounded
+    # reservation overlaps the query if and only if the reservation does
+    start_hour = start_date.replace(minute=0, second=0, microsecond=0)
+    end_hour = end_date.replace(minute=0, second=0, microsecond=0)
+    if end_hour < end_date:
+        end_hour += HOUR
+    masks = {}
+    day = start_hour.date()
+    while datetime.combine(day, time()) < end_hour:
+        day_start = datetime.combine(day, time())
+        first = max(start_hour - day_start, timedelta(0)) // HOUR
+        last = min(end_hour - day_start, DAY) // HOUR
+        masks[day] = ((1 << last) - 1) ^ ((1 << first) - 1)
+        day += DAY
+    return masks
+
+
+def is_whole_hour(value: datetime) -> bool:
+    return value.minute == 0 and value.second == 0 and value.microsecond == 0
+
+
+class RoomOccupancy:
+    """
+    In-memory occupancy of the rooms: one 24 bits bitmap (a bit by hour) by room
+    and by day, stored as one numpy array by day with a column by room.
+    The available rooms are found with bitwise ANDs over the days of the window
+    instead of a range scan of the reservations.
+
+    Like the reservation index, it's loaded from the database, which stays the
+    source of truth, only the days from the loading date are covered and the
+    repositories update it once a change has been committed.
+    The bitmaps answer only while they follow the revision of all the reservations
+    (see bump_all_revision): once another process changed them, they are
+    reloaded.
+    """
+
+    def __init__(self):
+        self._days: dict[date, np.ndarray] = {}
+        # column of the rooms in the arrays
+        self._columns: dict[int, int] = {}
+        self._room_ids: list[int] = []
+        self._capacity = 0
+        self._lock = RLock()
+        self.covered_from: date | None = None
+        # revision of the changes in the bitmaps, None once one has been missed
+        self.revision: int | None = None
+        self.loaded = False
+
+    @staticmethod
+    def _query_reservations(
+        db: Session, covered_from: date
+    ) -> list[tuple[int, datetime, datetime]]:
+        return (
+            db.query(
+                RoomReservation.room_id,
+                RoomReservation.start_date,
+                RoomReservation.end_date,
+            )
+            .filter(RoomReservation.end_date > datetime.combine(covered_from, time()))
+            .all()
+        )
+
+    def _get_column(self, room_id: int) -> int:
+        column = self._columns.get(room_id)
+        if column is None:
+            column = len(self._room_ids)
+            if column == self._capacity:
+                # the arrays of all the days grow together
+                self._capacity = max(2 * self._capacity, 64)
+                for day, array in self._days.items():
+                    self._days[day] = np.resize(array, self._capacity)
+                    self._days[day][column:] = 0
+            self._columns[room_id] = column
+            self._room_ids.append(room_id)
+        return column
+
+    def _set(self, room_id: int, start_date: datetime, end_date: datetime):
+        column = self._get_column(room_id)
+        for day, mask in get_day_masks(start_date, end_date).items():
+            array = self._days.get(day)
+            if array is None:
+                array = self._days[day] = np.zeros(self._capacity, dtype=np.uint32)
+            array[column] |= mask
+
+    def _set_all(self, reservations: list[tuple[int, datetime, datetime]]):
+        # the reservations of a single day (almost all of them) are grouped by day
+        # and set at once, the other ones are split by get_day_masks
+        columns: list[int] = []
+        days: list[int] = []
+        masks: list[int] = []
+        for room_id, start_date, end_date in reservations:
+            start_date, end_date = to_naive_utc(start_date), to_naive_utc(end_date)
+            day = start_date.toordinal()
+            last = end_date.hour + (not is_whole_hour(end_date))
+            if end_date.toordinal() != day:
+                if end_date.toordinal() != day + 1 or last != 0:
+                    self._set(room_id, start_date, end_date)
+                    continue
+                last = 24
+            columns.append(self._get_column(room_id))
+            days.append(day)
+            masks.append((1 << last) - (1 << start_date.hour))
+        if not days:
+            return
+        ordinals, positions = np.unique(days, return_inverse=True)
+        bitmaps = np.zeros((len(ordinals), self._capacity), dtype=np.uint32)
+        np.bitwise_or.at(
+            bitmaps, (positions, columns), np.array(masks, dtype=np.uint32)
+        )
+        for ordinal, day_bitmaps in zip(ordinals.tolist(), bitmaps):
+            day = date.fromordinal(ordinal)
+            array = self._days.get(day)
+            if array is None:
+                self._days[day] = day_bitmaps
+            else:
+                array |= day_bitmaps
+
+    def load(self, db: Session):
+        covered_from = datetime.now(timezone.utc).date()
+        occupancy = RoomOccupancy()
+        with reading_writer(db):
+            # read first: a change committed meanwhile makes the bitmaps stale
+            revision = get_revision(db)
+            reservations = self._query_reservations(db, covered_from)
+        occupancy._set_all(reservations)
+        with self._lock:
+            self._days = occupancy._days
+            self._columns = occupancy._columns
+            self._room_ids = occupancy._room_ids
+            self._capacity = occupancy._capacity
+            self.covered_from = covered_from
+            self.revision = revision
+            self.loaded = True
+
+    def ensure_loaded(self, db: Session):
+        if not self.loaded:
+            self.load(db)
+
+    def clear(self):
+        with self._lock:
+            self._days = {}
+            self._columns = {}
+            self._room_ids = []
+            self._capacity = 0
+            self.covered_from = None
+            self.revision = None
+            self.loaded = False
+
+    def add(self, room_id: int, start_date: datetime, end_date: datetime):
+        with self._lock:
+            self._set(room_id, to_naive_utc(start_date), to_naive_utc(end_date))
+
+    def remove(
+        self,
+        room_id: int,
+        start_date: datetime,
+        end_date: datetime,
+        remaining: list[Interval] = (),
+    ):
+        """
+        Free the hours of a deleted reservation, the remaining reservations of the
+        room overlapping these hours (only possible if they don't start or end on a
+        whole hour) are set again.
+        """
+        with self._lock:
+            column = self._columns.get(room_id)
+            if column is None:
+                return
+            for day, mask in get_day_masks(
+                to_naive_utc(start_date), to_naive_utc(end_date)
+            ).items():
+                array = self._days.get(day)
+                if array is not None:
+                    array[column] &= ~np.uint32(mask)
+            for remaining_start_date, remaining_end_date, _ in remaining:
+                self._set(room_id, remaining_start_date, remaining_end_date)
+
+    def follow(self, revision: int):
+        """
+        A change of this process, in the bitmaps, was committed with this revision:
+        they stay current if no other change was committed since their revision.
+        """
+        with self._lock:
+            if self.revision is not None and revision == self.revision + 1:
+                self.revision = revision
+            else:
+                self.revision = None
+
+    def is_current(self, db: Session) -> bool:
+        """
+        Whether the bitmaps have all the committed changes (a lookup of the
+        revision), else they are reloaded by the next ensure_loaded.
+        """
+        if not self.loaded:
+            return False
+        with reading_writer(db):
+            revision = get_revision(db)
+        with self._lock:
+            if self.revision is None or revision != self.revision:
+                self.loaded = False
+            return self.loaded
+
+    def find_occupied_room_ids(
+        self, start_date: datetime, end_date: datetime
+    ) -> set[int] | None:
+        """
+        Return the ids of the rooms with a reservation overlapping the dates, or
+        None if the occupancy can't answer: not loaded, dates before the covered
+        days or not on whole hours.
+        """
+        start_date, end_date = to_naive_utc(start_date), to_naive_utc(end_date)
+        if (
+            not self.loaded
+            or not is_whole_hour(start_date)
+            or not is_whole_hour(end_date)
+            or start_date.date() < self.covered_from
+        ):
+            return None
+        with self._lock:
+            occupied = np.zeros(self._capacity, dtype=bool)
+            for day, mask in get_day_masks(start_date, end_date).items():
+                array = self._days.get(day)
+                if array is not None:
+                    occupied |= (array & np.uint32(mask)) != 0
+            return {self._room_ids[column] for column in np.flatnonzero(occupied)}
+
+    def get_bitmaps(self) -> dict[tuple[int, date], int]:
+        with self._lock:
+            return {
+                (self._room_ids[column], day): int(array[column])
+                for day, array in self._days.items()
+                for column in np.flatnonzero(array)
+            }
+
+    def check(self, db: Session) -> list[tuple[int, date]]:
+        """
+        Compare the occupancy with the one rebuilt from the database.
+        Return the (room_id, day) whose bitmaps differ.
+        """
+        expected = RoomOccupancy()
+        expected.load(db)
+        expected_bitmaps = expected.get_bitmaps()
+        bitmaps = {
+            (room_id, day): bitmap
+            for (room_id, day), bitmap in self.get_bitmaps().items()
+            if day >= expected.covered_from
+        }
+        return sorted(
+            key
+            for key in expected_bitmaps.keys() | bitmaps.keys()
+            if expected_bitmaps.get(key) != bitmaps.get(key)
+        )
+
+    def rebuild(self, db: Session):
+        self.load(db)
+
+
+room_occupancy = RoomOccupancy()
@@ -1,16 +1,375 @@
-from sqlalchemy import create_engine
-from sqlalchemy.orm import sessionmaker
+import asyncio
+import random
+from collections.abc import Callable, Iterator
+from contextlib import contextmanager
+from dataclasses import dataclass
 
-from settings import DB_URL
+from fastapi import Request
+from sqlalchemy import URL, Engine, create_engine, event, make_url
+from sqlalchemy.ext.asyncio import (
+    AsyncEngine,
+    AsyncSession,
+    async_sessionmaker,
+    create_async_engine,
+)
+from sqlalchemy.orm import Session, sessionmaker
+from sqlalchemy.pool import AsyncAdaptedQueuePool
 
-engine = create_engine(DB_URL, connect_args={"check_same_thread": False})
+from db.pool import get_pool_args
+from db.recent_writers import recent_writers
+from http_helpers import get_last_write
+from settings import (
+    DB_REPLICA_URLS,
+    DB_SQLITE_BUSY_TIMEOUT_SECONDS,
+    DB_SQLITE_CACHE_SIZE_KB,
+    DB_SQLITE_JOURNAL_MODE,
+    DB_SQLITE_MMAP_SIZE,
+    DB_SQLITE_READ_POOL_SIZE,
+    DB_SQLITE_READ_WRITE_SPLIT,
+    DB_SQLITE_SYNCHRONOUS,
+    DB_URL,
+)
+
+# DB_URL can use a sync (sqlite, postgresql) or an async (sqlite+aiosqlite,
+# postgresql+asyncpg) driver, the sync and the async engines are derived from it
+ASYNC_DRIVERS = {"sqlite": "aiosqlite", "postgresql": "asyncpg"}
+
+
+def get_sync_url(url: str | URL) -> URL:
+    url = make_url(url)
+    if url.get_driver_name() in ASYNC_DRIVERS.values():
+        # use the default sync driver of the backend
+        return url.set(drivername=url.get_backend_name())
+    return url
+
+
+def get_async_url(url: str | URL) -> URL:
+    url = make_url(url)
+    if url.get_driver_name() in ASYNC_DRIVERS.values():
+        return url
+    backend = url.get_backend_name()
+    if backend not in ASYNC_DRIVERS:
+        supported = ", ".join(
+            f"{name}+{driver}" for name, driver in ASYNC_DRIVERS.items()
+        )
+        raise ValueError(
+            f"No async driver known for {url.drivername} (supported: {supported})"
+        )
+    return url.set(drivername=f"{backend}+{ASYNC_DRIVERS[backend]}")
+
+
+def get_connect_args(url: str | URL) -> dict:
+    if make_url(url).get_backend_name() == "sqlite":
+        return {"check_same_thread": False, "timeout": DB_SQLITE_BUSY_TIMEOUT_SECONDS}
+    return {}
+
+
+def is_sqlite_file(url: str | URL) -> bool:
+    url = make_url(url)
+    return url.get_backend_name() == "sqlite" and url.database not in (
+        None,
+        "",
+        ":memory:",
+    )
+
+
+def get_read_only_url(url: str | URL) -> URL:
+    # the sqlite database file opened in read-only mode
+    url = make_url(url)
+    return url.set(database=f"file:{url.database}", query={"mode": "ro", "uri": "true"})
+
+
+@dataclass(frozen=True)
+class SqliteProfile:
+    # the default values leave sqlite as is
+    journal_mode: str = ""
+    synchronous: str = ""
+    cache_size_kb: int = 0
+    mmap_size: int = 0
+    read_write_split: bool = False
+
+
+# the profile of the DB_SQLITE_* settings (opt-in)
+SQLITE_PROFILE = SqliteProfile(
+    DB_SQLITE_JOURNAL_MODE,
+    DB_SQLITE_SYNCHRONOUS,
+    DB_SQLITE_CACHE_SIZE_KB,
+    DB_SQLITE_MMAP_SIZE,
+    DB_SQLITE_READ_WRITE_SPLIT,
+)
+# the profile of a sqlite file serving concurrent requests (see the readme)
+SQLITE_TUNED_PROFILE = SqliteProfile(
+    "wal", "normal", 64 * 1024, 256 * 1024 * 1024, read_write_split=True
+)
+
+
+def get_sqlite_pragmas(
+    read_only: bool = False, profile: SqliteProfile = SQLITE_PROFILE
+) -> list[str]:
+    pragmas = []
+    if profile.journal_mode and not read_only:
+        # set once in the database file, by a connection which can write it
+        pragmas.append(f"journal_mode={profile.journal_mode}")
+    if profile.synchronous:
+        pragmas.append(f"synchronous={profile.synchronous}")
+    if profile.cache_size_kb:
+        pragmas.append(f"cache_size=-{profile.cache_size_kb}")
+    if profile.mmap_size:
+        pragmas.append(f"mmap_size={profile.mmap_size}")
+    return pragmas
+
+
+def set_sqlite_pragmas(engine: Engine, pragmas: list[str]):
+    if not pragmas:
+        return
+
+    # run on each new connection of the engine
+    @event.listens_for(engine, "connect")
+    def _set_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        for pragma in pragmas:
+            cursor.execute(f"PRAGMA {pragma}")
+        cursor.close()
+
+
+class ReadWriteSession(Session):
+    """
+    Session sending the reads to one of the reader engines (picked for each
+    transaction) and the writes to the writer engine. Once a transaction has
+    written, its reads use the writer too: they see its changes and the rows it
+    locked. The next transaction reads from a reader again.
+    With read_your_writes (the readers are replicas which can lag behind), the
+    user of the session (info["user_id"], set by get_current_user, or the users of
+    info["user_ids"]) reads from the writer for DB_REPLICA_MAX_LAG_SECONDS after
+    having committed a change, like the client of a request whose last write
+    (info["last_write"], from its cookie) is that recent.
+    The reads made within reading_writer go to the writer too.
+    """
+
+    def __init__(
+        self,
+        *args,
+        readers: list[Engine],
+        writer: Engine,
+        read_your_writes: bool = False,
+        **kwargs,
+    ):
+        super().__init__(*args, **kwargs)
+        self.readers = readers
+        self.writer = writer
+        self.read_your_writes = read_your_writes
+        self.writing = False
+        self.reader: Engine | None = None
+
+    def must_read_writer(self) -> bool:
+        if self.info.get("reading_writer"):
+            return True
+        if not self.read_your_writes:
+            return False
+        user_id = self.info.get("user_id")
+        # the write may have been recorded by another worker
+        return (
+            user_id is not None and user_id in recent_writers
+        ) or recent_writers.is_recent(self.info.get("last_write"))
+
+    def get_bind(self, mapper=None, clause=None, **kwargs):
+        # a statement without clause (flush, connection()) may write
+        if self._flushing or clause is None or getattr(clause, "is_dml", False):
+            self.writing = True
+        if self.writing or self.must_read_writer():
+            return self.writer
+        if self.reader is None:
+            self.reader = random.choice(self.readers)
+        return self.reader
+
+
+@contextmanager
+def reading_writer(db: Session) -> Iterator[None]:
+    """
+    Send the reads of the session to the writer within the block: the in-memory
+    caches (reservation index, room occupancy, room catalog) are loaded and
+    checked from the source of truth, never from a replica lagging behind.
+    """
+    previous = db.info.get("reading_writer", False)
+    db.info["reading_writer"] = True
+    try:
+        yield
+    finally:
+        db.info["reading_writer"] = previous
+
+
+# ensure_loaded function -> its run in progress
+_loads: dict[Callable, asyncio.Future] = {}
+
+
+async def ensure_loaded_once(
+    db: AsyncSession, ensure_loaded: Callable[[Session], None]
+):
+    """
+    Run the ensure_loaded function of an in-memory cache on the session: the
+    concurrent requests wait for the run in progress, then find the cache loaded,
+    instead of each loading it from the database (on startup, or when it expires).
+    """
+    while (loading := _loads.get(ensure_loaded)) is not None:
+        await asyncio.wait([loading])
+    loading = _loads[ensure_loaded] = asyncio.get_running_loop().create_future()
+    try:
+        await db.run_sync(ensure_loaded)
+    finally:
+        del _loads[ensure_loaded]
+        loading.set_result(None)
+
+
+@event.listens_for(ReadWriteSession, "after_commit")
+def _record_writer(session: ReadWriteSession):
+    if session.writing and session.read_your_writes:
+        # a session shared by the requests of many users (group commit) lists them
+        for user_id in session.info.get("user_ids", [session.info.get("user_id")]):
+            recent_writers.add(user_id)
+
+
+@event.listens_for(ReadWriteSession, "after_transaction_end")
+def _end_writing(session: ReadWriteSession, transaction):
+    if transaction.parent is None:
+        session.writing = False
+        session.reader = None
+
+
+def create_async_engines(
+    url: str | URL, name: str = "async", profile: SqliteProfile = SQLITE_PROFILE
+) -> tuple[AsyncEngine, AsyncEngine | None]:
+    """
+    Return the engine of the writes and, with a sqlite file and the read_write_split
+    of the profile, the engine of the reads (None otherwise).
+    Their pools publish the metrics of name (and name_read).
+    """
+    async_url = get_async_url(url)
+    connect_args = get_connect_args(url)
+    if not is_sqlite_file(url):
+        engine = create_async_engine(
+            async_url, connect_args=connect_args, **get_pool_args(async_url, name)
+        )
+        return engine, None
+
+    if not profile.read_write_split:
+        engine = create_async_engine(
+            async_url, connect_args=connect_args, **get_pool_args(async_url, name)
+        )
+        set_sqlite_pragmas(engine.sync_engine, get_sqlite_pragmas(profile=profile))
+        return engine, None
+
+    # the connections are kept (aiosqlite doesn't pool them by default), the
+    # writers queue for the single one up to the busy timeout
+    writer = create_async_engine(
+        async_url,
+        connect_args=connect_args,
+        **get_pool_args(
+            async_url,
+            name,
+            poolclass=AsyncAdaptedQueuePool,
+            pool_size=1,
+            max_overflow=0,
+            pool_timeout=DB_SQLITE_BUSY_TIMEOUT_SECONDS,
+        ),
+    )
+    set_sqlite_pragmas(writer.sync_engine, get_sqlite_pragmas(profile=profile))
+    read_only_url = get_read_only_url(async_url)
+    reader = create_async_engine(
+        read_only_url,
+        connect_args=connect_args,
+        **get_pool_args(
+            read_only_url,
+            f"{name}_read",
+            poolclass=AsyncAdaptedQueuePool,
+            pool_size=DB_SQLITE_READ_POOL_SIZE,
+        ),
+    )
+    set_sqlite_pragmas(
+        reader.sync_engine, get_sqlite_pragmas(read_only=True, profile=profile)
+    )
+    return writer, reader
+
+
+def create_replica_engines(
+    urls: list[str | URL], name: str = "async_replica"
+) -> list[AsyncEngine]:
+    # the sqlite replicas (for local tests) are opened read-only
+    replicas = []
+    for i, url in enumerate(urls):
+        async_url = get_async_url(url)
+        if is_sqlite_file(url):
+            async_url = get_read_only_url(async_url)
+        replica = create_async_engine(
+            async_url,
+            connect_args=get_connect_args(url),
+            **get_pool_args(async_url, f"{name}_{i}"),
+        )
+        if is_sqlite_file(url):
+            set_sqlite_pragmas(replica.sync_engine, get_sqlite_pragmas(read_only=True))
+        replicas.append(replica)
+    return replicas
+
+
+def create_async_sessionmaker(
+    writer: AsyncEngine,
+    reader: AsyncEngine | None = None,
+    replicas: list[AsyncEngine] | None = None,
+) -> async_sessionmaker:
+    """
+    Sessions on the writer, or routed by ReadWriteSession when there is a reader
+    (sqlite read-only connections to the same file) or replicas (the reads then go
+    to the replicas, with read your writes).
+    """
+    # objects are not expired on commit, they can't be lazily refreshed with an
+    # AsyncSession
+    if reader is None and not replicas:
+        return async_sessionmaker(writer, autoflush=False, expire_on_commit=False)
+    readers = replicas if replicas else [reader]
+    return async_sessionmaker(
+        sync_session_class=ReadWriteSession,
+        readers=[reader.sync_engine for reader in readers],
+        writer=writer.sync_engine,
+        read_your_writes=bool(replicas),
+        autoflush=False,
+        expire_on_commit=False,
+    )
+
+
+engine = create_engine(
+    get_sync_url(DB_URL),
+    connect_args=get_connect_args(DB_URL),
+    **get_pool_args(get_sync_url(DB_URL), "sync"),
+)
+if is_sqlite_file(DB_URL):
+    set_sqlite_pragmas(engine, get_sqlite_pragmas())
 
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+async_engine, async_read_engine = create_async_engines(DB_URL)
+async_replica_engines = create_replica_engines(DB_REPLICA_URLS)
 
+AsyncSessionLocal = create_async_sessionmaker(
+    async_engine, async_read_engine, async_replica_engines
+)
+
+
+# the sessions take a connection from the pool on their first query (and give it
+# back at the end of the transaction): the routes answering from the in-memory
+# caches don't take one
 def get_db():
     db = SessionLocal()
     try:
         yield db
     finally:
         db.close()
+
+
+async def get_async_db(request: Request):
+    async with AsyncSessionLocal(info={"last_write": get_last_write(request)}) as db:
+        yield db
+
+
+def get_async_sessionmaker() -> async_sessionmaker:
+    # the streamed responses are sent after the dependencies are closed,
+    # so they open their own session
+    return AsyncSessionLocal
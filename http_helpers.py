@@ -0,0 +1,119 @@
+import base64
+import hashlib
+import json
+import time
+from typing import Any
+
+import orjson
+from fastapi import Request, Response
+from fastapi.responses import ORJSONResponse as BaseORJSONResponse
+
+NDJSON_MEDIA_TYPE = "application/x-ndjson"
+
+# documentation of the endpoints which can stream their response
+NDJSON_RESPONSES = {
+    200: {
+        "content": {NDJSON_MEDIA_TYPE: {}},
+        "description": f"Streamed with one JSON object by line if {NDJSON_MEDIA_TYPE} "
+        "is accepted",
+    }
+}
+
+# time (seconds since the epoch) of the last write of the client, sent back with
+# its next requests whatever the worker handling them (see ReadWriteSession)
+LAST_WRITE_COOKIE = "last_write"
+
+# the methods which don't change the data
+SAFE_METHODS = {"GET", "HEAD", "OPTIONS"}
+
+# documentation of the endpoints answering If-None-Match
+NOT_MODIFIED_RESPONSES = {304: {"description": "Not modified since the given ETag"}}
+
+# the naive datetimes are UTC (like the dates of the database), and the UTC ones
+# are written with a Z: the same JSON as the pydantic models
+ORJSON_OPTIONS = (
+    orjson.OPT_NON_STR_KEYS
+    | orjson.OPT_SERIALIZE_NUMPY
+    | orjson.OPT_NAIVE_UTC
+    | orjson.OPT_UTC_Z
+)
+
+
+def dump_json(content: Any) -> bytes:
+    return orjson.dumps(content, option=ORJSON_OPTIONS)
+
+
+class ORJSONResponse(BaseORJSONResponse):
+    """
+    Default response class of the application: the routes on hot paths return it
+    with plain dicts (see the dump_* functions of the schemas) to skip the
+    validation of the response models.
+    """
+
+    def render(self, content: Any) -> bytes:
+        return dump_json(content)
+
+
+def accepts_ndjson(request: Request) -> bool:
+    return NDJSON_MEDIA_TYPE in request.headers.get("accept", "")
+
+
+def is_not_modified(request: Request, etag: str) -> bool:
+    """
+    Return True if the client already has the representation of this etag
+    (If-None-Match), it can then be answered with a 304 Not Modified.
+    """
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is None:
+        return False
+    # weak comparison: W/ prefixes are ignored
+    etags = {value.strip().removeprefix("W/") for value in if_none_match.split(",")}
+    return "*" in etags or etag.removeprefix("W/") in etags
+
+
+def get_etag(request: Request, *versions) -> str:
+    """
+    ETag of the response to the request (its query and accepted media type) when
+    the data it reads is at the given versions, which must be JSON serializable.
+    """
+    key = json.dumps([request.url.query, accepts_ndjson(request), *versions])
+    return f'"{hashlib.blake2b(key.encode(), digest_size=16).hexdigest()}"'
+
+
+def encode_cursor(values: list) -> str:
+    """
+    Opaque token of the position of the last item of a page (keyset pagination),
+    the values must be JSON serializable.
+    """
+    return base64.urlsafe_b64encode(json.dumps(values).encode()).decode()
+
+
+def decode_cursor(cursor: str) -> list:
+    """
+    Raise a ValueError if the cursor wasn't made by encode_cursor.
+    """
+    try:
+        values = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+    except (ValueError, TypeError) as error:
+        raise ValueError("Invalid cursor") from error
+    if not isinstance(values, list):
+        raise ValueError("Invalid cursor")
+    return values
+
+
+def get_last_write(request: Request) -> float | None:
+    try:
+        return float(request.cookies[LAST_WRITE_COOKIE])
+    except (KeyError, ValueError):
+        return None
+
+
+def set_last_write(response: Response, max_age: float):
+    # kept by the client while the replicas may miss the write
+    response.set_cookie(
+        LAST_WRITE_COOKIE,
+        str(time.time()),
+        max_age=int(max_age) + 1,
+        httponly=True,
+        samesite="lax",
+    )
@@ -1,15 +1,12 @@
 import os
 import sys
 
-from sqlalchemy import create_engine
-
 from auth_helpers import encode_password
-from db.base_class import Base
+from db.migrations import upgrade_database
 from db.models.users import User
 from db.repositories.rooms import create_room
 from db.repositories.users import save_user
 from db.session import SessionLocal
-from settings import DB_URL
 
 db_path = "../db.db"
 
@@ -26,8 +23,7 @@ def main() -> int:
         os.remove(db_path)
 
     # create the tables
-    engine = create_engine(DB_URL, connect_args={"check_same_thread": False})
-    Base.metadata.create_all(bind=engine)
+    upgrade_database()
 
     db_session = SessionLocal()
     for i in range(1, 11):
@@ -1,13 +1,48 @@
-from fastapi import FastAPI
+import asyncio
+from contextlib import asynccontextmanager
+
+from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
 
-from db import Base
-from db.session import engine
-from routers import auth_router, room_reservations_router, rooms_router, users_router
-from settings import ALLOWED_HOSTS
+from auth_helpers import password_hashing_pool
+from db.reservation_index import reservation_index
+from db.room_catalog import room_catalog
+from db.room_occupancy import room_occupancy
+from db.session import AsyncSessionLocal
+from http_helpers import SAFE_METHODS, ORJSONResponse, set_last_write
+from reservation_archive import reservation_archive
+from routers import (
+    auth_router,
+    metrics_router,
+    room_reservations_router,
+    rooms_router,
+    users_router,
+)
+from settings import ALLOWED_HOSTS, DB_REPLICA_MAX_LAG_SECONDS, DB_REPLICA_URLS
+
+# the database schema is created and updated by the migrations (alembic upgrade head)
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # load the in-memory reservation index, room occupancy and room catalog once,
+    # they are kept in sync by the repositories
+    async with AsyncSessionLocal() as db:
+        await db.run_sync(reservation_index.load)
+        await db.run_sync(room_occupancy.load)
+        await db.run_sync(room_catalog.load)
+    password_hashing_pool.start()
+    archive_task = None
+    if reservation_archive.interval > 0:
+        archive_task = asyncio.create_task(reservation_archive.run(AsyncSessionLocal))
+    yield
+    if archive_task is not None:
+        archive_task.cancel()
+    password_hashing_pool.shutdown()
 
-Base.metadata.create_all(bind=engine)
-app = FastAPI()
+
+# the routes on hot paths return an ORJSONResponse with plain dicts
+app = FastAPI(lifespan=lifespan, default_response_class=ORJSONResponse)
 
 app.add_middleware(
     CORSMiddleware,
@@ -17,8 +52,23 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+
+async def record_last_write(request: Request, call_next):
+    # the next requests of the client read its writes, whatever the worker
+    # handling them (see ReadWriteSession)
+    response = await call_next(request)
+    if request.method not in SAFE_METHODS and response.status_code < 400:
+        set_last_write(response, DB_REPLICA_MAX_LAG_SECONDS)
+    return response
+
+
+# only the replicas can miss the writes
+if DB_REPLICA_URLS:
+    app.middleware("http")(record_last_write)
+
 app.include_router(users_router, prefix="/users")
 app.include_router(rooms_router, prefix="/rooms")
 app.include_router(room_reservations_router, prefix="/room-reservations")
 
 app.include_router(auth_router)
+app.include_router(metrics_router)
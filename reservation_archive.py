@@ -0,0 +1,58 @@
+import asyncio
+from datetime import datetime, timedelta, timezone
+
+from sqlalchemy.ext.asyncio import async_sessionmaker
+
+from db.repositories.aio.room_reservations import archive_reservations
+from metrics import Counter
+from settings import (
+    RESERVATION_ARCHIVE_AFTER_DAYS,
+    RESERVATION_ARCHIVE_BATCH_SIZE,
+    RESERVATION_ARCHIVE_INTERVAL_SECONDS,
+)
+
+
+class ReservationArchive:
+    """
+    Archival of the past reservations: the ones ended more than after_days ago are
+    moved from room_reservation to archived_room_reservation, so the queries of the
+    current reservations don't slow down as the history grows.
+    Run every interval seconds by the background task started with the application
+    (if interval > 0), or once by POST /room-reservations/archive (admins only).
+    """
+
+    def __init__(self, after_days: int, interval: float, batch_size: int):
+        self.after_days = after_days
+        self.interval = interval
+        self.batch_size = batch_size
+        self.archived = Counter(
+            "reservations_archived_total",
+            "Reservations moved to the archive",
+        )
+        self.failures = Counter(
+            "reservation_archive_failures_total",
+            "Runs of the background archival which failed",
+        )
+
+    async def archive(self, session_maker: async_sessionmaker) -> int:
+        before = datetime.now(timezone.utc) - timedelta(days=self.after_days)
+        async with session_maker() as db:
+            archived = await archive_reservations(db, before, self.batch_size)
+        self.archived.inc(archived)
+        return archived
+
+    async def run(self, session_maker: async_sessionmaker):
+        while True:
+            try:
+                await self.archive(session_maker)
+            except Exception:
+                # retried at the next interval, the moved batches are committed
+                self.failures.inc()
+            await asyncio.sleep(self.interval)
+
+
+reservation_archive = ReservationArchive(
+    RESERVATION_ARCHIVE_AFTER_DAYS,
+    RESERVATION_ARCHIVE_INTERVAL_SECONDS,
+    RESERVATION_ARCHIVE_BATCH_SIZE,
+)
@@ -0,0 +1,147 @@
+import asyncio
+from collections.abc import Iterable
+from datetime import datetime
+
+from db.reservation_index import to_naive_utc
+from metrics import Counter, Gauge
+from schemas.room_reservations import RoomReservationEvent
+from settings import RESERVATION_FEED_BUFFER_SIZE
+
+RESYNC_MESSAGE = RoomReservationEvent(type="resync").model_dump_json()
+
+
+class ReservationFeedSubscriber:
+    """
+    Events waiting to be sent to one client, only the ones of its rooms (all if
+    room_ids is None) and overlapping its dates (if any).
+    """
+
+    def __init__(
+        self,
+        buffer_size: int,
+        room_ids: Iterable[int] | None = None,
+        start_date: datetime | None = None,
+        end_date: datetime | None = None,
+    ):
+        self.room_ids = frozenset(room_ids) if room_ids is not None else None
+        self.start_date = to_naive_utc(start_date) if start_date is not None else None
+        self.end_date = to_naive_utc(end_date) if end_date is not None else None
+        self.messages: asyncio.Queue[str] = asyncio.Queue(buffer_size)
+
+    def overlaps(self, start_date: datetime, end_date: datetime) -> bool:
+        return (self.end_date is None or start_date < self.end_date) and (
+            self.start_date is None or end_date > self.start_date
+        )
+
+    def put(self, message: str) -> bool:
+        """
+        Return False if the buffer was full: the pending events are then replaced
+        by a single resync event, the client reloads the reservations instead of
+        receiving them late.
+        """
+        try:
+            self.messages.put_nowait(message)
+            return True
+        except asyncio.QueueFull:
+            while not self.messages.empty():
+                self.messages.get_nowait()
+            self.messages.put_nowait(RESYNC_MESSAGE)
+            return False
+
+    async def get(self) -> str:
+        return await self.messages.get()
+
+
+class ReservationFeed:
+    """
+    Fan-out of the created and deleted reservations to the connected clients, from
+    the event loop of the process (the clients connected to another worker don't
+    receive its events).
+    Each event is serialized once, and only offered to the subscribers of its room
+    and to the ones of all the rooms. A slow client never blocks the others: its
+    buffer is bounded and it gets a resync event when it overflows.
+    Its metrics are named after name.
+    """
+
+    def __init__(self, buffer_size: int, name: str = "reservation_feed"):
+        self.buffer_size = buffer_size
+        # room id (None for all the rooms) -> subscribers
+        self._subscribers: dict[int | None, set[ReservationFeedSubscriber]] = {}
+        self.subscribers = Gauge(
+            f"{name}_subscribers",
+            "Clients connected to the reservation feed",
+            lambda: len(self),
+        )
+        self.resyncs = Counter(
+            f"{name}_resyncs_total",
+            "Overflowed buffers of the reservation feed clients",
+        )
+
+    def __len__(self) -> int:
+        return len(
+            {
+                subscriber
+                for subscribers in self._subscribers.values()
+                for subscriber in subscribers
+            }
+        )
+
+    def subscribe(
+        self,
+        room_ids: Iterable[int] | None = None,
+        start_date: datetime | None = None,
+        end_date: datetime | None = None,
+    ) -> ReservationFeedSubscriber:
+        subscriber = ReservationFeedSubscriber(
+            self.buffer_size, room_ids, start_date, end_date
+        )
+        for room_id in subscriber.room_ids if room_ids is not None else [None]:
+            self._subscribers.setdefault(room_id, set()).add(subscriber)
+        return subscriber
+
+    def unsubscribe(self, subscriber: ReservationFeedSubscriber):
+        for room_id in (
+            subscriber.room_ids if subscriber.room_ids is not None else [None]
+        ):
+            subscribers = self._subscribers.get(room_id)
+            if subscribers is not None:
+                subscribers.discard(subscriber)
+                if not subscribers:
+                    del self._subscribers[room_id]
+
+    def publish(self, event: RoomReservationEvent):
+        message = event.model_dump_json()
+        start_date = to_naive_utc(event.start_date)
+        end_date = to_naive_utc(event.end_date)
+        for room_id in (event.room_id, None):
+            for subscriber in self._subscribers.get(room_id, ()):
+                if subscriber.overlaps(start_date, end_date) and not subscriber.put(
+                    message
+                ):
+                    self.resyncs.inc()
+
+    def clear(self):
+        self._subscribers.clear()
+
+
+reservation_feed = ReservationFeed(RESERVATION_FEED_BUFFER_SIZE)
+
+
+def publish_reservation_event(
+    type: str,
+    reservation_id: int,
+    room_id: int,
+    user_id: int,
+    start_date: datetime,
+    end_date: datetime,
+):
+    reservation_feed.publish(
+        RoomReservationEvent(
+            type=type,
+            reservation_id=reservation_id,
+            room_id=room_id,
+            user_id=user_id,
+            start_date=start_date,
+            end_date=end_date,
+        )
+    )
@@ -0,0 +1,171 @@
+import asyncio
+from datetime import datetime
+
+from sqlalchemy.ext.asyncio import async_sessionmaker
+from sqlalchemy.orm.attributes import set_committed_value
+
+from db.models.room_reservations import RoomReservation
+from db.models.rooms import Room
+from db.repositories.aio.room_reservations import reserve_rooms_of_users
+from db.repositories.room_reservations import RoomAlreadyReservedError
+from db.reservation_index import to_naive_utc
+from metrics import Histogram
+from reservation_feed import publish_reservation_event
+from schemas.users import UserDTO
+from settings import (
+    RESERVATION_GROUP_COMMIT,
+    RESERVATION_GROUP_COMMIT_MAX_SIZE,
+    RESERVATION_GROUP_COMMIT_WINDOW_MS,
+)
+
+GROUP_SIZE_BUCKETS = (1, 2, 5, 10, 20, 50, 100, 200, 500)
+
+# (user_id, room_id, start_date, end_date) of a reservation and its result
+PendingReservation = tuple[tuple[int, int, datetime, datetime], asyncio.Future]
+
+
+class ReservationGroupCommitError(Exception):
+    """
+    The transaction of the group failed (the cause is the error of the
+    transaction), raised for each reservation of the group.
+    """
+
+
+class ReservationGroupCommit:
+    """
+    Group commit of the reservations: the ones requested in the same window (or
+    until max_size of them wait) are checked and inserted in a single transaction
+    by reserve_rooms_of_users, so a peak of bookings costs one commit by group
+    instead of one by reservation.
+    Each request still gets its own result: its reservation, or a
+    RoomAlreadyReservedError with its conflicts (the reservations of the same
+    group reported with their id).
+    The created reservations are published to the reservation feed by the group,
+    even if their request was cancelled meanwhile.
+    Its metrics are named after name.
+    """
+
+    def __init__(
+        self,
+        enabled: bool,
+        window: float,
+        max_size: int,
+        name: str = "reservation_group_commit",
+    ):
+        self.enabled = enabled
+        self.window = window
+        self.max_size = max_size
+        self._pending: list[PendingReservation] = []
+        self._session_maker: async_sessionmaker | None = None
+        self._flush_handle: asyncio.TimerHandle | None = None
+        # the flushing tasks are referenced until their end
+        self._tasks: set[asyncio.Task] = set()
+        self.group_size = Histogram(
+            f"{name}_size",
+            "Reservations checked and committed together",
+            GROUP_SIZE_BUCKETS,
+        )
+
+    async def reserve(
+        self,
+        session_maker: async_sessionmaker,
+        room: Room,
+        user: UserDTO,
+        start_date: datetime,
+        end_date: datetime,
+    ) -> RoomReservation:
+        """
+        Same result as reserve_room, from the transaction of the group (the
+        returned reservation isn't attached to a session).
+        """
+        start_date = to_naive_utc(start_date)
+        end_date = to_naive_utc(end_date)
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        # the group uses the session maker of its first request
+        if not self._pending:
+            self._session_maker = session_maker
+        self._pending.append(((user.id, room.id, start_date, end_date), future))
+        if len(self._pending) >= self.max_size:
+            self._flush()
+        elif self._flush_handle is None:
+            self._flush_handle = loop.call_later(self.window, self._flush)
+
+        # the reservation is inserted even if the request is cancelled (client
+        # gone), the future must still get its result
+        reservation_id = await asyncio.shield(future)
+        reservation = RoomReservation(
+            id=reservation_id,
+            room_id=room.id,
+            user_id=user.id,
+            start_date=start_date,
+            end_date=end_date,
+        )
+        set_committed_value(reservation, "room", room)
+        return reservation
+
+    def _flush(self):
+        if self._flush_handle is not None:
+            self._flush_handle.cancel()
+            self._flush_handle = None
+        group, self._pending = self._pending, []
+        task = asyncio.create_task(self._commit(self._session_maker, group))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _commit(
+        self, session_maker: async_sessionmaker, group: list[PendingReservation]
+    ):
+        self.group_size.observe(len(group))
+        try:
+            # the users of the group read their writes like with their own session
+            user_ids = sorted({request[0] for request, _ in group})
+            async with session_maker(info={"user_ids": user_ids}) as db:
+                ids, conflicts = await reserve_rooms_of_users(
+                    db, [request for request, _ in group], all_or_nothing=False
+                )
+        except Exception as error:
+            # an exception instance by request, each one gets its own traceback
+            for _, future in group:
+                if not future.done():
+                    group_error = ReservationGroupCommitError(str(error))
+                    group_error.__cause__ = error
+                    future.set_exception(group_error)
+            return
+
+        for (request, future), reservation_id, overlapping in zip(
+            group, ids, conflicts
+        ):
+            if reservation_id is not None:
+                user_id, room_id, start_date, end_date = request
+                publish_reservation_event(
+                    "created", reservation_id, room_id, user_id, start_date, end_date
+                )
+            if future.done():
+                continue
+            if reservation_id is not None:
+                future.set_result(reservation_id)
+            else:
+                # the requests of the group are reported as -(position + 1)
+                future.set_exception(
+                    RoomAlreadyReservedError(
+                        [
+                            (start_date, end_date, ids[-id_ - 1] if id_ < 0 else id_)
+                            for start_date, end_date, id_ in overlapping
+                        ]
+                    )
+                )
+
+    def clear(self):
+        if self._flush_handle is not None:
+            self._flush_handle.cancel()
+            self._flush_handle = None
+        self._pending = []
+        self._session_maker = None
+
+
+reservation_group_commit = ReservationGroupCommit(
+    RESERVATION_GROUP_COMMIT,
+    RESERVATION_GROUP_COMMIT_WINDOW_MS / 1000,
+    RESERVATION_GROUP_COMMIT_MAX_SIZE,
+)
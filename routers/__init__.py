@@ -1,6 +1,13 @@
 from .auth import auth_router
+from .metrics import metrics_router
 from .room_reservations import room_reservations_router
 from .rooms import rooms_router
 from .users import users_router
 
-__all__ = ["auth_router", "users_router", "rooms_router", "room_reservations_router"]
+__all__ = [
+    "auth_router",
+    "metrics_router",
+    "users_router",
+    "rooms_router",
+    "room_reservations_router",
+]
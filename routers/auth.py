@@ -1,24 +1,44 @@
 from typing import Annotated
 
-from auth_helpers import Token, create_access_token_from_user, verify_password
-from db.repositories.users import find_user_by_email
-from db.session import get_db
+from auth_helpers import (
+    PasswordHashingPoolFull,
+    Token,
+    create_access_token_from_user,
+    verify_password_async,
+)
+from db.repositories.aio.users import find_user_by_email
+from db.session import get_async_db
 from fastapi import APIRouter, Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordRequestForm
 from schemas.users import UserLoginRequest
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 
 auth_router = APIRouter()
 
+PASSWORD_HASHING_POOL_FULL_ERROR = "Too many logins in progress, retry later"
+
+
+async def check_password(plain_password: str, hashed_password: str) -> bool:
+    # the verification runs in the password hashing pool, when it's full the request
+    # is rejected right away instead of queuing behind the other logins
+    try:
+        return await verify_password_async(plain_password, hashed_password)
+    except PasswordHashingPoolFull:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail=PASSWORD_HASHING_POOL_FULL_ERROR,
+            headers={"Retry-After": "1"},
+        )
+
 
 @auth_router.post("/api/auth", status_code=status.HTTP_200_OK)
 async def login(
-    login_request: UserLoginRequest, db: Session = Depends(get_db)
+    login_request: UserLoginRequest, db: AsyncSession = Depends(get_async_db)
 ) -> Token:
-    user = find_user_by_email(db, login_request.email)
+    user = await find_user_by_email(db, login_request.email)
 
     if user is not None:
-        if verify_password(login_request.password, user.hashed_password):
+        if await check_password(login_request.password, user.hashed_password):
             return create_access_token_from_user(user)
 
     raise HTTPException(
@@ -31,16 +51,16 @@ async def login(
 @auth_router.post("/auth")
 async def login_for_access_token(
     form_data: Annotated[OAuth2PasswordRequestForm, Depends()],
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
 ) -> Token:
     """
     This endpoint will take the username and password and return an access token
     Used only for testing purposes with the swagger UI.
     """
-    user = find_user_by_email(db, form_data.username)
+    user = await find_user_by_email(db, form_data.username)
 
     if user is not None:
-        if verify_password(form_data.password, user.hashed_password):
+        if await check_password(form_data.password, user.hashed_password):
             return create_access_token_from_user(user)
 
     raise HTTPException(
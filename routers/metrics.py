@@ -0,0 +1,19 @@
+from fastapi import APIRouter, status
+from fastapi.responses import PlainTextResponse
+
+from metrics import render_metrics
+
+metrics_router = APIRouter()
+
+
+@metrics_router.get(
+    "/metrics", status_code=status.HTTP_200_OK, response_class=PlainTextResponse
+)
+async def get_metrics() -> PlainTextResponse:
+    """
+    This endpoint will return the metrics of the server (caches, pools...) in the
+    prometheus text format, to be scraped.
+    """
+    return PlainTextResponse(
+        render_metrics(), media_type="text/plain; version=0.0.4; charset=utf-8"
+    )
@@ -1,27 +1,62 @@
-from datetime import datetime, timezone
+import asyncio
+from datetime import datetime, timedelta, timezone
 from typing import Annotated
 
-from fastapi import APIRouter, Depends, HTTPException, Path, status
-from sqlalchemy.orm import Session
+from fastapi import (
+    APIRouter,
+    Depends,
+    HTTPException,
+    Path,
+    Query,
+    WebSocket,
+    WebSocketException,
+    status,
+)
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
 
-from auth_helpers import get_current_user
-from db.models.users import User
-from db.repositories.room_reservations import (
+from auth_helpers import get_current_admin_user, get_current_user
+from db.repositories.aio.room_reservations import (
     delete_room_reservation,
     get_room_reservation_by_id,
 )
-from db.session import get_db
+from db.repositories.aio.room_reservation_rules import (
+    add_room_reservation_rule_exception,
+    delete_room_reservation_rule,
+    get_room_reservation_rule_by_id,
+)
+from db.reservation_index import reservation_index, to_naive_utc
+from db.room_occupancy import room_occupancy
+from db.session import ensure_loaded_once, get_async_db, get_async_sessionmaker
+from reservation_archive import reservation_archive
+from reservation_feed import (
+    ReservationFeedSubscriber,
+    publish_reservation_event,
+    reservation_feed,
+)
+from schemas.room_reservations import (
+    RoomOccupancyCheck,
+    RoomOccupancyDay,
+    RoomReservationIndexCheck,
+    RoomReservationRuleDTO,
+    RoomReservationRuleExceptionRequest,
+)
+from schemas.users import UserDTO
 
 room_reservations_router = APIRouter()
 
 
+RULE_NOT_FOUND_ERROR = "Reservation rule not found"
+RULE_NOT_ALLOWED_ERROR = "You are not allowed to update this reservation rule"
+RULE_OCCURRENCE_NOT_FOUND_ERROR = "start_date is not an occurrence of the rule"
+
+
 @room_reservations_router.delete("/{reservation_id}", status_code=status.HTTP_200_OK)
 async def delete_reservation(
-    current_user: Annotated[User, Depends(get_current_user)],
-    db: Session = Depends(get_db),
+    current_user: Annotated[UserDTO, Depends(get_current_user)],
+    db: AsyncSession = Depends(get_async_db),
     reservation_id: int = Path(..., title="Reservation ID", ge=1),
 ):
-    reservation = get_room_reservation_by_id(db, reservation_id)
+    reservation = await get_room_reservation_by_id(db, reservation_id)
     if reservation is None:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST, detail="Reservation not found"
@@ -49,5 +84,201 @@ async def delete_reservation(
             detail="You can't delete a past reservation",
         )
 
-    delete_room_reservation(db, reservation)
+    await delete_room_reservation(db, reservation)
+    publish_reservation_event(
+        "deleted",
+        reservation.id,
+        reservation.room_id,
+        reservation.user_id,
+        reservation.start_date,
+        reservation.end_date,
+    )
     return {"message": "Reservation deleted"}
+
+
+async def send_reservation_events(
+    websocket: WebSocket, subscriber: ReservationFeedSubscriber
+):
+    while True:
+        await websocket.send_text(await subscriber.get())
+
+
+@room_reservations_router.websocket("/feed")
+async def reservation_events_feed(
+    websocket: WebSocket,
+    token: str,
+    session_maker: async_sessionmaker = Depends(get_async_sessionmaker),
+    room_ids: Annotated[list[int] | None, Query()] = None,
+    start_date: datetime | None = None,
+    end_date: datetime | None = None,
+):
+    """
+    WebSocket sending the reservations created and deleted from now on, as JSON
+    messages, instead of polling /rooms/all-rooms-reservations. They can be
+    restricted to some rooms (room_ids) and to the ones overlapping the dates.
+    A client too slow to receive them gets a resync message instead, it must then
+    reload the reservations.
+
+    The access token is passed in the query (browsers can't set the headers of a
+    WebSocket).
+    """
+    # the session isn't kept during the connection
+    async with session_maker() as db:
+        try:
+            await get_current_user(token, db)
+        except HTTPException:
+            raise WebSocketException(code=status.WS_1008_POLICY_VIOLATION)
+
+    await websocket.accept()
+    subscriber = reservation_feed.subscribe(room_ids, start_date, end_date)
+    sender = asyncio.create_task(send_reservation_events(websocket, subscriber))
+    try:
+        # nothing is expected from the client, only its disconnection
+        while (await websocket.receive())["type"] != "websocket.disconnect":
+            pass
+    finally:
+        reservation_feed.unsubscribe(subscriber)
+        sender.cancel()
+        # the sender may have failed on a closed connection
+        await asyncio.gather(sender, return_exceptions=True)
+
+
+@room_reservations_router.get("/index/check", status_code=status.HTTP_200_OK)
+async def check_reservation_index(
+    current_user: Annotated[UserDTO, Depends(get_current_admin_user)],
+    db: AsyncSession = Depends(get_async_db),
+) -> RoomReservationIndexCheck:
+    """
+    This endpoint will compare the in-memory reservation index (used to detect
+    conflicts) with the database, which is the source of truth (admins only).
+    """
+    await ensure_loaded_once(db, reservation_index.ensure_loaded)
+    missing, stale = await db.run_sync(reservation_index.check)
+    return RoomReservationIndexCheck(
+        consistent=not missing and not stale,
+        missing_reservation_ids=missing,
+        stale_reservation_ids=stale,
+    )
+
+
+@room_reservations_router.post("/index/rebuild", status_code=status.HTTP_200_OK)
+async def rebuild_reservation_index(
+    current_user: Annotated[UserDTO, Depends(get_current_admin_user)],
+    db: AsyncSession = Depends(get_async_db),
+):
+    """
+    This endpoint will reload the in-memory reservation index from the database
+    (admins only).
+    """
+    await db.run_sync(reservation_index.rebuild)
+    return {"message": "Reservation index rebuilt"}
+
+
+@room_reservations_router.post("/archive", status_code=status.HTTP_200_OK)
+async def archive_past_reservations(
+    current_user: Annotated[UserDTO, Depends(get_current_admin_user)],
+    session_maker: async_sessionmaker = Depends(get_async_sessionmaker),
+):
+    """
+    This endpoint will move the reservations ended more than
+    RESERVATION_ARCHIVE_AFTER_DAYS days ago to the archive, like the background
+    archival (admins only). They are still listed by /users/my-reservations.
+    """
+    archived = await reservation_archive.archive(session_maker)
+    return {"message": "Reservations archived", "archived": archived}
+
+
+@room_reservations_router.get("/occupancy/check", status_code=status.HTTP_200_OK)
+async def check_room_occupancy(
+    current_user: Annotated[UserDTO, Depends(get_current_admin_user)],
+    db: AsyncSession = Depends(get_async_db),
+) -> RoomOccupancyCheck:
+    """
+    This endpoint will compare the in-memory room occupancy bitmaps (used to find
+    the available rooms) with the ones rebuilt from the database (admins only).
+    """
+    await ensure_loaded_once(db, room_occupancy.ensure_loaded)
+    mismatched_days = await db.run_sync(room_occupancy.check)
+    return RoomOccupancyCheck(
+        consistent=not mismatched_days,
+        mismatched_days=[
+            RoomOccupancyDay(room_id=room_id, day=day)
+            for room_id, day in mismatched_days
+        ],
+    )
+
+
+@room_reservations_router.post("/occupancy/rebuild", status_code=status.HTTP_200_OK)
+async def rebuild_room_occupancy(
+    current_user: Annotated[UserDTO, Depends(get_current_admin_user)],
+    db: AsyncSession = Depends(get_async_db),
+):
+    """
+    This endpoint will rebuild the in-memory room occupancy bitmaps from scratch,
+    from the reservations of the database (admins only).
+    """
+    await db.run_sync(room_occupancy.rebuild)
+    return {"message": "Room occupancy rebuilt"}
+
+
+@room_reservations_router.delete("/rules/{rule_id}", status_code=status.HTTP_200_OK)
+async def delete_reservation_rule(
+    current_user: Annotated[UserDTO, Depends(get_current_user)],
+    db: AsyncSession = Depends(get_async_db),
+    rule_id: int = Path(..., title="Reservation rule ID", ge=1),
+):
+    """
+    This endpoint will delete a recurring reservation with all its occurrences.
+    """
+    rule = await get_room_reservation_rule_by_id(db, rule_id)
+    if rule is None:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST, detail=RULE_NOT_FOUND_ERROR
+        )
+    if rule.user_id != current_user.id:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST, detail=RULE_NOT_ALLOWED_ERROR
+        )
+
+    await delete_room_reservation_rule(db, rule)
+    return {"message": "Reservation rule deleted"}
+
+
+@room_reservations_router.post(
+    "/rules/{rule_id}/exceptions", status_code=status.HTTP_201_CREATED
+)
+async def create_reservation_rule_exception(
+    exception_request: RoomReservationRuleExceptionRequest,
+    current_user: Annotated[UserDTO, Depends(get_current_user)],
+    db: AsyncSession = Depends(get_async_db),
+    rule_id: int = Path(..., title="Reservation rule ID", ge=1),
+) -> RoomReservationRuleDTO:
+    """
+    This endpoint will cancel one occurrence of a recurring reservation, given its
+    start_date, the room is available again during this occurrence.
+    """
+    rule = await get_room_reservation_rule_by_id(db, rule_id)
+    if rule is None:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST, detail=RULE_NOT_FOUND_ERROR
+        )
+    if rule.user_id != current_user.id:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST, detail=RULE_NOT_ALLOWED_ERROR
+        )
+
+    # the occurrence starting at start_date is generated alone (cancelled ones
+    # excluded)
+    start_date = to_naive_utc(exception_request.start_date)
+    occurrence = next(
+        rule.get_occurrences(start_date, start_date + timedelta(microseconds=1)),
+        None,
+    )
+    if occurrence is None or occurrence[0] != start_date:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=RULE_OCCURRENCE_NOT_FOUND_ERROR,
+        )
+
+    rule = await add_room_reservation_rule_exception(db, rule, *occurrence)
+    return RoomReservationRuleDTO.model_validate(rule)
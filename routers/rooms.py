@@ -1,28 +1,71 @@
-from datetime import datetime, timezone
+from collections import defaultdict
+from datetime import datetime, timedelta, timezone
 from typing import Annotated
 
-from fastapi import APIRouter, Depends, HTTPException, Path, status
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, Depends, HTTPException, Path, Query, Request, status
+from fastapi.responses import Response, StreamingResponse
+from sqlalchemy import Row
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
 
 from auth_helpers import get_current_user
-from db.models.users import User
-from db.repositories.room_reservations import (
-    create_room_reservation,
-    get_all_reservation_on_room_between_dates,
-    get_all_rooms_reservations_between_dates,
+from db.availability_cache import availability_cache
+from db.models.room_reservation_rules import FREQUENCIES, RoomReservationRule
+from db.models.room_reservations import get_overlap, merge_date_ranges
+from db.recent_writers import recent_writers
+from db.repositories.aio.reservation_revisions import get_revision
+from db.repositories.aio.room_reservation_rules import (
+    get_occurrences_between_dates,
+    get_rules_between_dates,
 )
-from db.repositories.rooms import (
-    get_all_rooms,
+from db.repositories.aio.room_reservations import (
+    get_all_rooms_reservation_rows_between_dates,
+    reserve_room,
+    reserve_room_with_rule,
+    reserve_rooms,
+    stream_all_rooms_with_reservation_rows_between_dates,
+)
+from db.repositories.aio.rooms import (
     get_all_rooms_without_reservations_between_dates,
+    get_free_slots,
     get_room_by_id,
+    get_rooms_by_ids,
+)
+from db.repositories.room_reservation_rules import RULE_OCCURRENCE_ID
+from db.repositories.room_reservations import RoomAlreadyReservedError
+from db.reservation_index import Interval, reservation_index, to_naive_utc
+from db.room_catalog import room_catalog
+from db.room_occupancy import HOUR, is_whole_hour, room_occupancy
+from db.session import ensure_loaded_once, get_async_db, get_async_sessionmaker
+from http_helpers import (
+    NDJSON_MEDIA_TYPE,
+    NDJSON_RESPONSES,
+    NOT_MODIFIED_RESPONSES,
+    ORJSONResponse,
+    accepts_ndjson,
+    dump_json,
+    get_etag,
+    get_last_write,
+    is_not_modified,
+)
+from reservation_feed import publish_reservation_event
+from reservation_group_commit import (
+    ReservationGroupCommitError,
+    reservation_group_commit,
 )
-from db.session import get_db
 from schemas.room_reservations import (
+    RoomFreeSlotDTO,
+    RoomReservationBulkResult,
     RoomReservationDTO,
+    RoomReservationRuleDTO,
+    RoomReservationRuleRequest,
+    RoomReservationsBulkRequest,
+    RoomReservationsBulkResponse,
     RoomReservationSimpleRequest,
     RoomReservationSummaryForADay,
+    dump_room_reservations_summary,
 )
 from schemas.rooms import RoomDTO
+from schemas.users import UserDTO
 
 rooms_router = APIRouter()
 
@@ -32,141 +75,568 @@ ROOM_RESERVATION_CREATION_INVALID_DATES_ERROR = (
 )
 
 ROOM_RESERVATION_CREATION_ALREADY_RESERVED_ERROR = (
-    "Room is already reserved on the following hours: "
+    "Room is already reserved on the following UTC ranges: "
 )
 ROOM_RESERVATION_CREATION_DATES_NOT_AWARE_ERROR = (
     "Dates (start_date and end_date) must be aware and in UTC timezone"
 )
+ROOM_NOT_FOUND_ERROR = "Room not found"
+ROOM_RESERVATION_CREATION_FAILED_ERROR = (
+    "The reservation couldn't be saved, please retry later"
+)
+# followed by the positions of the conflicting items of a bulk request
+BULK_RESERVATION_CONFLICT_ERROR = ", with the reservations of the request: "
+FREE_SLOTS_MAX_LIMIT = 100
+ROOM_RESERVATION_RULE_INVALID_DURATION_ERROR = (
+    "Invalid rule, an occurrence must end before the start of the next one"
+)
+ROOM_RESERVATION_RULE_INVALID_UNTIL_ERROR = (
+    "Invalid rule, until must be aware and after the end of the first occurrence"
+)
 
 
-@rooms_router.get("/", status_code=status.HTTP_200_OK)
+def get_reservation_dates_error(start_date: datetime, end_date: datetime) -> str | None:
+    # check if dates are aware and utc or rize an error
+    if (
+        start_date.tzinfo is None
+        or start_date.tzinfo.utcoffset(start_date) is None
+        or end_date.tzinfo is None
+        or end_date.tzinfo.utcoffset(end_date) is None
+    ):
+        return ROOM_RESERVATION_CREATION_DATES_NOT_AWARE_ERROR
+
+    # multiple checks
+    # if the start_date if after now.
+    # if the start_date is before the end_date.
+    # if start_date is not at the beginning of an hour
+    # and end_date is not at the beginning of an hour.
+    # should be done in pydantic schema
+    if (
+        start_date < datetime.now(timezone.utc)
+        or start_date >= end_date
+        or start_date.minute != 0
+        or start_date.second != 0
+        or start_date.microsecond != 0
+        or end_date.minute != 0
+        or end_date.second != 0
+        or end_date.microsecond != 0
+    ):
+        return ROOM_RESERVATION_CREATION_INVALID_DATES_ERROR
+    return None
+
+
+def get_already_reserved_error(
+    start_date: datetime, end_date: datetime, overlapping: list[Interval]
+) -> str:
+    # dates of the index are naive UTC dates
+    requested_start_date = to_naive_utc(start_date)
+    requested_end_date = to_naive_utc(end_date)
+    common_date_ranges = merge_date_ranges(
+        [
+            get_overlap(
+                overlapping_start_date,
+                overlapping_end_date,
+                requested_start_date,
+                requested_end_date,
+            )
+            for overlapping_start_date, overlapping_end_date, _ in overlapping
+        ]
+    )
+
+    error_msg = ROOM_RESERVATION_CREATION_ALREADY_RESERVED_ERROR
+    error_msg += ", ".join(
+        [
+            f"{common_start_date.replace(tzinfo=timezone.utc).isoformat()} - "
+            f"{common_end_date.replace(tzinfo=timezone.utc).isoformat()}"
+            for common_start_date, common_end_date in common_date_ranges
+        ]
+    )
+    return error_msg
+
+
+@rooms_router.get(
+    "/",
+    status_code=status.HTTP_200_OK,
+    responses=NOT_MODIFIED_RESPONSES,
+)
 async def get_all(
-    current_user: Annotated[User, Depends(get_current_user)],
-    db: Session = Depends(get_db),
+    request: Request,
+    current_user: Annotated[UserDTO, Depends(get_current_user)],
+    db: AsyncSession = Depends(get_async_db),
 ) -> list[RoomDTO]:
-    rooms = get_all_rooms(db)
-    return [RoomDTO(room) for room in rooms]
+    """
+    The rooms are served from the in-memory catalog, already serialized, with an
+    ETag: a request with If-None-Match gets a 304 while the rooms don't change.
+    """
+    await ensure_loaded_once(db, room_catalog.ensure_loaded)
+    catalog = room_catalog.current
+    headers = {"ETag": catalog.etag}
+    if is_not_modified(request, catalog.etag):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+    return Response(
+        content=catalog.content, media_type="application/json", headers=headers
+    )
 
 
 @rooms_router.post("/{room_id}/create-reservation", status_code=status.HTTP_201_CREATED)
 async def create_reservation(
     room_reservation: RoomReservationSimpleRequest,
-    current_user: Annotated[User, Depends(get_current_user)],
+    current_user: Annotated[UserDTO, Depends(get_current_user)],
     room_id: int = Path(..., title="Room ID", ge=1),
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
+    session_maker: async_sessionmaker = Depends(get_async_sessionmaker),
 ) -> RoomReservationDTO:
     """
     This endpoint will allow a user to create a reservation for a room.
     User must be authenticated to access this endpoint.
-    If the room is already reserved at the same time, the endpoint will return a 400 error with a message indicating the hours
+    If the room is already reserved at the same time, the endpoint will return a 400 error with a message indicating the
+    reserved UTC ranges
     """
 
-    room = get_room_by_id(db, room_id)
+    room = await get_room_by_id(db, room_id)
     if room is None:
         raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST, detail="Room not found"
+            status_code=status.HTTP_400_BAD_REQUEST, detail=ROOM_NOT_FOUND_ERROR
         )
 
-    # check if dates are aware and utc or rize an error
-    if (
-        room_reservation.start_date.tzinfo is None
-        or room_reservation.start_date.tzinfo.utcoffset(room_reservation.start_date)
-        is None
-        or room_reservation.end_date.tzinfo is None
-        or room_reservation.end_date.tzinfo.utcoffset(room_reservation.end_date) is None
+    dates_error = get_reservation_dates_error(
+        room_reservation.start_date, room_reservation.end_date
+    )
+    if dates_error is not None:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=dates_error)
+
+    # check if there is already a reservation on this room at the same time
+    # the index answers without touching the database when the room is free, the
+    # conflicts it finds are confirmed by the database (their reservations may have
+    # been deleted by another worker)
+    await ensure_loaded_once(db, reservation_index.ensure_loaded)
+    overlapping = await db.run_sync(
+        reservation_index.confirm_overlapping,
+        room.id,
+        room_reservation.start_date,
+        room_reservation.end_date,
+    )
+    reservation = None
+    if not overlapping:
+        # the database stays the source of truth (it could have been updated by
+        # another request or worker): the check is done again while the room is
+        # locked, and the index is fixed if it missed some reservations
+        try:
+            if reservation_group_commit.enabled:
+                # committed with the reservations requested at the same time, the
+                # connection of the request isn't held while the group waits
+                await db.commit()
+                try:
+                    reservation = await reservation_group_commit.reserve(
+                        session_maker,
+                        room,
+                        current_user,
+                        room_reservation.start_date,
+                        room_reservation.end_date,
+                    )
+                except ReservationGroupCommitError:
+                    # the transaction of the group failed, nothing was saved
+                    raise HTTPException(
+                        status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                        detail=ROOM_RESERVATION_CREATION_FAILED_ERROR,
+                    )
+            else:
+                reservation = await reserve_room(
+                    db,
+                    room,
+                    current_user,
+                    room_reservation.start_date,
+                    room_reservation.end_date,
+                )
+                # the group commit publishes its reservations itself
+                publish_reservation_event(
+                    "created",
+                    reservation.id,
+                    reservation.room_id,
+                    reservation.user_id,
+                    reservation.start_date,
+                    reservation.end_date,
+                )
+        except RoomAlreadyReservedError as error:
+            for start_date, end_date, reservation_id in error.intervals:
+                # the occurrences of the rules aren't indexed
+                if reservation_id != RULE_OCCURRENCE_ID:
+                    reservation_index.add(room_id, start_date, end_date, reservation_id)
+            overlapping = error.intervals
+    if overlapping:
+        error_msg = get_already_reserved_error(
+            room_reservation.start_date, room_reservation.end_date, overlapping
+        )
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=error_msg)
+
+    # the user of the reservation is the current user, it isn't loaded
+    return RoomReservationDTO(
+        id=reservation.id,
+        user=current_user,
+        room=RoomDTO.model_validate(room),
+        start_date=reservation.start_date,
+        end_date=reservation.end_date,
+    )
+
+
+@rooms_router.post(
+    "/{room_id}/create-reservation-rule", status_code=status.HTTP_201_CREATED
+)
+async def create_reservation_rule(
+    rule_request: RoomReservationRuleRequest,
+    current_user: Annotated[UserDTO, Depends(get_current_user)],
+    room_id: int = Path(..., title="Room ID", ge=1),
+    db: AsyncSession = Depends(get_async_db),
+) -> RoomReservationRuleDTO:
+    """
+    This endpoint will allow a user to create a recurring reservation for a room:
+    the first occurrence (start_date, end_date) is repeated every interval days or
+    weeks, until the end of the last occurrence (forever if until isn't given).
+    The occurrences aren't stored, they are generated when they are queried.
+    If an occurrence overlaps a reservation or an occurrence of another rule, the
+    endpoint will return a 400 error with a message indicating the reserved UTC
+    ranges.
+    """
+    room = await get_room_by_id(db, room_id)
+    if room is None:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST, detail=ROOM_NOT_FOUND_ERROR
+        )
+
+    dates_error = get_reservation_dates_error(
+        rule_request.start_date, rule_request.end_date
+    )
+    if dates_error is not None:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=dates_error)
+    period = FREQUENCIES[rule_request.frequency] * rule_request.interval
+    if rule_request.end_date - rule_request.start_date > period:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=ROOM_RESERVATION_RULE_INVALID_DURATION_ERROR,
+        )
+    until = rule_request.until
+    if until is not None and (
+        until.tzinfo is None
+        or until.tzinfo.utcoffset(until) is None
+        or until < rule_request.end_date
     ):
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
-            detail=ROOM_RESERVATION_CREATION_DATES_NOT_AWARE_ERROR,
+            detail=ROOM_RESERVATION_RULE_INVALID_UNTIL_ERROR,
         )
 
-    # multiple checks
-    # if the start_date if after now.
-    # if the start_date is before the end_date.
-    # if start_date is not at the beginning of an hour
-    # and end_date is not at the beginning of an hour.
-    # should be done in pydantic schema
-    if (
-        room_reservation.start_date < datetime.now(timezone.utc)
-        or room_reservation.start_date >= room_reservation.end_date
-        or room_reservation.start_date.minute != 0
-        or room_reservation.start_date.second != 0
-        or room_reservation.start_date.microsecond != 0
-        or room_reservation.end_date.minute != 0
-        or room_reservation.end_date.second != 0
-        or room_reservation.end_date.microsecond != 0
-    ):
+    try:
+        rule = await reserve_room_with_rule(
+            db,
+            room,
+            current_user,
+            rule_request.start_date,
+            rule_request.end_date,
+            rule_request.frequency,
+            rule_request.interval,
+            until,
+        )
+    except RoomAlreadyReservedError as error:
+        for start_date, end_date, reservation_id in error.intervals:
+            if reservation_id != RULE_OCCURRENCE_ID:
+                reservation_index.add(room_id, start_date, end_date, reservation_id)
+        # the whole conflicting ranges are reported
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
-            detail=ROOM_RESERVATION_CREATION_INVALID_DATES_ERROR,
+            detail=get_already_reserved_error(
+                min(start_date for start_date, _, _ in error.intervals),
+                max(end_date for _, end_date, _ in error.intervals),
+                error.intervals,
+            ),
         )
 
-    # check if there is already a reservation on this room at the same time
-    reservations = get_all_reservation_on_room_between_dates(
-        db, room, room_reservation.start_date, room_reservation.end_date
-    )
-    if reservations:
-        common_hours = set()
-        for reservation in reservations:
-            common_hours.update(
-                reservation.get_hours_in_common(
-                    room_reservation.start_date, room_reservation.end_date
-                )
-            )
+    return RoomReservationRuleDTO.model_validate(rule)
 
-        error_msg = ROOM_RESERVATION_CREATION_ALREADY_RESERVED_ERROR
-        error_msg += ", ".join([f"{hour}:00" for hour in common_hours])
-        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=error_msg)
 
-    # create reservation
-    reservation = create_room_reservation(
-        db, room, current_user, room_reservation.start_date, room_reservation.end_date
+@rooms_router.post("/create-reservations", status_code=status.HTTP_200_OK)
+async def create_reservations(
+    bulk_request: RoomReservationsBulkRequest,
+    current_user: Annotated[UserDTO, Depends(get_current_user)],
+    db: AsyncSession = Depends(get_async_db),
+) -> RoomReservationsBulkResponse:
+    """
+    This endpoint will allow a user to create many reservations (of one or many rooms)
+    at once, for example the occurrences of a recurring meeting.
+    Each reservation is checked like with create-reservation, and the results are
+    returned in the order of the request.
+    If all_or_nothing is true (default), no reservation is created when one of them
+    is invalid or already reserved, otherwise the other ones are created.
+    """
+    requests = bulk_request.reservations
+    rooms = await get_rooms_by_ids(db, list({request.room_id for request in requests}))
+    room_ids = {room.id for room in rooms}
+
+    results: list[RoomReservationBulkResult] = []
+    valid_positions: list[int] = []
+    for position, request in enumerate(requests):
+        if request.room_id not in room_ids:
+            error = ROOM_NOT_FOUND_ERROR
+        else:
+            error = get_reservation_dates_error(request.start_date, request.end_date)
+        if error is not None:
+            results.append(RoomReservationBulkResult(status="invalid", detail=error))
+        else:
+            results.append(RoomReservationBulkResult(status="not_created"))
+            valid_positions.append(position)
+
+    if valid_positions and (
+        not bulk_request.all_or_nothing or len(valid_positions) == len(requests)
+    ):
+        ids, conflicts = await reserve_rooms(
+            db,
+            current_user,
+            [
+                (
+                    requests[position].room_id,
+                    requests[position].start_date,
+                    requests[position].end_date,
+                )
+                for position in valid_positions
+            ],
+            bulk_request.all_or_nothing,
+        )
+        for position, reservation_id, overlapping in zip(
+            valid_positions, ids, conflicts
+        ):
+            request = requests[position]
+            if reservation_id is not None:
+                results[position] = RoomReservationBulkResult(
+                    status="created", reservation_id=reservation_id
+                )
+                publish_reservation_event(
+                    "created",
+                    reservation_id,
+                    request.room_id,
+                    current_user.id,
+                    request.start_date,
+                    request.end_date,
+                )
+            elif overlapping:
+                error = get_already_reserved_error(
+                    request.start_date, request.end_date, overlapping
+                )
+                # the previous items of the request have negative ids
+                conflicting_positions = [
+                    str(valid_positions[-id_ - 1])
+                    for _, _, id_ in overlapping
+                    if id_ < 0
+                ]
+                if conflicting_positions:
+                    error += BULK_RESERVATION_CONFLICT_ERROR + ", ".join(
+                        conflicting_positions
+                    )
+                results[position] = RoomReservationBulkResult(
+                    status="conflict", detail=error
+                )
+                for start_date, end_date, id_ in overlapping:
+                    if id_ > 0:
+                        reservation_index.add(
+                            request.room_id, start_date, end_date, id_
+                        )
+
+    return RoomReservationsBulkResponse(
+        created=sum(result.status == "created" for result in results),
+        results=results,
     )
-    return RoomReservationDTO(reservation)
 
 
-@rooms_router.get("/all-rooms-reservations", status_code=status.HTTP_200_OK)
+def group_occurrences_by_room(
+    occurrences: list[tuple[RoomReservationRule, datetime, datetime]]
+) -> dict[int, list[tuple[RoomReservationRule, datetime, datetime]]]:
+    rooms_occurrences = defaultdict(list)
+    for occurrence in occurrences:
+        rooms_occurrences[occurrence[0].room_id].append(occurrence)
+    return rooms_occurrences
+
+
+async def stream_rooms_reservations_summary(
+    session_maker: async_sessionmaker,
+    user: UserDTO,
+    start_date: datetime,
+    end_date: datetime,
+    last_write: float | None = None,
+):
+    async with session_maker(info={"user_id": user.id, "last_write": last_write}) as db:
+        rooms_rules = defaultdict(list)
+        for rule in await get_rules_between_dates(db, start_date, end_date):
+            rooms_rules[rule.room_id].append(rule)
+        naive_start_date = to_naive_utc(start_date)
+        naive_end_date = to_naive_utc(end_date)
+        async for (
+            room,
+            reservation_rows,
+        ) in stream_all_rooms_with_reservation_rows_between_dates(
+            db, start_date, end_date
+        ):
+            # the occurrences of a room are generated only between the dates, when
+            # its line is sent
+            occurrences = (
+                (rule, occurrence_start_date, occurrence_end_date)
+                for rule in rooms_rules.get(room.id, [])
+                for occurrence_start_date, occurrence_end_date in rule.get_occurrences(
+                    naive_start_date, naive_end_date
+                )
+            )
+            summary = dump_room_reservations_summary(
+                room.id, room.name, reservation_rows, occurrences
+            )
+            yield dump_json(summary) + b"\n"
+
+
+@rooms_router.get(
+    "/all-rooms-reservations",
+    status_code=status.HTTP_200_OK,
+    responses={**NDJSON_RESPONSES, **NOT_MODIFIED_RESPONSES},
+)
 async def get_all_rooms_reservations(
+    request: Request,
     start_date: datetime,
     end_date: datetime,
-    current_user: Annotated[User, Depends(get_current_user)],
-    db: Session = Depends(get_db),
+    current_user: Annotated[UserDTO, Depends(get_current_user)],
+    db: AsyncSession = Depends(get_async_db),
+    session_maker: async_sessionmaker = Depends(get_async_sessionmaker),
 ) -> list[RoomReservationSummaryForADay]:
     """
-    This endpoint will return all the reservations for all the rooms for a given day.
+    This endpoint will return all the reservations for all the rooms for a given day,
+    with the occurrences of the recurring reservations.
     The endpoint will take one parameter:
     - date: the date for which we want to get the reservations.
 
+    If application/x-ndjson is accepted, the response is streamed with one room
+    summary by line, read from the database as it's sent.
+
+    The response has an ETag, a request with If-None-Match gets a 304 without
+    querying the reservations while none of them (and no room) changes.
+
     The user must be authenticated to access this endpoint.
     """
 
-    rooms = get_all_rooms(db)
-
-    reservations = get_all_rooms_reservations_between_dates(db, start_date, end_date)
-
-    rooms_reservations_summary: list[RoomReservationSummaryForADay] = []
-    for room in rooms:
-        rooms_reservations_summary.append(
-            RoomReservationSummaryForADay(
-                room_id=room.id,
-                room_name=room.name,
-                reservations=[
-                    reservation
-                    for reservation in reservations
-                    if reservation.room_id == room.id
-                ],
-            )
+    await ensure_loaded_once(db, room_catalog.ensure_loaded)
+    # read before the reservations: a change made meanwhile gets a new ETag
+    etag = get_etag(
+        request,
+        await get_revision(db),
+        room_catalog.current.etag,
+    )
+    headers = {"ETag": etag}
+    if is_not_modified(request, etag):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+    # the replicas may not have the last changes yet: the response isn't cached
+    # with the new ETag until they have caught up
+    if recent_writers.lagging():
+        headers = {}
+
+    if accepts_ndjson(request):
+        return StreamingResponse(
+            stream_rooms_reservations_summary(
+                session_maker,
+                current_user,
+                start_date,
+                end_date,
+                get_last_write(request),
+            ),
+            media_type=NDJSON_MEDIA_TYPE,
+            headers=headers,
+        )
+
+    # the rooms come from the catalog, only the reservations are queried
+    rooms_reservations: dict[int, list[Row]] = defaultdict(list)
+    for row in await get_all_rooms_reservation_rows_between_dates(
+        db, start_date, end_date
+    ):
+        rooms_reservations[row.room_id].append(row)
+    rooms = room_catalog.current.rooms
+    if not rooms_reservations.keys() <= {room.id for room in rooms}:
+        # a room created by another process
+        await db.run_sync(room_catalog.load)
+        rooms = room_catalog.current.rooms
+    rooms_occurrences = group_occurrences_by_room(
+        await get_occurrences_between_dates(db, start_date, end_date)
+    )
+
+    # serialized without the validation of the response model
+    rooms_reservations_summary = [
+        dump_room_reservations_summary(
+            room.id,
+            room.name,
+            rooms_reservations.get(room.id, []),
+            rooms_occurrences.get(room.id, []),
         )
-    return rooms_reservations_summary
+        for room in rooms
+    ]
+    return ORJSONResponse(rooms_reservations_summary, headers=headers)
 
 
 @rooms_router.get("/availables", status_code=status.HTTP_200_OK)
 async def get_available_rooms(
     start_date: datetime,
     end_date: datetime,
-    current_user: Annotated[User, Depends(get_current_user)],
-    db: Session = Depends(get_db),
+    current_user: Annotated[UserDTO, Depends(get_current_user)],
+    db: AsyncSession = Depends(get_async_db),
 ) -> list[RoomDTO]:
-    rooms = get_all_rooms_without_reservations_between_dates(db, start_date, end_date)
-    available_rooms = [RoomDTO(room) for room in rooms]
+    """
+    This endpoint will return the rooms without reservations between the dates.
+    The answers are cached for a few seconds by dates (the dashboards poll this
+    endpoint), the changes of the reservations invalidate them.
+    """
+    available_rooms = availability_cache.get(start_date, end_date)
+    if available_rooms is not None:
+        return available_rooms
+
+    generation = availability_cache.generation
+    # the occupancy bitmaps answer for the windows on whole hours
+    await ensure_loaded_once(db, room_occupancy.ensure_loaded)
+    rooms = await get_all_rooms_without_reservations_between_dates(
+        db, start_date, end_date
+    )
+    available_rooms = [RoomDTO.model_validate(room) for room in rooms]
+    # not cached while the replicas may miss the last changes
+    if not recent_writers.lagging():
+        availability_cache.set(
+            start_date,
+            end_date,
+            [room.id for room in rooms],
+            available_rooms,
+            generation,
+        )
     return available_rooms
+
+
+@rooms_router.get("/free-slots", status_code=status.HTTP_200_OK)
+async def get_room_free_slots(
+    start_date: datetime,
+    end_date: datetime,
+    current_user: Annotated[UserDTO, Depends(get_current_user)],
+    duration_hours: int = Query(1, ge=1),
+    limit: int = Query(10, ge=1, le=FREE_SLOTS_MAX_LIMIT),
+    room_ids: list[int] | None = Query(None),
+    db: AsyncSession = Depends(get_async_db),
+) -> list[RoomFreeSlotDTO]:
+    """
+    This endpoint will return the earliest free slots of duration_hours between
+    start_date and end_date, in all the rooms or in the given room_ids, as (room,
+    start_date, end_date) sorted by start date.
+    The slots start on whole hours in the future, they can be reserved with
+    create-reservation.
+    """
+    # the first whole hour of the window which is in the future (naive UTC dates)
+    start_date = max(to_naive_utc(start_date), to_naive_utc(datetime.now(timezone.utc)))
+    if not is_whole_hour(start_date):
+        start_date = start_date.replace(minute=0, second=0, microsecond=0) + HOUR
+    duration = timedelta(hours=duration_hours)
+    free_slots = await get_free_slots(
+        db, start_date, end_date, duration, limit, room_ids
+    )
+    return [
+        RoomFreeSlotDTO(
+            room=RoomDTO.model_validate(room),
+            start_date=free_start_date,
+            end_date=free_start_date + duration,
+        )
+        for room, free_start_date in free_slots
+    ]
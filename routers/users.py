@@ -1,32 +1,157 @@
+from datetime import datetime
 from typing import Annotated
 
-from fastapi import APIRouter, Depends, status
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, Depends, HTTPException, Request, status
+from fastapi.responses import Response, StreamingResponse
+from sqlalchemy import Row
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
 
 from auth_helpers import get_current_user
-from db.models.users import User
-from db.repositories.room_reservations import get_all_reservation_by_user
-from db.session import get_db
-from schemas.room_reservations import RoomReservationsWithPagination
+from db.models.room_reservations import RoomReservation
+from db.repositories.aio.reservation_revisions import get_revision
+from db.repositories.aio.room_reservations import (
+    count_reservations_by_user,
+    get_reservation_rows_by_user,
+    get_reservation_rows_by_user_before,
+    stream_reservation_rows_by_user,
+)
+from db.session import get_async_db, get_async_sessionmaker
+from http_helpers import (
+    NDJSON_MEDIA_TYPE,
+    NDJSON_RESPONSES,
+    NOT_MODIFIED_RESPONSES,
+    ORJSONResponse,
+    accepts_ndjson,
+    decode_cursor,
+    dump_json,
+    encode_cursor,
+    get_etag,
+    get_last_write,
+    is_not_modified,
+)
+from schemas.room_reservations import (
+    RoomReservationsWithPagination,
+    dump_room_reservation_row,
+)
+from schemas.users import UserDTO
 
 users_router = APIRouter()
 
+INVALID_CURSOR_ERROR = "Invalid cursor"
 
-@users_router.get("/my-reservations", status_code=status.HTTP_200_OK)
+
+def get_reservation_cursor(reservation: RoomReservation | Row) -> str:
+    return encode_cursor([reservation.start_date.isoformat(), reservation.id])
+
+
+def parse_reservation_cursor(cursor: str) -> tuple[datetime, int]:
+    try:
+        start_date, reservation_id = decode_cursor(cursor)
+        return datetime.fromisoformat(start_date), int(reservation_id)
+    except (ValueError, TypeError):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST, detail=INVALID_CURSOR_ERROR
+        )
+
+
+async def stream_reservations(
+    session_maker: async_sessionmaker,
+    user: UserDTO,
+    limit: int,
+    page: int,
+    before: tuple[datetime, int] | None,
+    last_write: float | None = None,
+):
+    async with session_maker(info={"user_id": user.id, "last_write": last_write}) as db:
+        async for row in stream_reservation_rows_by_user(db, user, limit, page, before):
+            yield dump_json(dump_room_reservation_row(row)) + b"\n"
+
+
+@users_router.get(
+    "/my-reservations",
+    status_code=status.HTTP_200_OK,
+    responses={**NDJSON_RESPONSES, **NOT_MODIFIED_RESPONSES},
+)
 async def get_my_reservations(
-    current_user: Annotated[User, Depends(get_current_user)],
-    db: Session = Depends(get_db),
+    request: Request,
+    current_user: Annotated[UserDTO, Depends(get_current_user)],
+    db: AsyncSession = Depends(get_async_db),
+    session_maker: async_sessionmaker = Depends(get_async_sessionmaker),
     limit: int = 10,
     page: int = 0,
+    cursor: str | None = None,
+    with_total: bool | None = None,
 ) -> RoomReservationsWithPagination:
+    """
+    The reservations are paginated either with page (deep pages are slower) or
+    with the next_cursor returned with the previous page (page is then ignored).
+    A page full of reservations has a next_cursor, even if the next page is empty.
+    The total requires a count of all the reservations of the user: by default
+    it's returned with the pages but not with the cursors (with_total=true or
+    false to choose).
+
+    If application/x-ndjson is accepted, the reservations of the page are streamed
+    with one reservation by line (without the pagination fields).
+
+    The response has an ETag, a request with If-None-Match gets a 304 without
+    querying the reservations while the ones of the user don't change.
+    """
 
-    reservations, total, limit, page = get_all_reservation_by_user(
-        db, current_user, limit, page
+    before = parse_reservation_cursor(cursor) if cursor is not None else None
+    if with_total is None:
+        with_total = before is None
+
+    # read before the reservations: a change made meanwhile gets a new ETag
+    etag = get_etag(
+        request,
+        current_user.id,
+        await get_revision(db, current_user.id),
     )
+    headers = {"ETag": etag}
+    if is_not_modified(request, etag):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+
+    if accepts_ndjson(request):
+        return StreamingResponse(
+            stream_reservations(
+                session_maker,
+                current_user,
+                limit,
+                page,
+                before,
+                get_last_write(request),
+            ),
+            media_type=NDJSON_MEDIA_TYPE,
+            headers=headers,
+        )
+
+    if before is None:
+        reservations, total, limit, page = await get_reservation_rows_by_user(
+            db, current_user, limit, page, with_total
+        )
+    else:
+        reservations = await get_reservation_rows_by_user_before(
+            db, current_user, limit, before
+        )
+        total = (
+            await count_reservations_by_user(db, current_user) if with_total else None
+        )
+        page = None
 
-    return RoomReservationsWithPagination(
-        reservations=reservations,
-        total=total,
-        limit=limit,
-        page=page,
+    # serialized without the validation of the response model
+    return ORJSONResponse(
+        {
+            "reservations": [
+                dump_room_reservation_row(reservation) for reservation in reservations
+            ],
+            "total": total,
+            "limit": limit,
+            "page": page,
+            "next_cursor": (
+                get_reservation_cursor(reservations[-1])
+                if reservations and len(reservations) == limit
+                else None
+            ),
+        },
+        headers=headers,
     )
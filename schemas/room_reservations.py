@@ -1,13 +1,23 @@
-from datetime import datetime, timezone
+from collections.abc import Iterable
+from datetime import date, datetime, timezone
+from typing import Literal
 
-from db.models.room_reservations import RoomReservation
-from pydantic import BaseModel, ConfigDict, field_serializer, field_validator, validator
+from db.models.room_reservation_rules import RoomReservationRule
+from pydantic import BaseModel, ConfigDict, Field, field_validator
+from sqlalchemy import Row
 
-from .rooms import RoomDTO
-from .users import UserDTO
+from .rooms import RoomDTO, dump_room
+from .users import UserDTO, dump_user
+
+# maximum number of reservations created by a bulk request
+BULK_MAX_RESERVATIONS = 1000
 
 
 class RoomReservationDTO(BaseModel):
+    # built from a RoomReservation (with its user and room) with
+    # RoomReservationDTO.model_validate(reservation)
+    model_config = ConfigDict(from_attributes=True)
+
     id: int
     user: UserDTO
     room: RoomDTO
@@ -20,37 +30,27 @@ class RoomReservationDTO(BaseModel):
             dt = dt.replace(tzinfo=timezone.utc)
         return dt
 
-    def __init__(self, reservation: RoomReservation):
-        super().__init__(
-            start_date=reservation.start_date,
-            end_date=reservation.end_date,
-            id=reservation.id,
-            user=UserDTO(reservation.user),
-            room=RoomDTO(reservation.room),
-        )
+
+def dump_room_reservation_row(row: Row) -> dict:
+    # same content as RoomReservationDTO, from a row of select_reservation_rows
+    return {
+        "id": row.id,
+        "user": {"id": row.user_id, "email": row.user_email},
+        "room": {"id": row.room_id, "name": row.room_name},
+        "start_date": row.start_date,
+        "end_date": row.end_date,
+    }
 
 
 class RoomReservationsWithPagination(BaseModel):
     reservations: list[RoomReservationDTO]
-    total: int
+    # None when the total isn't requested
+    total: int | None
     limit: int
-    page: int
-
-    def __init__(
-        self,
-        reservations: list[RoomReservation],
-        total: int,
-        limit: int,
-        page: int,
-    ):
-        super().__init__(
-            reservations=[
-                RoomReservationDTO(reservation) for reservation in reservations
-            ],
-            total=total,
-            limit=limit,
-            page=page,
-        )
+    # None when the page is requested with a cursor
+    page: int | None
+    # cursor of the next page, None on the last page
+    next_cursor: str | None = None
 
 
 class RoomReservationSimpleRequest(BaseModel):
@@ -58,18 +58,170 @@ class RoomReservationSimpleRequest(BaseModel):
     end_date: datetime
 
 
+class RoomReservationRequest(RoomReservationSimpleRequest):
+    room_id: int
+
+
+class RoomReservationsBulkRequest(BaseModel):
+    reservations: list[RoomReservationRequest] = Field(max_length=BULK_MAX_RESERVATIONS)
+    # if true, no reservation is created when one of them can't be created
+    all_or_nothing: bool = True
+
+
+class RoomReservationEvent(BaseModel):
+    # created or deleted reservation, or resync when the events of a client were
+    # dropped (it must then reload the reservations)
+    type: Literal["created", "deleted", "resync"]
+    reservation_id: int | None = None
+    room_id: int | None = None
+    user_id: int | None = None
+    start_date: datetime | None = None
+    end_date: datetime | None = None
+
+    @field_validator("start_date", "end_date")
+    def validate_dates(cls, dt, values):
+        if dt is not None and (dt.tzinfo is None or dt.tzinfo.utcoffset(dt) is None):
+            dt = dt.replace(tzinfo=timezone.utc)
+        return dt
+
+
+class RoomReservationBulkResult(BaseModel):
+    # created, conflict (with a reservation or a previous item of the request),
+    # invalid (dates or room) or not_created (all or nothing request which failed)
+    status: Literal["created", "conflict", "invalid", "not_created"]
+    reservation_id: int | None = None
+    detail: str | None = None
+
+
+class RoomReservationsBulkResponse(BaseModel):
+    created: int
+    results: list[RoomReservationBulkResult]
+
+
+class RoomReservationOccurrenceDTO(BaseModel):
+    model_config = ConfigDict(from_attributes=True)
+
+    rule_id: int
+    user: UserDTO
+    room: RoomDTO
+    start_date: datetime
+    end_date: datetime
+
+    @field_validator("start_date", "end_date")
+    def validate_dates(cls, dt, values):
+        if dt.tzinfo is None or dt.tzinfo.utcoffset(dt) is None:
+            dt = dt.replace(tzinfo=timezone.utc)
+        return dt
+
+
+def dump_room_reservation_occurrence(
+    rule: RoomReservationRule, start_date: datetime, end_date: datetime
+) -> dict:
+    # same content as RoomReservationOccurrenceDTO, without the validation
+    return {
+        "rule_id": rule.id,
+        "user": dump_user(rule.user),
+        "room": dump_room(rule.room),
+        "start_date": start_date,
+        "end_date": end_date,
+    }
+
+
+class RoomReservationRuleDTO(BaseModel):
+    # built from a RoomReservationRule (with its user, room and exceptions) with
+    # RoomReservationRuleDTO.model_validate(rule)
+    model_config = ConfigDict(from_attributes=True)
+
+    id: int
+    user: UserDTO
+    room: RoomDTO
+    # first occurrence
+    start_date: datetime
+    end_date: datetime
+    frequency: str
+    interval: int
+    until: datetime | None
+    # start dates of the cancelled occurrences
+    exceptions: list[datetime]
+
+    @field_validator("start_date", "end_date", "until")
+    def validate_dates(cls, dt, values):
+        if dt is not None and (dt.tzinfo is None or dt.tzinfo.utcoffset(dt) is None):
+            dt = dt.replace(tzinfo=timezone.utc)
+        return dt
+
+    @field_validator("exceptions", mode="before")
+    def validate_exceptions(cls, exceptions, values):
+        # RoomReservationRuleException of the rule
+        return sorted(
+            exception.start_date.replace(tzinfo=timezone.utc)
+            for exception in exceptions
+        )
+
+
+class RoomReservationRuleRequest(RoomReservationSimpleRequest):
+    # the first occurrence (start_date, end_date) is repeated every interval days
+    # or weeks, until the end of the last occurrence (endless if None)
+    frequency: Literal["daily", "weekly"]
+    interval: int = Field(1, ge=1)
+    until: datetime | None = None
+
+
+class RoomReservationRuleExceptionRequest(BaseModel):
+    # start date of the cancelled occurrence
+    start_date: datetime
+
+
 class RoomReservationSummaryForADay(BaseModel):
     id: int
     name: str
     reservations: list[RoomReservationDTO]
+    # occurrences of the recurring reservations
+    occurrences: list[RoomReservationOccurrenceDTO]
 
-    def __init__(
-        self, room_id: int, room_name: str, reservations: list[RoomReservation]
-    ):
-        super().__init__(
-            id=room_id,
-            name=room_name,
-            reservations=[
-                RoomReservationDTO(reservation) for reservation in reservations
-            ],
-        )
+
+def dump_room_reservations_summary(
+    room_id: int,
+    room_name: str,
+    reservation_rows: list[Row],
+    occurrences: Iterable[tuple[RoomReservationRule, datetime, datetime]] = (),
+) -> dict:
+    # same content as RoomReservationSummaryForADay, without the validation
+    return {
+        "id": room_id,
+        "name": room_name,
+        "reservations": [dump_room_reservation_row(row) for row in reservation_rows],
+        "occurrences": [
+            dump_room_reservation_occurrence(rule, start_date, end_date)
+            for rule, start_date, end_date in occurrences
+        ],
+    }
+
+
+class RoomFreeSlotDTO(BaseModel):
+    room: RoomDTO
+    start_date: datetime
+    end_date: datetime
+
+    @field_validator("start_date", "end_date")
+    def validate_dates(cls, dt, values):
+        if dt.tzinfo is None or dt.tzinfo.utcoffset(dt) is None:
+            dt = dt.replace(tzinfo=timezone.utc)
+        return dt
+
+
+class RoomReservationIndexCheck(BaseModel):
+    consistent: bool
+    missing_reservation_ids: list[int]
+    stale_reservation_ids: list[int]
+
+
+class RoomOccupancyDay(BaseModel):
+    room_id: int
+    day: date
+
+
+class RoomOccupancyCheck(BaseModel):
+    consistent: bool
+    # days of the rooms whose bitmap differs from the database
+    mismatched_days: list[RoomOccupancyDay]
@@ -1,10 +1,15 @@
 from db.models.rooms import Room
-from pydantic import BaseModel
+from pydantic import BaseModel, ConfigDict
 
 
 class RoomDTO(BaseModel):
+    # built from a Room with RoomDTO.model_validate(room)
+    model_config = ConfigDict(from_attributes=True)
+
     id: int
     name: str
 
-    def __init__(self, room: Room):
-        super().__init__(id=room.id, name=room.name)
+
+def dump_room(room: Room) -> dict:
+    # same content as RoomDTO, without the validation (hot paths)
+    return {"id": room.id, "name": room.name}
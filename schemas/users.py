@@ -1,22 +1,23 @@
 from db.models.users import User
-from pydantic import BaseModel
+from pydantic import BaseModel, ConfigDict
 
 
 class UserDTO(BaseModel):
+    # built from a User with UserDTO.model_validate(user)
+    model_config = ConfigDict(from_attributes=True)
+
     id: int
     email: str
 
-    def __init__(self, user: User):
-        super().__init__(id=user.id, email=user.email)
+
+def dump_user(user: User) -> dict:
+    # same content as UserDTO, without the validation (hot paths)
+    return {"id": user.id, "email": user.email}
 
 
 class UserInDB(UserDTO):
     hashed_password: str
 
-    def __init__(self, user: User):
-        super().__init__(user)
-        self.hashed_password = user.hashed_password
-
 
 class UserLoginRequest(BaseModel):
     email: str
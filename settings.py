@@ -5,5 +5,90 @@ ALGORITHM = os.getenv("ALGORITHM", "HS256")
 ACCESS_TOKEN_EXPIRE_MINUTES = os.getenv("ALGORITHM", 180)
 
 ALLOWED_HOSTS = os.getenv("ALLOWED_HOSTS", ["http://localhost:5173"])
+# the users allowed to run the maintenance routes (comma separated emails)
+ADMIN_EMAILS = [email for email in os.getenv("ADMIN_EMAILS", "").split(",") if email]
 
 DB_URL = os.getenv("DB_URL", "sqlite:///../db.db")
+# pool of the connections of each engine (the sqlite reads and writes have their
+# own pools, see below): the requests over pool size + max overflow wait for a
+# connection up to the timeout, pre-ping checks a connection before using it and
+# the connections are reopened after the recycle time (-1 to keep them)
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", 5))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", 10))
+DB_POOL_TIMEOUT_SECONDS = float(os.getenv("DB_POOL_TIMEOUT_SECONDS", 30))
+DB_POOL_PRE_PING = os.getenv("DB_POOL_PRE_PING", "false").lower() == "true"
+DB_POOL_RECYCLE_SECONDS = int(os.getenv("DB_POOL_RECYCLE_SECONDS", -1))
+# time a sqlite connection waits for the write lock held by another transaction
+DB_SQLITE_BUSY_TIMEOUT_SECONDS = float(os.getenv("DB_SQLITE_BUSY_TIMEOUT_SECONDS", 30))
+# sqlite tuning, opt-in (empty or 0 leaves sqlite as is): with the WAL journal
+# (stored in the database file) the readers don't block the writer,
+# synchronous=normal is then safe (a power loss can only lose the last
+# transactions)
+DB_SQLITE_JOURNAL_MODE = os.getenv("DB_SQLITE_JOURNAL_MODE", "")
+DB_SQLITE_SYNCHRONOUS = os.getenv("DB_SQLITE_SYNCHRONOUS", "")
+# page cache and memory map of each connection
+DB_SQLITE_CACHE_SIZE_KB = int(os.getenv("DB_SQLITE_CACHE_SIZE_KB", 0))
+DB_SQLITE_MMAP_SIZE = int(os.getenv("DB_SQLITE_MMAP_SIZE", 0))
+# the reads use a pool of read-only connections and the writes a single connection
+# (the writers wait for it in the pool instead of failing on the sqlite lock), to
+# use with the WAL journal
+DB_SQLITE_READ_WRITE_SPLIT = (
+    os.getenv("DB_SQLITE_READ_WRITE_SPLIT", "false").lower() == "true"
+)
+DB_SQLITE_READ_POOL_SIZE = int(os.getenv("DB_SQLITE_READ_POOL_SIZE", 8))
+# read replicas of DB_URL (comma separated URLs): the reads of the application go
+# to them, except the reads of the transactions which have written and the ones of
+# the users who have written in the last max lag seconds (they read their writes
+# on DB_URL)
+DB_REPLICA_URLS = [url for url in os.getenv("DB_REPLICA_URLS", "").split(",") if url]
+DB_REPLICA_MAX_LAG_SECONDS = float(os.getenv("DB_REPLICA_MAX_LAG_SECONDS", 5))
+
+# cache of the authenticated users (to avoid a user lookup on each request)
+USER_CACHE_MAX_SIZE = int(os.getenv("USER_CACHE_MAX_SIZE", 10000))
+USER_CACHE_TTL_SECONDS = float(os.getenv("USER_CACHE_TTL_SECONDS", 60))
+
+# cache of the available rooms by dates (polled by the dashboards), the entries
+# are invalidated when the reservations change, the ttl only bounds the staleness
+# of the changes made by other processes
+AVAILABILITY_CACHE_MAX_SIZE = int(os.getenv("AVAILABILITY_CACHE_MAX_SIZE", 1024))
+AVAILABILITY_CACHE_TTL_SECONDS = float(os.getenv("AVAILABILITY_CACHE_TTL_SECONDS", 10))
+
+# the room catalog is reloaded after this time, for the rooms created by other
+# processes (the local ones are added right away)
+ROOM_CATALOG_TTL_SECONDS = float(os.getenv("ROOM_CATALOG_TTL_SECONDS", 30))
+
+# events waiting to be sent to a client of the reservation feed, over this limit
+# they are dropped and the client is asked to reload the reservations
+RESERVATION_FEED_BUFFER_SIZE = int(os.getenv("RESERVATION_FEED_BUFFER_SIZE", 100))
+
+# pool running the password hashing and verification out of the event loop,
+# "process" or "thread" ("thread" only helps if the bcrypt backend releases the GIL)
+PASSWORD_HASHING_EXECUTOR = os.getenv("PASSWORD_HASHING_EXECUTOR", "process")
+PASSWORD_HASHING_POOL_SIZE = int(os.getenv("PASSWORD_HASHING_POOL_SIZE", 4))
+# start method of the "process" workers, "spawn" or "forkserver": the workers are
+# never forked from the server (its threads, locks and connections)
+PASSWORD_HASHING_START_METHOD = os.getenv("PASSWORD_HASHING_START_METHOD", "spawn")
+# jobs waiting for a worker, over this limit the requests are rejected
+PASSWORD_HASHING_QUEUE_LIMIT = int(os.getenv("PASSWORD_HASHING_QUEUE_LIMIT", 32))
+
+# group commit of the reservations created by /rooms/{room_id}/create-reservation:
+# the ones requested within the window (or until max size of them wait) are
+# committed in one transaction, each request waits up to the window for it
+RESERVATION_GROUP_COMMIT = (
+    os.getenv("RESERVATION_GROUP_COMMIT", "false").lower() == "true"
+)
+RESERVATION_GROUP_COMMIT_WINDOW_MS = float(
+    os.getenv("RESERVATION_GROUP_COMMIT_WINDOW_MS", 5)
+)
+RESERVATION_GROUP_COMMIT_MAX_SIZE = int(
+    os.getenv("RESERVATION_GROUP_COMMIT_MAX_SIZE", 100)
+)
+
+# archival of the past reservations: the ones ended more than the given days ago
+# are moved to the archived_room_reservation table by batches, every interval
+# (0 disables the background job, POST /room-reservations/archive runs it once)
+RESERVATION_ARCHIVE_AFTER_DAYS = int(os.getenv("RESERVATION_ARCHIVE_AFTER_DAYS", 30))
+RESERVATION_ARCHIVE_INTERVAL_SECONDS = float(
+    os.getenv("RESERVATION_ARCHIVE_INTERVAL_SECONDS", 0)
+)
+RESERVATION_ARCHIVE_BATCH_SIZE = int(os.getenv("RESERVATION_ARCHIVE_BATCH_SIZE", 1000))
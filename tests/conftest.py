@@ -1,20 +1,42 @@
 import os
 import sys
+import tempfile
 from datetime import datetime, timezone
 from typing import Any, Generator
 
 import pytest
-from auth_helpers import Token, create_access_token_from_user, encode_password
+from auth_helpers import (
+    Token,
+    authenticated_users_cache,
+    create_access_token_from_user,
+    encode_password,
+)
 from db import Base
 from db.models.users import User
 from db.repositories.room_reservations import create_room_reservation
 from db.repositories.users import save_user
-from db.session import get_db
+from db.availability_cache import availability_cache
+from db.recent_writers import recent_writers
+from db.reservation_index import reservation_index
+from db.room_catalog import room_catalog
+from db.room_occupancy import room_occupancy
+from db.session import get_async_db, get_async_sessionmaker, get_connect_args
 from fastapi import FastAPI
 from fastapi.testclient import TestClient
-from routers import auth_router, room_reservations_router, rooms_router, users_router
+from http_helpers import ORJSONResponse
+from reservation_feed import reservation_feed
+from reservation_group_commit import reservation_group_commit
+from routers import (
+    auth_router,
+    metrics_router,
+    room_reservations_router,
+    rooms_router,
+    users_router,
+)
 from sqlalchemy import create_engine
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
 from sqlalchemy.orm import Session, sessionmaker
+from sqlalchemy.pool import NullPool
 
 # this is to include backend dir in sys.path so that we can import from db,main.py
 
@@ -22,12 +44,14 @@ sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 
 TEST_EMAIL = "test@test.com"
+TEST_ADMIN_EMAIL = "admin@test.com"
 TEST_PASSWORD = "password"
 
 
 def start_application():
-    app = FastAPI()
+    app = FastAPI(default_response_class=ORJSONResponse)
     app.include_router(auth_router)
+    app.include_router(metrics_router)
     app.include_router(users_router, prefix="/users")
     app.include_router(rooms_router, prefix="/rooms")
     app.include_router(room_reservations_router, prefix="/room-reservations")
@@ -35,12 +59,25 @@ def start_application():
     return app
 
 
-SQLALCHEMY_DATABASE_URL = "sqlite://"
+# the database is shared by the sync engine (used to prepare the data) and the async
+# engine (used by the application), so it must be stored in a file
+TEST_DB_PATH = os.path.join(tempfile.mkdtemp(), "test.db")
+SQLALCHEMY_DATABASE_URL = f"sqlite:///{TEST_DB_PATH}"
+ASYNC_SQLALCHEMY_DATABASE_URL = f"sqlite+aiosqlite:///{TEST_DB_PATH}"
 engine = create_engine(
-    SQLALCHEMY_DATABASE_URL, connect_args={"check_same_thread": False}
+    SQLALCHEMY_DATABASE_URL, connect_args=get_connect_args(SQLALCHEMY_DATABASE_URL)
 )
 # Use connect_args parameter only with sqlite
 SessionTesting = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+# each TestClient runs its own event loop, connections are not shared between them
+async_engine = create_async_engine(
+    ASYNC_SQLALCHEMY_DATABASE_URL,
+    connect_args=get_connect_args(ASYNC_SQLALCHEMY_DATABASE_URL),
+    poolclass=NullPool,
+)
+AsyncSessionTesting = async_sessionmaker(
+    async_engine, autoflush=False, expire_on_commit=False
+)
 
 
 @pytest.fixture(scope="function")
@@ -49,36 +86,49 @@ def app() -> Generator[FastAPI, Any, None]:
     Create a fresh database on each test case.
     """
     Base.metadata.create_all(engine)  # Create the tables.
+    reservation_index.clear()
+    room_occupancy.clear()
+    availability_cache.clear()
+    room_catalog.clear()
+    recent_writers.clear()
+    reservation_feed.clear()
+    reservation_group_commit.clear()
+    authenticated_users_cache.clear()
     _app = start_application()
     yield _app
     Base.metadata.drop_all(engine)
+    reservation_index.clear()
+    room_occupancy.clear()
+    availability_cache.clear()
+    room_catalog.clear()
+    recent_writers.clear()
+    reservation_feed.clear()
+    reservation_group_commit.clear()
+    authenticated_users_cache.clear()
 
 
 @pytest.fixture(scope="function")
 def db_session(app: FastAPI) -> Generator[Session, Any, None]:
-    connection = engine.connect()
-    transaction = connection.begin()
-    session = SessionTesting(bind=connection)
+    # the data must be committed to be seen by the application,
+    # the tables are dropped at the end of each test case
+    session = SessionTesting()
     yield session  # use the session in tests.
     session.close()
-    transaction.rollback()
-    connection.close()
 
 
 @pytest.fixture(scope="function")
 def client(app: FastAPI, db_session: Session) -> Generator[TestClient, Any, None]:
     """
-    Create a new FastAPI TestClient that uses the `db_session` fixture to override
-    the `get_db` dependency that is injected into routes.
+    Create a new FastAPI TestClient that uses the test database to override
+    the `get_async_db` dependency that is injected into routes.
     """
 
-    def _get_test_db():
-        try:
-            yield db_session
-        finally:
-            pass
+    async def _get_test_db():
+        async with AsyncSessionTesting() as db:
+            yield db
 
-    app.dependency_overrides[get_db] = _get_test_db
+    app.dependency_overrides[get_async_db] = _get_test_db
+    app.dependency_overrides[get_async_sessionmaker] = lambda: AsyncSessionTesting
     with TestClient(app) as client:
         yield client
 
@@ -96,6 +146,16 @@ def default_user_token(default_user):
     return create_access_token_from_user(default_user)
 
 
+@pytest.fixture(scope="function")
+def admin_user_token(db_session, monkeypatch):
+    monkeypatch.setattr("auth_helpers.ADMIN_EMAILS", [TEST_ADMIN_EMAIL])
+    admin_user = save_user(
+        db_session,
+        User(email=TEST_ADMIN_EMAIL, hashed_password=encode_password(TEST_PASSWORD)),
+    )
+    return create_access_token_from_user(admin_user)
+
+
 @pytest.fixture(scope="function")
 def default_room(db_session):
     from db.repositories.rooms import create_room
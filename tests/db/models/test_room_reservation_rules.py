@@ -0,0 +1,126 @@
+from datetime import datetime, timedelta
+
+from db.models.room_reservation_rules import (
+    RoomReservationRule,
+    RoomReservationRuleException,
+    get_occurrences,
+)
+
+
+def test_get_occurrences():
+    start_date = datetime.fromisoformat("2024-01-01T10:00")
+    end_date = datetime.fromisoformat("2024-01-01T11:00")
+    day = timedelta(days=1)
+
+    # only the occurrences of the window are generated
+    assert [
+        (start_date + 3 * day, end_date + 3 * day),
+        (start_date + 4 * day, end_date + 4 * day),
+    ] == list(
+        get_occurrences(
+            start_date,
+            end_date,
+            day,
+            None,
+            start_date + 3 * day - timedelta(minutes=30),
+            start_date + 5 * day,
+        )
+    )
+    # window before the first occurrence
+    assert [] == list(
+        get_occurrences(
+            start_date, end_date, day, None, start_date - 2 * day, start_date
+        )
+    )
+    # until is the end of the last occurrence
+    assert [(start_date + day, end_date + day)] == list(
+        get_occurrences(
+            start_date,
+            end_date,
+            day,
+            end_date + day,
+            start_date + day,
+            start_date + 10 * day,
+        )
+    )
+    # the first occurrence of a window far from the start is computed
+    window_start_date = start_date + 100_000 * day
+    assert [(window_start_date, window_start_date + timedelta(hours=1))] == list(
+        get_occurrences(
+            start_date,
+            end_date,
+            day,
+            None,
+            window_start_date,
+            window_start_date + timedelta(hours=2),
+        )
+    )
+
+
+def get_rule(
+    start_date: datetime, frequency: str, interval: int = 1, exceptions=()
+) -> RoomReservationRule:
+    return RoomReservationRule(
+        start_date=start_date,
+        end_date=start_date + timedelta(hours=1),
+        frequency=frequency,
+        interval=interval,
+        until=None,
+        exceptions=[
+            RoomReservationRuleException(
+                start_date=exception, end_date=exception + timedelta(hours=1)
+            )
+            for exception in exceptions
+        ],
+    )
+
+
+def test_get_occurrences_without_exceptions():
+    start_date = datetime.fromisoformat("2024-01-01T10:00")
+    rule = get_rule(start_date, "weekly", exceptions=[start_date + timedelta(weeks=1)])
+
+    assert [start_date, start_date + timedelta(weeks=2)] == [
+        occurrence_start_date
+        for occurrence_start_date, _ in rule.get_occurrences(
+            start_date, start_date + timedelta(weeks=3)
+        )
+    ]
+
+
+def test_get_overlap_with_rule():
+    # monday 10:00
+    start_date = datetime.fromisoformat("2024-01-01T10:00")
+    every_two_weeks = get_rule(start_date, "weekly", interval=2)
+
+    # every tuesday
+    assert (
+        get_rule(start_date + timedelta(days=1), "weekly").get_overlap_with_rule(
+            every_two_weeks
+        )
+        is None
+    )
+    # every other monday
+    assert (
+        get_rule(start_date + timedelta(weeks=1), "weekly", 2).get_overlap_with_rule(
+            every_two_weeks
+        )
+        is None
+    )
+    # every 3 days, the 15th day is a monday of the series
+    assert (
+        start_date + timedelta(days=42),
+        start_date + timedelta(days=42, hours=1),
+    ) == get_rule(start_date, "daily", interval=3).get_overlap_with_rule(
+        get_rule(start_date + timedelta(weeks=2), "weekly", interval=2)
+    )
+    # the first common occurrences are cancelled
+    assert (
+        start_date + timedelta(weeks=4),
+        start_date + timedelta(weeks=4, hours=1),
+    ) == get_rule(
+        start_date,
+        "daily",
+        exceptions=[start_date, start_date + timedelta(weeks=2)],
+    ).get_overlap_with_rule(
+        every_two_weeks
+    )
@@ -0,0 +1,125 @@
+from datetime import datetime, timedelta
+
+import numpy as np
+from db.models.room_reservations import (
+    RoomReservation,
+    get_free_start_dates,
+    get_overlap,
+    get_overlaps,
+    merge_date_ranges,
+)
+
+
+def test_get_overlap():
+    start_date = datetime.fromisoformat("2024-01-01T08:00")
+    end_date = datetime.fromisoformat("2024-01-15T10:00")
+
+    # on different days but same hours, no overlap
+    assert (
+        get_overlap(
+            start_date,
+            start_date + timedelta(hours=2),
+            start_date + timedelta(days=1),
+            start_date + timedelta(days=1, hours=2),
+        )
+        is None
+    )
+    # adjacent
+    assert get_overlap(start_date, end_date, end_date, end_date + timedelta(1)) is None
+    # multi-week reservation
+    assert (
+        start_date + timedelta(days=7),
+        end_date,
+    ) == get_overlap(
+        start_date, end_date, start_date + timedelta(days=7), end_date + timedelta(1)
+    )
+
+
+def test_room_reservation_get_overlap():
+    reservation = RoomReservation(
+        start_date=datetime.fromisoformat("2024-01-01T08:00"),
+        end_date=datetime.fromisoformat("2024-01-01T10:00"),
+    )
+    assert (
+        datetime.fromisoformat("2024-01-01T09:00"),
+        datetime.fromisoformat("2024-01-01T10:00"),
+    ) == reservation.get_overlap(
+        datetime.fromisoformat("2024-01-01T09:00"),
+        datetime.fromisoformat("2024-01-01T12:00"),
+    )
+
+
+def test_get_overlaps():
+    start_dates = np.array(
+        ["2024-01-01T08:00", "2024-01-01T10:00", "2024-01-02T09:00"],
+        dtype="datetime64[us]",
+    )
+    end_dates = np.array(
+        ["2024-01-01T10:00", "2024-01-01T12:00", "2024-01-02T10:00"],
+        dtype="datetime64[us]",
+    )
+
+    overlap_starts, overlap_ends, mask = get_overlaps(
+        start_dates,
+        end_dates,
+        np.datetime64("2024-01-01T09:00"),
+        np.datetime64("2024-01-01T11:00"),
+    )
+    assert [True, True, False] == mask.tolist()
+    assert [
+        datetime.fromisoformat("2024-01-01T09:00"),
+        datetime.fromisoformat("2024-01-01T10:00"),
+    ] == overlap_starts[mask].tolist()
+    assert [
+        datetime.fromisoformat("2024-01-01T10:00"),
+        datetime.fromisoformat("2024-01-01T11:00"),
+    ] == overlap_ends[mask].tolist()
+
+
+def test_merge_date_ranges():
+    start_date = datetime.fromisoformat("2024-01-01T08:00")
+    assert [
+        (start_date, start_date + timedelta(hours=3)),
+        (start_date + timedelta(hours=4), start_date + timedelta(hours=5)),
+    ] == merge_date_ranges(
+        [
+            (start_date + timedelta(hours=4), start_date + timedelta(hours=5)),
+            (start_date + timedelta(hours=1), start_date + timedelta(hours=3)),
+            (start_date, start_date + timedelta(hours=1)),
+        ]
+    )
+
+
+def test_get_free_start_dates():
+    start_date = datetime.fromisoformat("2024-01-01T08:00")
+    hour = timedelta(hours=1)
+    busy_date_ranges = [
+        # overlapping busy ranges, the second one ends first
+        (start_date + hour, start_date + 5 * hour),
+        (start_date + 2 * hour, start_date + 3 * hour),
+        # not on a whole hour
+        (start_date + 6 * hour, start_date + 6.5 * hour),
+    ]
+
+    assert [
+        start_date,
+        start_date + 5 * hour,
+        start_date + 7 * hour,
+        start_date + 8 * hour,
+        start_date + 9 * hour,
+    ] == list(
+        get_free_start_dates(
+            busy_date_ranges, start_date, start_date + 10 * hour, hour, hour
+        )
+    )
+    assert [start_date + 7 * hour] == list(
+        get_free_start_dates(
+            busy_date_ranges, start_date, start_date + 10 * hour, 3 * hour, hour
+        )
+    )
+    # no room for 4 hours
+    assert [] == list(
+        get_free_start_dates(
+            busy_date_ranges, start_date, start_date + 10 * hour, 4 * hour, hour
+        )
+    )
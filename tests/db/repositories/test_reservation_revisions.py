@@ -0,0 +1,38 @@
+from db.repositories.reservation_revisions import (
+    bump_all_revision,
+    bump_revisions,
+    get_revision,
+)
+from db.session import get_connect_args
+from sqlalchemy import create_engine
+from sqlalchemy.orm import Session
+from tests.conftest import SQLALCHEMY_DATABASE_URL, create_test_user
+
+
+def test_bump_revisions(db_session):
+    user, _ = create_test_user("user@test.com", "password", db_session)
+    other_user, _ = create_test_user("other@test.com", "password", db_session)
+    assert 0 == get_revision(db_session)
+    assert 0 == get_revision(db_session, user.id)
+
+    bump_revisions(db_session, [user.id])
+    db_session.commit()
+    bump_revisions(db_session, [user.id, other_user.id])
+    db_session.commit()
+    # a change rolled back doesn't count
+    bump_revisions(db_session, [other_user.id])
+    db_session.rollback()
+    # the revision of all the reservations is incremented after the commits
+    assert 0 == get_revision(db_session)
+    assert 1 == bump_all_revision(db_session)
+    assert 2 == bump_all_revision(db_session)
+
+    # the revisions are shared with the other workers
+    engine = create_engine(
+        SQLALCHEMY_DATABASE_URL, connect_args=get_connect_args(SQLALCHEMY_DATABASE_URL)
+    )
+    with Session(engine) as db:
+        assert 2 == get_revision(db)
+        assert 2 == get_revision(db, user.id)
+        assert 1 == get_revision(db, other_user.id)
+    engine.dispose()
@@ -1,19 +1,40 @@
+import random
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
 
 from auth_helpers import encode_password
-from db.models.room_reservations import RoomReservation
+from db.models.room_reservations import ArchivedRoomReservation, RoomReservation
+from db.models.rooms import Room
 from db.models.users import User
 from db.repositories.room_reservations import (
+    RoomAlreadyReservedError,
+    archive_reservations,
+    count_reservations_by_user,
     create_room_reservation,
     delete_room_reservation,
-    get_all_reservation_by_user,
     get_all_reservation_on_room_between_dates,
-    get_all_rooms_reservations_between_dates,
+    get_all_rooms_reservation_rows_between_dates,
+    get_reservation_rows_by_user,
+    get_reservation_rows_by_user_before,
     get_room_reservation_by_id,
+    reserve_room,
+    reserve_room_with_rule,
+    reserve_rooms,
+)
+from db.repositories.room_reservation_rules import (
+    RULE_OCCURRENCE_ID,
+    add_room_reservation_rule_exception,
+    get_occurrences_between_dates,
+)
+from db.repositories.rooms import (
+    create_room,
+    get_all_rooms_without_reservations_between_dates,
 )
-from db.repositories.rooms import create_room
 from db.repositories.users import save_user
-from tests.conftest import TEST_EMAIL, TEST_PASSWORD
+from schemas.room_reservations import RoomReservationDTO, dump_room_reservation_row
+from sqlalchemy import create_engine, select
+from sqlalchemy.orm import aliased, sessionmaker
+from tests.conftest import SQLALCHEMY_DATABASE_URL, TEST_EMAIL, TEST_PASSWORD
 
 
 def init_foreign_keys(db_session):
@@ -23,7 +44,7 @@ def init_foreign_keys(db_session):
     return user_from_db, room_from_db
 
 
-def test_get_all_reservation_by_user(db_session):
+def test_get_reservation_rows_by_user(db_session):
     user_from_db, room_from_db = init_foreign_keys(db_session)
     # date should be at "perfect hours", but it's not important for this test
     start_date = datetime.now()
@@ -36,15 +57,156 @@ def test_get_all_reservation_by_user(db_session):
     limit_input = 10
     page_input = 0
 
-    reservations, total, limit, page = get_all_reservation_by_user(
+    rows, total, limit, page = get_reservation_rows_by_user(
         db_session, user_from_db, limit=limit_input, page=page_input
     )
-    assert len(reservations) == limit
+    assert len(rows) == limit
     assert limit_input == limit
     assert total == 50
     assert page == page_input
 
 
+def test_get_reservation_rows_by_user_before(db_session):
+    user_from_db, room_from_db = init_foreign_keys(db_session)
+    start_date = datetime(2030, 1, 1)
+    # reservations sharing a start date are sorted by id
+    for day in range(5):
+        for _ in range(3):
+            create_room_reservation(
+                db_session,
+                room_from_db,
+                user_from_db,
+                start_date + timedelta(days=day),
+                start_date + timedelta(days=day, hours=1),
+            )
+    all_rows, _, _, _ = get_reservation_rows_by_user(
+        db_session, user_from_db, limit=15, page=0
+    )
+
+    pages = []
+    before = None
+    while True:
+        rows = get_reservation_rows_by_user_before(
+            db_session, user_from_db, limit=4, before=before
+        )
+        if not rows:
+            break
+        pages.append(rows)
+        before = (rows[-1].start_date, rows[-1].id)
+
+    assert [len(page) for page in pages] == [4, 4, 4, 3]
+    assert [row for page in pages for row in page] == all_rows
+
+
+def test_get_reservation_rows(db_session):
+    user_from_db, room_from_db = init_foreign_keys(db_session)
+    start_date = datetime(2030, 1, 1)
+    for day in range(5):
+        create_room_reservation(
+            db_session,
+            room_from_db,
+            user_from_db,
+            start_date + timedelta(days=day),
+            start_date + timedelta(days=day, hours=1),
+        )
+    reservations = (
+        db_session.query(RoomReservation)
+        .order_by(RoomReservation.start_date.desc(), RoomReservation.id.desc())
+        .limit(3)
+        .offset(3)
+        .all()
+    )
+
+    # same reservations and content as the entities
+    rows, total, _, _ = get_reservation_rows_by_user(
+        db_session, user_from_db, limit=3, page=1
+    )
+    assert 5 == total
+    assert [
+        RoomReservationDTO.model_validate(reservation) for reservation in reservations
+    ] == [
+        RoomReservationDTO.model_validate(dump_room_reservation_row(row))
+        for row in rows
+    ]
+    rows = get_reservation_rows_by_user_before(
+        db_session,
+        user_from_db,
+        limit=3,
+        before=(start_date + timedelta(days=2), reservations[0].id + 1),
+    )
+    assert [reservation.id for reservation in reservations] == [row.id for row in rows]
+    rows = get_all_rooms_reservation_rows_between_dates(
+        db_session, start_date, start_date + timedelta(days=2)
+    )
+    assert [1, 2] == [row.id for row in rows]
+
+
+def test_archive_reservations(db_session):
+    user_from_db, room_from_db = init_foreign_keys(db_session)
+    start_date = datetime(2021, 1, 1)
+    for day in range(5):
+        create_room_reservation(
+            db_session,
+            room_from_db,
+            user_from_db,
+            start_date + timedelta(days=day),
+            start_date + timedelta(days=day, hours=1),
+        )
+    create_room_reservation(
+        db_session,
+        room_from_db,
+        user_from_db,
+        datetime(2030, 1, 1),
+        datetime(2030, 1, 1, 1),
+    )
+    rows, _, _, _ = get_reservation_rows_by_user(
+        db_session, user_from_db, limit=6, page=0
+    )
+
+    # the ended reservations are moved by batches, the current one stays
+    assert 4 == archive_reservations(
+        db_session, start_date + timedelta(days=4), batch_size=3
+    )
+    assert [1, 2, 3, 4] == db_session.scalars(
+        select(ArchivedRoomReservation.id).order_by(ArchivedRoomReservation.id)
+    ).all()
+    assert [5, 6] == db_session.scalars(
+        select(RoomReservation.id).order_by(RoomReservation.id)
+    ).all()
+    assert 2 == archive_reservations(db_session, datetime(2031, 1, 1), batch_size=3)
+    assert [] == db_session.scalars(select(RoomReservation.id)).all()
+
+    # the listings read both tables
+    assert 6 == count_reservations_by_user(db_session, user_from_db)
+    pages = [
+        get_reservation_rows_by_user(db_session, user_from_db, limit=4, page=page)[0]
+        for page in range(2)
+    ]
+    assert rows == pages[0] + pages[1]
+    assert rows[2:5] == get_reservation_rows_by_user_before(
+        db_session, user_from_db, limit=3, before=(rows[1].start_date, rows[1].id)
+    )
+    assert [3, 4, 5] == [
+        row.id
+        for row in get_all_rooms_reservation_rows_between_dates(
+            db_session, start_date + timedelta(days=2), start_date + timedelta(days=5)
+        )
+    ]
+    assert [] == get_all_rooms_without_reservations_between_dates(
+        db_session, start_date, start_date + timedelta(hours=1)
+    )
+
+    # the ids of the archived reservations aren't reused
+    reservation = create_room_reservation(
+        db_session,
+        room_from_db,
+        user_from_db,
+        datetime(2030, 1, 2),
+        datetime(2030, 1, 2, 1),
+    )
+    assert 7 == reservation.id
+
+
 def test_get_all_reservation_on_room_between_dates(db_session):
     user_from_db, room_from_db = init_foreign_keys(db_session)
     # date should be at "perfect hours", but it's not important for this test
@@ -118,8 +280,255 @@ def test_get_all_rooms_reservations_on_a_day(db_session):
         db_session, room_from_db, user_from_db, start_date, end_date
     )
 
-    reservations = get_all_rooms_reservations_between_dates(
+    rows = get_all_rooms_reservation_rows_between_dates(
         db_session, start_date=start_of_day, end_date=end_date
     )
-    assert len(reservations) == 1
-    assert reservations[0].id == reservation.id
+    assert len(rows) == 1
+    assert rows[0].id == reservation.id
+
+
+def test_reserve_room(db_session):
+    user_from_db, room_from_db = init_foreign_keys(db_session)
+    start_date = datetime(2030, 1, 1, 8)
+    reservation = reserve_room(
+        db_session,
+        room_from_db,
+        user_from_db,
+        start_date,
+        start_date + timedelta(hours=2),
+    )
+
+    try:
+        reserve_room(
+            db_session,
+            room_from_db,
+            user_from_db,
+            start_date + timedelta(hours=1),
+            start_date + timedelta(hours=3),
+        )
+        assert False, "RoomAlreadyReservedError not raised"
+    except RoomAlreadyReservedError as error:
+        assert [
+            (reservation.start_date, reservation.end_date, reservation.id)
+        ] == error.intervals
+    assert 1 == db_session.query(RoomReservation).count()
+
+
+def test_reserve_room_with_rule(db_session):
+    user_from_db, room_from_db = init_foreign_keys(db_session)
+    # every monday from 10:00 to 11:00
+    start_date = datetime(2030, 1, 7, 10)
+    week = timedelta(weeks=1)
+    reservation = reserve_room(
+        db_session,
+        room_from_db,
+        user_from_db,
+        start_date + 52 * week,
+        start_date + 52 * week + timedelta(hours=2),
+    )
+
+    try:
+        reserve_room_with_rule(
+            db_session,
+            room_from_db,
+            user_from_db,
+            start_date,
+            start_date + timedelta(hours=1),
+            "weekly",
+            1,
+            None,
+        )
+        assert False, "RoomAlreadyReservedError not raised"
+    except RoomAlreadyReservedError as error:
+        assert [
+            (reservation.start_date, reservation.end_date, reservation.id)
+        ] == error.intervals
+
+    # until the end of the week before the reservation
+    rule = reserve_room_with_rule(
+        db_session,
+        room_from_db,
+        user_from_db,
+        start_date,
+        start_date + timedelta(hours=1),
+        "weekly",
+        1,
+        start_date + 51 * week + timedelta(hours=1),
+    )
+    # only the occurrences of the dates are generated
+    assert [
+        (rule.id, start_date + 3 * week, start_date + 3 * week + timedelta(hours=1))
+    ] == [
+        (occurrence_rule.id, occurrence_start_date, occurrence_end_date)
+        for occurrence_rule, occurrence_start_date, occurrence_end_date in (
+            get_occurrences_between_dates(
+                db_session, start_date + 3 * week, start_date + 4 * week
+            )
+        )
+    ]
+
+    # an occurrence of the rule
+    try:
+        reserve_room(
+            db_session,
+            room_from_db,
+            user_from_db,
+            start_date + 3 * week,
+            start_date + 3 * week + timedelta(hours=2),
+        )
+        assert False, "RoomAlreadyReservedError not raised"
+    except RoomAlreadyReservedError as error:
+        assert [
+            (
+                start_date + 3 * week,
+                start_date + 3 * week + timedelta(hours=1),
+                RULE_OCCURRENCE_ID,
+            )
+        ] == error.intervals
+
+    # every day at the same time, the first common occurrence is reported
+    try:
+        reserve_room_with_rule(
+            db_session,
+            room_from_db,
+            user_from_db,
+            start_date + timedelta(days=1),
+            start_date + timedelta(days=1, hours=1),
+            "daily",
+            1,
+            None,
+        )
+        assert False, "RoomAlreadyReservedError not raised"
+    except RoomAlreadyReservedError as error:
+        assert (
+            start_date + week,
+            start_date + week + timedelta(hours=1),
+            RULE_OCCURRENCE_ID,
+        ) == error.intervals[0]
+
+    # once cancelled, the occurrence can be reserved
+    add_room_reservation_rule_exception(
+        db_session,
+        rule,
+        start_date + 3 * week,
+        start_date + 3 * week + timedelta(hours=1),
+    )
+    reserve_room(
+        db_session,
+        room_from_db,
+        user_from_db,
+        start_date + 3 * week,
+        start_date + 3 * week + timedelta(hours=2),
+    )
+
+
+def test_reserve_rooms(db_session):
+    user_from_db, room_from_db = init_foreign_keys(db_session)
+    start_date = datetime(2030, 1, 1, 8)
+    existing = reserve_room(
+        db_session,
+        room_from_db,
+        user_from_db,
+        start_date,
+        start_date + timedelta(hours=1),
+    )
+    existing_interval = (existing.start_date, existing.end_date, existing.id)
+    requests = [
+        (room_from_db.id, start_date, start_date + timedelta(hours=1)),
+        (
+            room_from_db.id,
+            start_date + timedelta(hours=1),
+            start_date + timedelta(hours=3),
+        ),
+        (
+            room_from_db.id,
+            start_date + timedelta(hours=2),
+            start_date + timedelta(hours=4),
+        ),
+    ]
+
+    ids, conflicts = reserve_rooms(db_session, user_from_db, requests)
+    assert [None, None, None] == ids
+    assert [
+        [existing_interval],
+        [],
+        [(requests[1][1], requests[1][2], -2)],
+    ] == conflicts
+    assert 1 == db_session.query(RoomReservation).count()
+
+    ids, conflicts = reserve_rooms(
+        db_session, user_from_db, requests, all_or_nothing=False
+    )
+    assert ids[0] is None and ids[2] is None
+    assert [
+        [existing_interval],
+        [],
+        [(requests[1][1], requests[1][2], -2)],
+    ] == conflicts
+    reservation = get_room_reservation_by_id(db_session, ids[1])
+    assert (requests[1][1], requests[1][2]) == (
+        reservation.start_date,
+        reservation.end_date,
+    )
+    assert 2 == db_session.query(RoomReservation).count()
+
+
+def test_reserve_room_concurrently(db_session):
+    user_from_db, _ = init_foreign_keys(db_session)
+    rooms = [create_room(db_session, name=f"Room {i}") for i in range(4)]
+    start_date = datetime(2030, 1, 1)
+    bookings = 2000
+    threads = 32
+    # overlapping bookings of 1 to 3 hours over 2 days
+    random_generator = random.Random(0)
+    requests = []
+    for _ in range(bookings):
+        booking_start_date = start_date + timedelta(
+            hours=random_generator.randrange(48)
+        )
+        requests.append(
+            (
+                random_generator.choice(rooms).id,
+                booking_start_date,
+                booking_start_date + timedelta(hours=random_generator.randint(1, 3)),
+            )
+        )
+
+    # a connection by thread, waiting for the write lock as long as needed
+    concurrent_engine = create_engine(
+        SQLALCHEMY_DATABASE_URL,
+        connect_args={"check_same_thread": False, "timeout": 60},
+        pool_size=threads,
+    )
+    ConcurrentSession = sessionmaker(bind=concurrent_engine)
+
+    def book(request) -> bool:
+        room_id, booking_start_date, booking_end_date = request
+        with ConcurrentSession() as db:
+            room = db.get(Room, room_id)
+            user = db.get(User, user_from_db.id)
+            try:
+                reserve_room(db, room, user, booking_start_date, booking_end_date)
+                return True
+            except RoomAlreadyReservedError:
+                return False
+
+    with ThreadPoolExecutor(threads) as executor:
+        results = list(executor.map(book, requests))
+    concurrent_engine.dispose()
+
+    other_reservation = aliased(RoomReservation)
+    overlaps = (
+        db_session.query(RoomReservation.id, other_reservation.id)
+        .join(
+            other_reservation,
+            (other_reservation.room_id == RoomReservation.room_id)
+            & (other_reservation.id > RoomReservation.id)
+            & (other_reservation.start_date < RoomReservation.end_date)
+            & (other_reservation.end_date > RoomReservation.start_date),
+        )
+        .all()
+    )
+    assert [] == overlaps
+    assert sum(results) == db_session.query(RoomReservation).count()
+    assert 0 < sum(results) < bookings
@@ -1,13 +1,17 @@
-from datetime import datetime
+from datetime import datetime, timedelta
 
+from db.models.room_reservations import RoomReservation
 from db.models.rooms import Room
+from db.repositories.reservation_revisions import bump_all_revision
 from db.repositories.room_reservations import create_room_reservation
 from db.repositories.rooms import (
     create_room,
     get_all_rooms,
     get_all_rooms_without_reservations_between_dates,
+    get_free_slots,
     get_room_by_id,
 )
+from db.room_occupancy import room_occupancy
 
 
 def test_get_all_rooms(db_session):
@@ -59,3 +63,90 @@ def test_get_all_rooms_without_reservations_between_dates(
         db_session, start_date, end_date
     )
     assert len(rooms) == 0
+
+
+def test_get_all_rooms_without_reservations_with_stale_occupancy(
+    db_session, default_room, default_user
+):
+    start_date = datetime(2030, 1, 1, 8)
+    end_date = datetime(2030, 1, 1, 10)
+    room_occupancy.load(db_session)
+    # a reservation made by another process, not in the local bitmaps
+    db_session.add(
+        RoomReservation(
+            room_id=default_room.id,
+            user_id=default_user.id,
+            start_date=start_date,
+            end_date=end_date,
+        )
+    )
+    db_session.commit()
+    bump_all_revision(db_session)
+    assert set() == room_occupancy.find_occupied_room_ids(start_date, end_date)
+
+    rooms = get_all_rooms_without_reservations_between_dates(
+        db_session, start_date, end_date
+    )
+    assert [] == rooms
+    # reloaded by the next request
+    assert not room_occupancy.loaded
+
+
+def test_get_all_rooms_without_reservations_freed_by_other_process(
+    db_session, default_room, default_user
+):
+    start_date = datetime(2030, 1, 1, 8)
+    end_date = datetime(2030, 1, 1, 10)
+    reservation = create_room_reservation(
+        db_session, default_room, default_user, start_date, end_date
+    )
+    room_occupancy.load(db_session)
+    assert [] == get_all_rooms_without_reservations_between_dates(
+        db_session, start_date, end_date
+    )
+
+    # deleted by another process, still in the local bitmaps
+    db_session.delete(reservation)
+    db_session.commit()
+    bump_all_revision(db_session)
+    assert {default_room.id} == room_occupancy.find_occupied_room_ids(
+        start_date, end_date
+    )
+
+    rooms = get_all_rooms_without_reservations_between_dates(
+        db_session, start_date, end_date
+    )
+    assert [default_room.id] == [room.id for room in rooms]
+
+
+def test_get_free_slots(db_session, default_room, default_user):
+    other_room = create_room(db_session, name="Room 2")
+    start_date = datetime(2030, 1, 1, 8)
+    hour = timedelta(hours=1)
+    # the default room is reserved from 8:00 to 12:00, the other one from 9:00
+    # to 10:00
+    for room, reservation_start_date, reservation_end_date in [
+        (default_room, start_date, start_date + 2 * hour),
+        (default_room, start_date + 2 * hour, start_date + 4 * hour),
+        (other_room, start_date + hour, start_date + 2 * hour),
+    ]:
+        create_room_reservation(
+            db_session, room, default_user, reservation_start_date, reservation_end_date
+        )
+
+    free_slots = get_free_slots(
+        db_session, start_date, start_date + 8 * hour, 2 * hour, 4
+    )
+    assert [
+        (other_room.id, start_date + 2 * hour),
+        (other_room.id, start_date + 3 * hour),
+        (default_room.id, start_date + 4 * hour),
+        (other_room.id, start_date + 4 * hour),
+    ] == [(room.id, free_start_date) for room, free_start_date in free_slots]
+
+    free_slots = get_free_slots(
+        db_session, start_date, start_date + 8 * hour, 2 * hour, 1, [default_room.id]
+    )
+    assert [(default_room.id, start_date + 4 * hour)] == [
+        (room.id, free_start_date) for room, free_start_date in free_slots
+    ]
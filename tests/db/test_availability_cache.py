@@ -0,0 +1,86 @@
+from datetime import datetime, timedelta
+
+from db.availability_cache import AvailabilityCache
+
+
+def test_invalidate():
+    cache = AvailabilityCache(max_size=10, ttl=60, name="test_invalidate")
+    start_date = datetime(2030, 1, 1, 8)
+    hour = timedelta(hours=1)
+    # room 1 available from 8:00 to 10:00, room 2 from 10:00 to 11:00
+    windows = {
+        (start_date, start_date + hour): [1],
+        (start_date + hour, start_date + 2 * hour): [1],
+        (start_date + 2 * hour, start_date + 3 * hour): [2],
+    }
+    for (window_start_date, window_end_date), room_ids in windows.items():
+        cache.set(
+            window_start_date,
+            window_end_date,
+            room_ids,
+            room_ids,
+            cache.generation,
+        )
+
+    # room 1 reserved from 9:00 to 11:00
+    cache.invalidate(1, start_date + hour, start_date + 3 * hour, available=False)
+    assert [1] == cache.get(start_date, start_date + hour)
+    assert cache.get(start_date + hour, start_date + 2 * hour) is None
+    # room 1 wasn't available
+    assert [2] == cache.get(start_date + 2 * hour, start_date + 3 * hour)
+
+    # a reservation of room 2 deleted
+    cache.invalidate(2, start_date, start_date + 3 * hour, available=True)
+    assert cache.get(start_date, start_date + hour) is None
+    assert [2] == cache.get(start_date + 2 * hour, start_date + 3 * hour)
+
+
+def test_set_after_invalidation():
+    cache = AvailabilityCache(max_size=10, ttl=60, name="test_generation")
+    start_date = datetime(2030, 1, 1, 8)
+    end_date = start_date + timedelta(hours=1)
+
+    # the answer was read from the database before the reservation was created
+    generation = cache.generation
+    cache.invalidate(1, start_date, end_date, available=False)
+    cache.set(start_date, end_date, [1], [1], generation)
+    assert cache.get(start_date, end_date) is None
+
+
+def test_invalidate_long_windows():
+    cache = AvailabilityCache(max_size=10, ttl=60, name="test_long_windows")
+    start_date = datetime(2030, 1, 1, 8)
+    year = timedelta(days=365)
+    cache.set(start_date, start_date + year, [1], [1], cache.generation)
+    cache.set(start_date + year, start_date + 2 * year, [], [], cache.generation)
+
+    # a rule of room 2 without end deleted
+    cache.invalidate(2, start_date + year, datetime.max, available=True)
+    assert [1] == cache.get(start_date, start_date + year)
+    assert cache.get(start_date + year, start_date + 2 * year) is None
+
+    # room 1 reserved in the first week
+    cache.invalidate(1, start_date, start_date + timedelta(days=7), available=False)
+    assert cache.get(start_date, start_date + year) is None
+
+
+def test_evicted_windows_unindexed():
+    cache = AvailabilityCache(max_size=2, ttl=60, name="test_evicted_windows")
+    start_date = datetime(2030, 1, 1, 8)
+    hour = timedelta(hours=1)
+    for i in range(10):
+        cache.set(
+            start_date + i * hour,
+            start_date + (i + 1) * hour,
+            [1],
+            [1],
+            cache.generation,
+        )
+
+    # only the cached windows and the ones evicted since the last compaction
+    assert len(cache._room_ids) <= 2 * 2
+    assert len(cache._keys_by_room[1]) <= 2 * 2
+    cache.invalidate(1, start_date, start_date + 10 * hour, available=False)
+    assert {} == cache._room_ids
+    assert {} == cache._keys_by_room
+    assert {} == cache._keys_by_day
@@ -0,0 +1,83 @@
+import os
+import tempfile
+from datetime import datetime
+
+import pytest
+from alembic.autogenerate import compare_metadata
+from alembic.migration import MigrationContext
+from db import Base
+from db.migrations import downgrade_database, upgrade_database
+from db.models.rooms import Room
+from db.models.users import User
+from db.repositories.room_reservations import (
+    get_all_reservation_on_room_between_dates,
+    get_all_rooms_reservation_rows_between_dates,
+    get_reservation_rows_by_user_before,
+)
+from db.repositories.rooms import get_all_rooms_without_reservations_between_dates
+from db.reservation_index import RoomReservationIndex
+from sqlalchemy import create_engine, event, inspect
+from sqlalchemy.orm import Session
+
+
+@pytest.fixture(scope="function")
+def migrated_engine():
+    url = f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'migrations.db')}"
+    upgrade_database(url)
+    migrated_engine = create_engine(url)
+    yield migrated_engine
+    migrated_engine.dispose()
+
+
+def test_migrations_match_models(migrated_engine):
+    with migrated_engine.connect() as connection:
+        assert [] == compare_metadata(
+            MigrationContext.configure(connection), Base.metadata
+        )
+
+
+def test_downgrade_migrations(migrated_engine):
+    downgrade_database(migrated_engine.url)
+    assert ["alembic_version"] == inspect(migrated_engine).get_table_names()
+
+
+def test_reservation_queries_use_indexes(migrated_engine):
+    statements = []
+
+    def before_cursor_execute(conn, cursor, statement, parameters, context, many):
+        statements.append((statement, parameters))
+
+    start_date = datetime(2030, 1, 1)
+    end_date = datetime(2030, 1, 2)
+    with Session(migrated_engine) as db:
+        user = User(email="test@test.com", hashed_password="-")
+        room = Room(name="Room")
+        db.add_all([user, room])
+        db.commit()
+
+        event.listen(migrated_engine, "before_cursor_execute", before_cursor_execute)
+        get_all_reservation_on_room_between_dates(db, room, start_date, end_date)
+        get_all_rooms_without_reservations_between_dates(db, start_date, end_date)
+        get_all_rooms_reservation_rows_between_dates(db, start_date, end_date)
+        get_reservation_rows_by_user_before(db, user, 10, (start_date, 1))
+        RoomReservationIndex().load(db)
+        event.remove(migrated_engine, "before_cursor_execute", before_cursor_execute)
+
+        for statement, parameters in statements:
+            if "room_reservation" not in statement:
+                continue
+            plan = [
+                row[3]
+                for row in db.connection().exec_driver_sql(
+                    f"EXPLAIN QUERY PLAN {statement}", parameters
+                )
+            ]
+            # a SCAN reads the whole table (or the whole index) of the current or
+            # of the archived reservations, the rules table (one row by series)
+            # can be scanned
+            assert not [
+                step
+                for step in plan
+                if step.startswith("SCAN")
+                and step.split()[1] in ("room_reservation", "archived_room_reservation")
+            ], f"{statement}\n{plan}"
@@ -0,0 +1,95 @@
+from datetime import datetime, timedelta, timezone
+
+from db.models.room_reservations import RoomReservation
+from db.repositories.room_reservations import (
+    create_room_reservation,
+    delete_room_reservation,
+)
+from db.reservation_index import RoomReservationIndex, reservation_index
+
+
+def get_future_dates(hours: int = 1) -> tuple[datetime, datetime]:
+    start_date = datetime.now(timezone.utc) + timedelta(days=1)
+    start_date = start_date.replace(minute=0, second=0, microsecond=0)
+    return start_date, start_date + timedelta(hours=hours)
+
+
+def test_find_overlapping():
+    index = RoomReservationIndex()
+    start_date, _ = get_future_dates()
+    # a long reservation followed by short ones
+    index.add(1, start_date, start_date + timedelta(days=2), 1)
+    for i in range(1, 10):
+        index.add(
+            1,
+            start_date + timedelta(days=3, hours=i),
+            start_date + timedelta(days=3, hours=i + 1),
+            i + 1,
+        )
+
+    overlapping = index.find_overlapping(
+        1, start_date + timedelta(days=1), start_date + timedelta(days=1, hours=1)
+    )
+    assert [1] == [interval[2] for interval in overlapping]
+
+    overlapping = index.find_overlapping(
+        1,
+        start_date + timedelta(days=3, hours=2),
+        start_date + timedelta(days=3, hours=4),
+    )
+    assert [3, 4] == [interval[2] for interval in overlapping]
+
+    # adjacent reservations don't overlap
+    assert [] == index.find_overlapping(
+        1, start_date + timedelta(days=2), start_date + timedelta(days=3, hours=1)
+    )
+    # other rooms are not impacted
+    assert [] == index.find_overlapping(2, start_date, start_date + timedelta(days=4))
+
+
+def test_find_overlapping_with_aware_and_naive_dates():
+    index = RoomReservationIndex()
+    start_date, end_date = get_future_dates()
+    index.add(1, start_date.replace(tzinfo=None), end_date.replace(tzinfo=None), 1)
+
+    paris = timezone(timedelta(hours=2))
+    assert 1 == len(index.find_overlapping(1, start_date.astimezone(paris), end_date))
+
+
+def test_index_follows_repositories(db_session, default_room, default_user):
+    start_date, end_date = get_future_dates()
+    reservation = create_room_reservation(
+        db_session, default_room, default_user, start_date, end_date
+    )
+    assert 1 == len(
+        reservation_index.find_overlapping(default_room.id, start_date, end_date)
+    )
+
+    delete_room_reservation(db_session, reservation)
+    assert [] == reservation_index.find_overlapping(
+        default_room.id, start_date, end_date
+    )
+
+
+def test_check_and_rebuild(db_session, default_room, default_user):
+    start_date, end_date = get_future_dates()
+    reservation_index.load(db_session)
+
+    # reservation added without the repositories
+    reservation = RoomReservation(
+        room_id=default_room.id,
+        user_id=default_user.id,
+        start_date=start_date,
+        end_date=end_date,
+    )
+    db_session.add(reservation)
+    db_session.commit()
+    # reservation only in the index
+    reservation_index.add(default_room.id, start_date, end_date, 999)
+
+    missing, stale = reservation_index.check(db_session)
+    assert [reservation.id] == missing
+    assert [999] == stale
+
+    reservation_index.rebuild(db_session)
+    assert ([], []) == reservation_index.check(db_session)
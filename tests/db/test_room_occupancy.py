@@ -0,0 +1,117 @@
+from datetime import date, datetime, timedelta
+
+from db.models.room_reservations import RoomReservation
+from db.repositories.room_reservations import (
+    create_room_reservation,
+    delete_room_reservation,
+)
+from db.repositories.rooms import (
+    create_room,
+    get_all_rooms_without_reservations_between_dates,
+)
+from db.room_occupancy import RoomOccupancy, get_day_masks, room_occupancy
+from tests.db.test_reservation_index import get_future_dates
+
+
+def test_get_day_masks():
+    start_date = datetime(2030, 1, 1, 22)
+
+    assert {date(2030, 1, 1): 0b11 << 22, date(2030, 1, 2): 0b111} == get_day_masks(
+        start_date, start_date + timedelta(hours=5)
+    )
+    # partial hours are rounded outward
+    assert {date(2030, 1, 1): 0b11 << 21} == get_day_masks(
+        start_date - timedelta(minutes=30), start_date + timedelta(minutes=30)
+    )
+
+
+def test_find_occupied_room_ids():
+    occupancy = RoomOccupancy()
+    start_date, _ = get_future_dates()
+    assert occupancy.find_occupied_room_ids(start_date, start_date) is None
+    occupancy.covered_from = start_date.date()
+    occupancy.loaded = True
+
+    # more rooms than the initial capacity of the arrays
+    for room_id in range(1, 201):
+        occupancy.add(
+            room_id,
+            start_date + timedelta(hours=room_id),
+            start_date + timedelta(hours=room_id + 1),
+        )
+    assert {3, 4} == occupancy.find_occupied_room_ids(
+        start_date + timedelta(hours=3), start_date + timedelta(hours=5)
+    )
+    # spread on many days
+    assert set(range(1, 101)) == occupancy.find_occupied_room_ids(
+        start_date, start_date + timedelta(hours=101)
+    )
+    # not on whole hours, the bitmaps can't answer
+    assert (
+        occupancy.find_occupied_room_ids(
+            start_date + timedelta(minutes=30), start_date + timedelta(hours=5)
+        )
+        is None
+    )
+
+    occupancy.remove(
+        3, start_date + timedelta(hours=3), start_date + timedelta(hours=4)
+    )
+    assert {4} == occupancy.find_occupied_room_ids(
+        start_date + timedelta(hours=3), start_date + timedelta(hours=5)
+    )
+
+
+def test_occupancy_follows_repositories(db_session, default_room, default_user):
+    room_occupancy.load(db_session)
+    other_room = create_room(db_session, "Room 2")
+    start_date, end_date = get_future_dates()
+    # two reservations sharing an hour
+    first_reservation = create_room_reservation(
+        db_session,
+        default_room,
+        default_user,
+        start_date,
+        start_date + timedelta(minutes=30),
+    )
+    create_room_reservation(
+        db_session,
+        default_room,
+        default_user,
+        start_date + timedelta(minutes=30),
+        end_date,
+    )
+    assert [other_room.id] == [
+        room.id
+        for room in get_all_rooms_without_reservations_between_dates(
+            db_session, start_date, end_date
+        )
+    ]
+    # the changes of this process keep the bitmaps current
+    assert room_occupancy.is_current(db_session)
+
+    delete_room_reservation(db_session, first_reservation)
+    assert {default_room.id} == room_occupancy.find_occupied_room_ids(
+        start_date, end_date
+    )
+
+
+def test_check_and_rebuild(db_session, default_room, default_user):
+    start_date, end_date = get_future_dates()
+    room_occupancy.load(db_session)
+
+    # reservation added without the repositories
+    db_session.add(
+        RoomReservation(
+            room_id=default_room.id,
+            user_id=default_user.id,
+            start_date=start_date,
+            end_date=end_date,
+        )
+    )
+    db_session.commit()
+
+    assert [(default_room.id, start_date.date())] == room_occupancy.check(db_session)
+
+    room_occupancy.rebuild(db_session)
+    assert [] == room_occupancy.check(db_session)
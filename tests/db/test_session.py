@@ -0,0 +1,240 @@
+import asyncio
+import shutil
+from datetime import datetime, timedelta
+
+import pytest
+from db import Base
+from db.models.rooms import Room
+from db.models.users import User
+from db.repositories.aio.room_reservations import reserve_room
+from db.pool import get_pool_args
+from db.recent_writers import RecentWriters
+from db.repositories.room_reservations import create_room_reservation
+from db.reservation_index import RoomReservationIndex
+from db.room_catalog import RoomCatalog
+from db.room_occupancy import RoomOccupancy
+from db.session import (
+    SQLITE_TUNED_PROFILE,
+    create_async_engines,
+    create_async_sessionmaker,
+    create_replica_engines,
+    ensure_loaded_once,
+    get_async_url,
+    get_connect_args,
+    get_read_only_url,
+    get_sqlite_pragmas,
+)
+from metrics import render_metrics
+from sqlalchemy import create_engine, select, text
+from sqlalchemy.exc import OperationalError, TimeoutError
+from sqlalchemy.orm import Session
+
+
+def test_get_read_only_url():
+    url = get_read_only_url("sqlite+aiosqlite:////tmp/test.db")
+
+    assert "file:/tmp/test.db" == url.database
+    assert {"mode": "ro", "uri": "true"} == url.query
+
+
+def test_get_async_url():
+    assert "sqlite+aiosqlite" == get_async_url("sqlite:///test.db").drivername
+    assert "postgresql+asyncpg" == get_async_url("postgresql://db/test").drivername
+    assert "sqlite+aiosqlite" == get_async_url("sqlite+aiosqlite:///").drivername
+    with pytest.raises(ValueError, match="No async driver known for mysql"):
+        get_async_url("mysql://db/test")
+
+
+def test_ensure_loaded_once(tmp_path):
+    url = f"sqlite:///{tmp_path / 'test.db'}"
+    engine = create_engine(url, connect_args=get_connect_args(url))
+    Base.metadata.create_all(engine)
+    engine.dispose()
+    session_maker = create_async_sessionmaker(*create_async_engines(url, "test_once"))
+    catalog = RoomCatalog()
+    loads = []
+    load = catalog.load
+    catalog.load = lambda db: loads.append(load(db))
+
+    async def get_rooms():
+        async with session_maker() as db:
+            await ensure_loaded_once(db, catalog.ensure_loaded)
+        return catalog.current.rooms
+
+    async def run():
+        return await asyncio.gather(*[get_rooms() for _ in range(10)])
+
+    assert [[]] * 10 == asyncio.run(run())
+    assert 1 == len(loads)
+
+
+def test_read_write_split(tmp_path):
+    url = f"sqlite:///{tmp_path / 'test.db'}"
+    engine = create_engine(url, connect_args=get_connect_args(url))
+    Base.metadata.create_all(engine)
+    engine.dispose()
+    writer, reader = create_async_engines(url, "test_split", SQLITE_TUNED_PROFILE)
+    session_maker = create_async_sessionmaker(writer, reader)
+    start_date = datetime(2030, 1, 1, 8)
+
+    async def run():
+        async with writer.connect() as connection:
+            result = await connection.execute(text("PRAGMA journal_mode"))
+            assert "wal" == result.scalar()
+        async with reader.connect() as connection:
+            with pytest.raises(OperationalError, match="readonly"):
+                await connection.execute(text("INSERT INTO room (name) VALUES ('x')"))
+
+        async with session_maker() as db:
+            assert [] == (await db.scalars(select(Room))).all()
+            assert not db.sync_session.writing
+            room = Room(name="Room 1")
+            user = User(email="test@test.com", hashed_password="-")
+            db.add_all([room, user])
+            await db.flush()
+            # the reads of the transaction which has written see its changes
+            assert db.sync_session.writing
+            assert [room] == (await db.scalars(select(Room))).all()
+            await db.commit()
+            assert not db.sync_session.writing
+
+            # the room is locked and checked on the writer
+            reservation = await reserve_room(
+                db, room, user, start_date, start_date + timedelta(hours=1)
+            )
+            assert not db.sync_session.writing
+            assert room.id == reservation.room_id
+
+        async with session_maker() as db:
+            # committed changes are seen by the reader
+            assert ["Room 1"] == (await db.scalars(select(Room.name))).all()
+            assert not db.sync_session.writing
+
+        await writer.dispose()
+        await reader.dispose()
+
+    asyncio.run(run())
+
+
+def test_pool_metrics(tmp_path):
+    url = f"sqlite:///{tmp_path / 'test.db'}"
+    engine = create_engine(
+        url,
+        connect_args=get_connect_args(url),
+        **get_pool_args(
+            url, "test_metrics", pool_size=1, max_overflow=1, pool_timeout=0.1
+        ),
+    )
+    metrics = engine.pool.metrics
+
+    with Session(engine) as db:
+        # no connection until the first query
+        assert 0 == metrics.checked_out.value
+        assert 0 == metrics.checkout_wait.count
+        db.execute(text("SELECT 1"))
+        assert 1 == metrics.checked_out.value
+        assert 1 == metrics.checkout_wait.count
+    assert 0 == metrics.checked_out.value
+
+    with engine.connect(), engine.connect():
+        assert 2 == metrics.checked_out.value
+        assert 1 == metrics.overflows.value
+        with pytest.raises(TimeoutError):
+            engine.connect()
+        assert 1 == metrics.timeouts.value
+    assert 4 == metrics.checkout_wait.count
+
+    # the pool recreated by dispose is instrumented too
+    engine.dispose()
+    with engine.connect():
+        assert 1 == metrics.checked_out.value
+    assert "db_test_metrics_pool_checkout_wait_seconds_count 5" in render_metrics()
+
+
+def test_recent_writers():
+    writers = RecentWriters(max_lag=60)
+    assert not writers.lagging()
+    writers.add(1)
+    writers.add(None)
+    assert 1 in writers
+    assert 2 not in writers
+    assert writers.lagging()
+
+    writers.max_lag = 0
+    assert 1 not in writers
+    assert not writers.lagging()
+    # the expired writers are dropped by the next write
+    assert 1 == len(writers)
+    writers.add(2)
+    assert 0 == len(writers)
+
+
+def test_caches_load_from_writer(tmp_path):
+    url = f"sqlite:///{tmp_path / 'test.db'}"
+    engine = create_engine(url, connect_args=get_connect_args(url))
+    Base.metadata.create_all(engine)
+    # the replica is a copy of the empty database which never catches up
+    shutil.copy(tmp_path / "test.db", tmp_path / "replica.db")
+    start_date = datetime.now().replace(microsecond=0) + timedelta(days=1)
+    with Session(engine) as db:
+        room = Room(name="Room 1")
+        user = User(email="test@test.com", hashed_password="-")
+        db.add_all([room, user])
+        db.commit()
+        create_room_reservation(
+            db, room, user, start_date, start_date + timedelta(hours=1)
+        )
+    engine.dispose()
+    writer, _ = create_async_engines(url, "test_caches")
+    replicas = create_replica_engines(
+        [f"sqlite:///{tmp_path / 'replica.db'}"], "test_caches_replica"
+    )
+    session_maker = create_async_sessionmaker(writer, replicas=replicas)
+    index = RoomReservationIndex()
+    occupancy = RoomOccupancy()
+    catalog = RoomCatalog()
+
+    async def run():
+        async with session_maker() as db:
+            assert [] == (await db.scalars(select(Room))).all()
+            await db.run_sync(index.load)
+            await db.run_sync(occupancy.load)
+            await db.run_sync(catalog.load)
+            assert ([], []) == await db.run_sync(index.check)
+            assert [] == await db.run_sync(occupancy.check)
+            # the reads outside of the loads still go to the replica
+            assert [] == (await db.scalars(select(Room))).all()
+
+        await writer.dispose()
+        for replica in replicas:
+            await replica.dispose()
+
+    asyncio.run(run())
+    assert 1 == len(
+        index.find_overlapping(1, start_date, start_date + timedelta(hours=1))
+    )
+    assert {1} == occupancy.find_occupied_room_ids(
+        start_date.replace(minute=0, second=0),
+        start_date.replace(minute=0, second=0) + timedelta(hours=2),
+    )
+    assert ["Room 1"] == [room.name for room in catalog.current.rooms]
+
+
+def test_sqlite_profile_opt_in(tmp_path):
+    # the settings leave the journal mode of the file as is
+    url = f"sqlite:///{tmp_path / 'test.db'}"
+    writer, reader = create_async_engines(url, "test_profile")
+    assert reader is None
+
+    async def run():
+        async with writer.connect() as connection:
+            result = await connection.execute(text("PRAGMA journal_mode"))
+            assert "delete" == result.scalar()
+        await writer.dispose()
+
+    asyncio.run(run())
+    assert [] == get_sqlite_pragmas()
+    assert "journal_mode=wal" in get_sqlite_pragmas(profile=SQLITE_TUNED_PROFILE)
+    assert "journal_mode=wal" not in get_sqlite_pragmas(
+        read_only=True, profile=SQLITE_TUNED_PROFILE
+    )
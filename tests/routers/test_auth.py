@@ -1,3 +1,5 @@
+from auth_helpers import password_hashing_pool
+from routers.auth import PASSWORD_HASHING_POOL_FULL_ERROR
 from tests.conftest import TEST_EMAIL, TEST_PASSWORD
 
 
@@ -23,3 +25,20 @@ def test_login_user_not_found(client):
         },
     )
     assert 401 == response.status_code
+
+
+def test_login_password_hashing_pool_full(client, default_user, monkeypatch):
+    monkeypatch.setattr(
+        password_hashing_pool, "queue_limit", -password_hashing_pool.size
+    )
+    response = client.post(
+        "/api/auth",
+        json={"email": TEST_EMAIL, "password": TEST_PASSWORD},
+        headers={
+            "Content-Type": "application/json",
+            "Accept": "application/json",
+        },
+    )
+    assert 503 == response.status_code
+    assert PASSWORD_HASHING_POOL_FULL_ERROR == response.json()["detail"]
+    assert "Retry-After" in response.headers
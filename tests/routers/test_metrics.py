@@ -0,0 +1,11 @@
+def test_get_metrics(client, default_user_token):
+    client.get(
+        "/rooms/",
+        headers={"Authorization": f"Bearer {default_user_token.access_token}"},
+    )
+
+    response = client.get("/metrics")
+    assert 200 == response.status_code
+    assert response.headers["content-type"].startswith("text/plain")
+    assert "# TYPE authenticated_users_cache_hits_total counter" in response.text
+    assert "authenticated_users_cache_misses_total " in response.text
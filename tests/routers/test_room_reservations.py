@@ -1,6 +1,20 @@
-from datetime import datetime, timedelta
+from datetime import datetime, timedelta, timezone
 
-from db.repositories.room_reservations import create_room_reservation
+import pytest
+from fastapi import status
+from starlette.websockets import WebSocketDisconnect
+
+
+from db.models.room_reservation_rules import RoomReservationRule
+from db.repositories.room_reservations import (
+    create_room_reservation,
+    reserve_room_with_rule,
+)
+from reservation_feed import reservation_feed
+from routers.room_reservations import (
+    RULE_NOT_ALLOWED_ERROR,
+    RULE_OCCURRENCE_NOT_FOUND_ERROR,
+)
 from tests.conftest import create_test_user
 
 
@@ -59,3 +73,252 @@ def test_delete_reservation_not_creator(
     assert 400 == response.status_code
     response_json = response.json()
     assert "You are not allowed to delete this reservation" == response_json["detail"]
+
+
+def test_check_reservation_index(
+    db_session, client, default_user, default_room, admin_user_token
+):
+    start_date = datetime.now() + timedelta(days=1)
+    end_date = start_date + timedelta(hours=1)
+    create_room_reservation(
+        db_session, default_room, default_user, start_date, end_date
+    )
+
+    response = client.get(
+        "/room-reservations/index/check",
+        headers={
+            "Content-Type": "application/json",
+            "Accept": "application/json",
+            "Authorization": f"Bearer {admin_user_token.access_token}",
+        },
+    )
+    assert 200 == response.status_code
+    response_json = response.json()
+    assert response_json["consistent"]
+    assert [] == response_json["missing_reservation_ids"]
+    assert [] == response_json["stale_reservation_ids"]
+
+
+def test_rebuild_reservation_index(client, admin_user_token):
+    response = client.post(
+        "/room-reservations/index/rebuild",
+        headers={
+            "Content-Type": "application/json",
+            "Accept": "application/json",
+            "Authorization": f"Bearer {admin_user_token.access_token}",
+        },
+    )
+    assert 200 == response.status_code
+    assert "Reservation index rebuilt" == response.json()["message"]
+
+
+def test_reservation_index_not_admin(client, default_user_token):
+    headers = {"Authorization": f"Bearer {default_user_token.access_token}"}
+    response = client.get("/room-reservations/index/check", headers=headers)
+    assert 403 == response.status_code
+    assert "Admin rights required" == response.json()["detail"]
+    response = client.post("/room-reservations/index/rebuild", headers=headers)
+    assert 403 == response.status_code
+
+
+def test_archive_reservations(
+    client, db_session, default_user, default_user_token, default_room, admin_user_token
+):
+    headers = {"Authorization": f"Bearer {default_user_token.access_token}"}
+    start_date = datetime(2021, 1, 1, 8, tzinfo=timezone.utc)
+    for day in (0, 1, 3650):
+        create_room_reservation(
+            db_session,
+            default_room,
+            default_user,
+            start_date + timedelta(days=day),
+            start_date + timedelta(days=day, hours=1),
+        )
+    response = client.get(
+        "/users/my-reservations", headers=headers, params={"limit": 3}
+    )
+    reservations = response.json()["reservations"]
+
+    response = client.post("/room-reservations/archive", headers=headers)
+    assert 403 == response.status_code
+    response = client.post(
+        "/room-reservations/archive",
+        headers={"Authorization": f"Bearer {admin_user_token.access_token}"},
+    )
+    assert 200 == response.status_code
+    assert 2 == response.json()["archived"]
+
+    # the archived reservations are still listed
+    response = client.get(
+        "/users/my-reservations", headers=headers, params={"limit": 2, "page": 1}
+    )
+    assert 3 == response.json()["total"]
+    assert reservations[2:] == response.json()["reservations"]
+    response = client.get(
+        "/rooms/all-rooms-reservations",
+        headers=headers,
+        params={
+            "start_date": start_date.isoformat(),
+            "end_date": (start_date + timedelta(days=1)).isoformat(),
+        },
+    )
+    assert [reservations[2]["id"]] == [
+        reservation["id"] for reservation in response.json()[0]["reservations"]
+    ]
+
+
+def create_weekly_rule(db_session, default_room, default_user) -> RoomReservationRule:
+    start_date = (datetime.now() + timedelta(days=1)).replace(
+        minute=0, second=0, microsecond=0
+    )
+    return reserve_room_with_rule(
+        db_session,
+        default_room,
+        default_user,
+        start_date,
+        start_date + timedelta(hours=1),
+        "weekly",
+        1,
+        None,
+    )
+
+
+def test_create_reservation_rule_exception(
+    db_session, client, default_user, default_user_token, default_room
+):
+    rule = create_weekly_rule(db_session, default_room, default_user)
+    headers = {"Authorization": f"Bearer {default_user_token.access_token}"}
+    occurrence_start_date = rule.start_date + timedelta(weeks=2)
+
+    response = client.post(
+        f"/room-reservations/rules/{rule.id}/exceptions",
+        headers=headers,
+        json={"start_date": (occurrence_start_date + timedelta(hours=1)).isoformat()},
+    )
+    assert 400 == response.status_code
+    assert RULE_OCCURRENCE_NOT_FOUND_ERROR == response.json()["detail"]
+
+    response = client.post(
+        f"/room-reservations/rules/{rule.id}/exceptions",
+        headers=headers,
+        json={"start_date": occurrence_start_date.isoformat()},
+    )
+    assert 201 == response.status_code
+    assert [occurrence_start_date] == [
+        datetime.fromisoformat(exception).replace(tzinfo=None)
+        for exception in response.json()["exceptions"]
+    ]
+
+    # the cancelled occurrence can be reserved
+    response = client.get(
+        "/rooms/availables",
+        params={
+            "start_date": occurrence_start_date.isoformat(),
+            "end_date": (occurrence_start_date + timedelta(hours=1)).isoformat(),
+        },
+        headers=headers,
+    )
+    assert [default_room.id] == [room["id"] for room in response.json()]
+
+
+def test_delete_reservation_rule(
+    db_session, client, default_user, default_user_token, default_room
+):
+    rule = create_weekly_rule(db_session, default_room, default_user)
+    _, other_user_token = create_test_user("email@email.fr", "pass", db_session)
+
+    response = client.delete(
+        f"/room-reservations/rules/{rule.id}",
+        headers={"Authorization": f"Bearer {other_user_token.access_token}"},
+    )
+    assert 400 == response.status_code
+    assert RULE_NOT_ALLOWED_ERROR == response.json()["detail"]
+
+    response = client.delete(
+        f"/room-reservations/rules/{rule.id}",
+        headers={"Authorization": f"Bearer {default_user_token.access_token}"},
+    )
+    assert 200 == response.status_code
+    assert 0 == db_session.query(RoomReservationRule).count()
+
+
+def test_check_and_rebuild_room_occupancy(
+    db_session, client, default_user, default_room, admin_user_token
+):
+    headers = {"Authorization": f"Bearer {admin_user_token.access_token}"}
+    start_date = (datetime.now() + timedelta(days=1)).replace(
+        minute=0, second=0, microsecond=0
+    )
+    create_room_reservation(
+        db_session,
+        default_room,
+        default_user,
+        start_date,
+        start_date + timedelta(hours=1),
+    )
+
+    response = client.get("/room-reservations/occupancy/check", headers=headers)
+    assert 200 == response.status_code
+    assert {"consistent": True, "mismatched_days": []} == response.json()
+
+    response = client.post("/room-reservations/occupancy/rebuild", headers=headers)
+    assert 200 == response.status_code
+    assert "Room occupancy rebuilt" == response.json()["message"]
+
+
+def test_room_occupancy_not_admin(client, default_user_token):
+    headers = {"Authorization": f"Bearer {default_user_token.access_token}"}
+    response = client.get("/room-reservations/occupancy/check", headers=headers)
+    assert 403 == response.status_code
+    response = client.post("/room-reservations/occupancy/rebuild", headers=headers)
+    assert 403 == response.status_code
+
+
+def test_reservation_events_feed(
+    db_session, client, default_user, default_user_token, default_room
+):
+    headers = {"Authorization": f"Bearer {default_user_token.access_token}"}
+    start_date = (datetime.now(timezone.utc) + timedelta(days=1)).replace(
+        minute=0, second=0, microsecond=0
+    )
+    end_date = start_date + timedelta(hours=1)
+    token = default_user_token.access_token
+
+    with client.websocket_connect(
+        f"/room-reservations/feed?token={token}&room_ids={default_room.id}"
+    ) as websocket:
+        response = client.post(
+            f"/rooms/{default_room.id}/create-reservation",
+            headers=headers,
+            json={
+                "start_date": start_date.isoformat(),
+                "end_date": end_date.isoformat(),
+            },
+        )
+        assert 201 == response.status_code
+        reservation_id = response.json()["id"]
+        assert {
+            "type": "created",
+            "reservation_id": reservation_id,
+            "room_id": default_room.id,
+            "user_id": default_user.id,
+            "start_date": start_date.isoformat().replace("+00:00", "Z"),
+            "end_date": end_date.isoformat().replace("+00:00", "Z"),
+        } == websocket.receive_json()
+
+        response = client.delete(
+            f"/room-reservations/{reservation_id}", headers=headers
+        )
+        assert 200 == response.status_code
+        event = websocket.receive_json()
+        assert "deleted" == event["type"]
+        assert reservation_id == event["reservation_id"]
+
+    assert 0 == len(reservation_feed)
+
+
+def test_reservation_events_feed_without_auth(client):
+    with pytest.raises(WebSocketDisconnect) as error:
+        with client.websocket_connect("/room-reservations/feed?token=invalid"):
+            pass
+    assert status.WS_1008_POLICY_VIOLATION == error.value.code
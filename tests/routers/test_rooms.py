@@ -1,11 +1,44 @@
+import asyncio
+import json
+import shutil
+import time
 from datetime import datetime, timedelta, timezone
 
-from db.repositories.room_reservations import create_room_reservation
+import httpx
+import pytest
+
+from db.availability_cache import availability_cache
+from db.repositories.room_reservations import (
+    create_room_reservation,
+    reserve_room_with_rule,
+)
+from db.repositories.rooms import create_room
+from db.models.room_reservations import RoomReservation
+from db.models.rooms import Room
+from db.recent_writers import recent_writers
+from db.reservation_index import reservation_index
+from db.room_catalog import room_catalog
+from db.session import (
+    create_async_sessionmaker,
+    create_replica_engines,
+    get_async_db,
+    get_async_sessionmaker,
+)
+from http_helpers import LAST_WRITE_COOKIE, get_last_write
+from reservation_group_commit import reservation_group_commit
 from routers.rooms import (
+    BULK_RESERVATION_CONFLICT_ERROR,
+    ROOM_NOT_FOUND_ERROR,
     ROOM_RESERVATION_CREATION_ALREADY_RESERVED_ERROR,
     ROOM_RESERVATION_CREATION_DATES_NOT_AWARE_ERROR,
+    ROOM_RESERVATION_CREATION_FAILED_ERROR,
     ROOM_RESERVATION_CREATION_INVALID_DATES_ERROR,
+    ROOM_RESERVATION_RULE_INVALID_DURATION_ERROR,
+    ROOM_RESERVATION_RULE_INVALID_UNTIL_ERROR,
 )
+from sqlalchemy import delete, event
+from starlette.requests import Request
+from tests.conftest import TEST_DB_PATH, async_engine, create_test_user
 
 
 def test_get_all(default_room, default_user_token, client):
@@ -25,6 +58,48 @@ def test_get_all(default_room, default_user_token, client):
     assert default_room.name == room["name"]
 
 
+def test_get_all_not_modified(db_session, default_room, default_user_token, client):
+    headers = {"Authorization": f"Bearer {default_user_token.access_token}"}
+    response = client.get("/rooms/", headers=headers)
+    assert 200 == response.status_code
+    etag = response.headers["etag"]
+
+    response = client.get("/rooms/", headers={**headers, "If-None-Match": etag})
+    assert 304 == response.status_code
+    assert etag == response.headers["etag"]
+    assert b"" == response.content
+
+    # the catalog is refreshed by create_room
+    create_room(db_session, name="Room 2")
+    response = client.get("/rooms/", headers={**headers, "If-None-Match": etag})
+    assert 200 == response.status_code
+    assert etag != response.headers["etag"]
+    assert ["Room 1", "Room 2"] == [room["name"] for room in response.json()]
+
+
+def test_get_all_room_created_by_other_process(
+    db_session, default_room, default_user_token, client
+):
+    headers = {"Authorization": f"Bearer {default_user_token.access_token}"}
+    etag = client.get("/rooms/", headers=headers).headers["etag"]
+    # a room inserted without this catalog knowing it
+    db_session.add(Room(name="Room 2"))
+    db_session.commit()
+    response = client.get("/rooms/", headers={**headers, "If-None-Match": etag})
+    assert 304 == response.status_code
+
+    # until the catalog expires
+    room_catalog.loaded_at -= room_catalog.ttl + 1
+    response = client.get("/rooms/", headers={**headers, "If-None-Match": etag})
+    assert 200 == response.status_code
+    assert ["Room 1", "Room 2"] == [room["name"] for room in response.json()]
+    etag = response.headers["etag"]
+    # reloaded without change, the etag stays the same
+    room_catalog.loaded_at -= room_catalog.ttl + 1
+    response = client.get("/rooms/", headers={**headers, "If-None-Match": etag})
+    assert 304 == response.status_code
+
+
 # Create reservation :
 
 
@@ -146,11 +221,285 @@ def test_create_reservation_already_reserved(
     )
     assert 400 == response.status_code
     assert (
-        f"{ROOM_RESERVATION_CREATION_ALREADY_RESERVED_ERROR}{start_date.hour}:00"
+        f"{ROOM_RESERVATION_CREATION_ALREADY_RESERVED_ERROR}"
+        f"{start_date.isoformat()} - {end_date.isoformat()}"
         == response.json()["detail"]
     )
 
 
+def test_create_reservation_concurrently(
+    default_room, default_user_token, client, db_session
+):
+    start_date, end_date = get_start_and_end_date()
+    headers = {"Authorization": f"Bearer {default_user_token.access_token}"}
+    # overlapping reservations of 1 to 3 hours
+    end_dates = [end_date + timedelta(hours=i % 3) for i in range(100)]
+
+    async def create_reservations() -> list[int]:
+        async with httpx.AsyncClient(
+            transport=httpx.ASGITransport(app=client.app), base_url="http://test"
+        ) as http_client:
+            responses = await asyncio.gather(
+                *[
+                    http_client.post(
+                        f"/rooms/{default_room.id}/create-reservation",
+                        headers=headers,
+                        json={
+                            "start_date": start_date.isoformat(),
+                            "end_date": end_date.isoformat(),
+                        },
+                    )
+                    for end_date in end_dates
+                ]
+            )
+        return [response.status_code for response in responses]
+
+    status_codes = asyncio.run(create_reservations())
+    assert 1 == status_codes.count(201)
+    assert 99 == status_codes.count(400)
+    assert 1 == len(default_room.reservations)
+
+
+def test_create_reservation_group_commit(
+    db_session, default_room, default_user, default_user_token, client, monkeypatch
+):
+    monkeypatch.setattr(reservation_group_commit, "enabled", True)
+    # the group is committed when it's full
+    monkeypatch.setattr(reservation_group_commit, "window", 10)
+    monkeypatch.setattr(reservation_group_commit, "max_size", 15)
+    other_room = create_room(db_session, name="Room 2")
+    start_date, end_date = get_start_and_end_date()
+    headers = {"Authorization": f"Bearer {default_user_token.access_token}"}
+    # 10 overlapping reservations of the default room and 5 free slots of the other
+    requests = [(default_room.id, timedelta(0)) for _ in range(10)] + [
+        (other_room.id, timedelta(days=i)) for i in range(5)
+    ]
+
+    async def create_reservations() -> list[httpx.Response]:
+        async with httpx.AsyncClient(
+            transport=httpx.ASGITransport(app=client.app), base_url="http://test"
+        ) as http_client:
+            return await asyncio.gather(
+                *[
+                    http_client.post(
+                        f"/rooms/{room_id}/create-reservation",
+                        headers=headers,
+                        json={
+                            "start_date": (start_date + delay).isoformat(),
+                            "end_date": (end_date + delay).isoformat(),
+                        },
+                    )
+                    for room_id, delay in requests
+                ]
+            )
+
+    group_count = reservation_group_commit.group_size.count
+    responses = asyncio.run(create_reservations())
+    assert group_count + 1 == reservation_group_commit.group_size.count
+    status_codes = [response.status_code for response in responses]
+    assert 1 == status_codes[:10].count(201)
+    assert [201] * 5 == status_codes[10:]
+    created = [response.json() for response in responses if response.status_code == 201]
+    assert {default_user.id} == {reservation["user"]["id"] for reservation in created}
+    assert [default_room.id] + [other_room.id] * 5 == [
+        reservation["room"]["id"] for reservation in created
+    ]
+    # the conflicts with the reservation of the same group are reported
+    conflict = next(response for response in responses if response.status_code == 400)
+    assert (
+        f"{ROOM_RESERVATION_CREATION_ALREADY_RESERVED_ERROR}"
+        f"{start_date.isoformat()} - {end_date.isoformat()}"
+        == conflict.json()["detail"]
+    )
+    db_session.expire_all()
+    assert 1 == len(default_room.reservations)
+    assert 5 == len(other_room.reservations)
+
+
+@pytest.mark.parametrize("group_commit", [False, True])
+def test_create_reservation_read_replica(
+    db_session,
+    default_room,
+    default_user,
+    default_user_token,
+    client,
+    tmp_path,
+    monkeypatch,
+    group_commit,
+):
+    monkeypatch.setattr(reservation_group_commit, "enabled", group_commit)
+    monkeypatch.setattr(reservation_group_commit, "window", 0.001)
+    other_user, other_token = create_test_user("other@test.com", "pass", db_session)
+    # the replica is a copy of the database which never catches up
+    replica_path = tmp_path / "replica.db"
+    shutil.copy(TEST_DB_PATH, replica_path)
+    replicas = create_replica_engines(
+        [f"sqlite:///{replica_path}"], f"test_replica_{group_commit}"
+    )
+    session_maker = create_async_sessionmaker(async_engine, replicas=replicas)
+
+    async def _get_db(request: Request):
+        async with session_maker(info={"last_write": get_last_write(request)}) as db:
+            yield db
+
+    client.app.dependency_overrides[get_async_db] = _get_db
+    client.app.dependency_overrides[get_async_sessionmaker] = lambda: session_maker
+    start_date, end_date = get_start_and_end_date()
+    params = {"start_date": start_date.isoformat(), "end_date": end_date.isoformat()}
+    response = client.post(
+        f"/rooms/{default_room.id}/create-reservation",
+        headers={"Authorization": f"Bearer {default_user_token.access_token}"},
+        json=params,
+    )
+    assert 201 == response.status_code
+
+    # the user who booked reads from the primary database
+    for headers in ({}, {"Accept": "application/x-ndjson"}):
+        response = client.get(
+            "/users/my-reservations",
+            headers={
+                **headers,
+                "Authorization": f"Bearer {default_user_token.access_token}",
+            },
+        )
+        assert 200 == response.status_code
+        assert 1 == response.text.count('"start_date"')
+    # the next request is handled by another worker, the client sends back the
+    # time of its write
+    recent_writers.clear()
+    client.cookies.set(LAST_WRITE_COOKIE, str(time.time()))
+    for headers in ({}, {"Accept": "application/x-ndjson"}):
+        response = client.get(
+            "/users/my-reservations",
+            headers={
+                **headers,
+                "Authorization": f"Bearer {default_user_token.access_token}",
+            },
+        )
+        assert 1 == response.text.count('"start_date"')
+    client.cookies.clear()
+    recent_writers.add(default_user.id)
+    response = client.get(
+        "/rooms/all-rooms-reservations",
+        params=params,
+        headers={"Authorization": f"Bearer {default_user_token.access_token}"},
+    )
+    assert 1 == len(response.json()[0]["reservations"])
+
+    # the other users read from the replica, the response isn't cached meanwhile
+    response = client.get(
+        "/rooms/all-rooms-reservations",
+        params=params,
+        headers={"Authorization": f"Bearer {other_token.access_token}"},
+    )
+    assert 200 == response.status_code
+    assert [] == response.json()[0]["reservations"]
+    assert "etag" not in response.headers
+
+
+def test_create_reservation_group_commit_failure(
+    default_room, default_user_token, client, monkeypatch
+):
+    monkeypatch.setattr(reservation_group_commit, "enabled", True)
+    monkeypatch.setattr(reservation_group_commit, "window", 0.001)
+
+    def session_maker(**kwargs):
+        raise ConnectionError("database unavailable")
+
+    client.app.dependency_overrides[get_async_sessionmaker] = lambda: session_maker
+    start_date, end_date = get_start_and_end_date()
+    response = client.post(
+        f"/rooms/{default_room.id}/create-reservation",
+        headers={"Authorization": f"Bearer {default_user_token.access_token}"},
+        json={"start_date": start_date.isoformat(), "end_date": end_date.isoformat()},
+    )
+    assert 503 == response.status_code
+    assert ROOM_RESERVATION_CREATION_FAILED_ERROR == response.json()["detail"]
+
+
+def test_create_reservation_already_reserved_confirmed_by_id(
+    db_session, default_user, default_room, default_user_token, client
+):
+    start_date, end_date = get_start_and_end_date()
+    create_room_reservation(
+        db_session,
+        default_room,
+        default_user,
+        start_date,
+        end_date + timedelta(hours=1),
+    )
+    # done at the application startup
+    reservation_index.load(db_session)
+    statements = []
+
+    def before_cursor_execute(conn, cursor, statement, *args):
+        statements.append(statement)
+
+    event.listen(
+        async_engine.sync_engine, "before_cursor_execute", before_cursor_execute
+    )
+    try:
+        response = client.post(
+            f"/rooms/{default_room.id}/create-reservation",
+            headers={
+                "Content-Type": "application/json",
+                "Accept": "application/json",
+                "Authorization": f"Bearer {default_user_token.access_token}",
+            },
+            json={
+                "start_date": start_date.isoformat(),
+                "end_date": end_date.isoformat(),
+            },
+        )
+    finally:
+        event.remove(
+            async_engine.sync_engine, "before_cursor_execute", before_cursor_execute
+        )
+
+    assert 400 == response.status_code
+    # only the ids found by the index are read, the room isn't locked
+    reservation_statements = [
+        statement for statement in statements if "room_reservation" in statement
+    ]
+    assert 1 == len(reservation_statements)
+    assert "start_date" not in reservation_statements[0].split("WHERE")[1]
+    assert not [statement for statement in statements if "UPDATE room" in statement]
+
+
+def test_create_reservation_deleted_by_other_process(
+    db_session, default_user, default_room, default_user_token, client
+):
+    start_date, end_date = get_start_and_end_date()
+    # done at the application startup
+    reservation_index.load(db_session)
+    reservation = create_room_reservation(
+        db_session, default_room, default_user, start_date, end_date
+    )
+    # deleted by another worker, the index of this one still has it
+    db_session.execute(
+        delete(RoomReservation).where(RoomReservation.id == reservation.id)
+    )
+    db_session.commit()
+
+    response = client.post(
+        f"/rooms/{default_room.id}/create-reservation",
+        headers={
+            "Content-Type": "application/json",
+            "Accept": "application/json",
+            "Authorization": f"Bearer {default_user_token.access_token}",
+        },
+        json={"start_date": start_date.isoformat(), "end_date": end_date.isoformat()},
+    )
+    assert 201 == response.status_code
+    assert [
+        (
+            start_date.replace(tzinfo=None),
+            end_date.replace(tzinfo=None),
+            response.json()["id"],
+        )
+    ] == reservation_index.find_overlapping(default_room.id, start_date, end_date)
+
+
 def test_get_all_rooms_reservations(
     default_room, default_user, default_user_token, default_reservation, client
 ):
@@ -178,6 +527,143 @@ def test_get_all_rooms_reservations(
     assert default_room.id == reservation["room"]["id"]
 
 
+def test_get_all_rooms_reservations_statements_count(
+    db_session, default_user, default_user_token, client
+):
+    start_date, _ = get_start_and_end_date()
+    params = {
+        "start_date": start_date.isoformat(),
+        "end_date": (start_date + timedelta(days=1)).isoformat(),
+    }
+    headers = {"Authorization": f"Bearer {default_user_token.access_token}"}
+    statements_counts = []
+
+    def before_cursor_execute(conn, cursor, statement, *args):
+        statements_counts[-1] += 1
+
+    for rooms_count in (1, 5):
+        for i in range(rooms_count):
+            room = create_room(db_session, name=f"Room {rooms_count}-{i}")
+            other_user, _ = create_test_user(
+                f"{rooms_count}-{i}@test.com", "pass", db_session
+            )
+            for hour, user in enumerate((default_user, other_user)):
+                create_room_reservation(
+                    db_session,
+                    room,
+                    user,
+                    start_date + timedelta(hours=hour),
+                    start_date + timedelta(hours=hour + 1),
+                )
+
+        # the authenticated user is cached by the first request
+        client.get("/rooms/all-rooms-reservations", params=params, headers=headers)
+        statements_counts.append(0)
+        event.listen(
+            async_engine.sync_engine, "before_cursor_execute", before_cursor_execute
+        )
+        try:
+            response = client.get(
+                "/rooms/all-rooms-reservations", params=params, headers=headers
+            )
+        finally:
+            event.remove(
+                async_engine.sync_engine, "before_cursor_execute", before_cursor_execute
+            )
+        assert 200 == response.status_code
+        rooms = response.json()
+        # 2 reservations by room
+        assert 2 * len(rooms) == sum(len(room["reservations"]) for room in rooms)
+
+    # revision, reservations, rules (with their exceptions if any), the rooms come
+    # from the catalog
+    assert [3, 3] == statements_counts
+
+
+def test_get_all_rooms_reservations_not_modified(
+    db_session, default_room, default_user, default_user_token, client
+):
+    start_date, end_date = get_start_and_end_date()
+    params = {"start_date": start_date.isoformat(), "end_date": end_date.isoformat()}
+    headers = {"Authorization": f"Bearer {default_user_token.access_token}"}
+    response = client.get(
+        "/rooms/all-rooms-reservations", params=params, headers=headers
+    )
+    assert 200 == response.status_code
+    etag = response.headers["etag"]
+    # not the same response for other dates or streamed
+    other_params = {**params, "end_date": (end_date + timedelta(hours=1)).isoformat()}
+    assert (
+        etag
+        != client.get(
+            "/rooms/all-rooms-reservations", params=other_params, headers=headers
+        ).headers["etag"]
+    )
+    assert (
+        etag
+        != client.get(
+            "/rooms/all-rooms-reservations",
+            params=params,
+            headers={**headers, "Accept": "application/x-ndjson"},
+        ).headers["etag"]
+    )
+
+    statements = []
+    connections = []
+
+    def before_cursor_execute(conn, cursor, statement, *args):
+        statements.append(statement)
+
+    def engine_connect(conn):
+        connections.append(conn)
+
+    event.listen(
+        async_engine.sync_engine, "before_cursor_execute", before_cursor_execute
+    )
+    event.listen(async_engine.sync_engine, "engine_connect", engine_connect)
+    try:
+        response = client.get(
+            "/rooms/all-rooms-reservations",
+            params=params,
+            headers={**headers, "If-None-Match": etag},
+        )
+    finally:
+        event.remove(
+            async_engine.sync_engine, "before_cursor_execute", before_cursor_execute
+        )
+        event.remove(async_engine.sync_engine, "engine_connect", engine_connect)
+    assert 304 == response.status_code
+    assert etag == response.headers["etag"]
+    # answered with the lookup of the revision, without querying the reservations
+    assert 1 == len(statements)
+    assert "reservation_revision" in statements[0]
+    assert 1 == len(connections)
+
+    # a new reservation (even in other dates) or room changes the etag
+    create_room_reservation(
+        db_session,
+        default_room,
+        default_user,
+        start_date + timedelta(days=1),
+        end_date + timedelta(days=1),
+    )
+    response = client.get(
+        "/rooms/all-rooms-reservations",
+        params=params,
+        headers={**headers, "If-None-Match": etag},
+    )
+    assert 200 == response.status_code
+    etag = response.headers["etag"]
+    create_room(db_session, name="Room 2")
+    response = client.get(
+        "/rooms/all-rooms-reservations",
+        params=params,
+        headers={**headers, "If-None-Match": etag},
+    )
+    assert 200 == response.status_code
+    assert 2 == len(response.json())
+
+
 def get_available_rooms(default_room, client):
     start_date, end_date = get_start_and_end_date()
     url = f"/rooms/available-rooms?start_date={start_date}&end_date={end_date}"
@@ -222,3 +708,376 @@ def get_available_rooms_not_authenticated(default_room, client):
         },
     )
     assert 401 == response.status_code
+
+
+def test_get_all_rooms_reservations_ndjson(
+    db_session,
+    default_room,
+    default_user,
+    default_user_token,
+    default_reservation,
+    client,
+):
+    other_room = create_room(db_session, name="Room 2")
+    rule = reserve_room_with_rule(
+        db_session,
+        other_room,
+        default_user,
+        default_reservation.start_date - timedelta(days=7),
+        default_reservation.end_date - timedelta(days=7),
+        "daily",
+        1,
+        None,
+    )
+    params = {
+        "start_date": default_reservation.start_date.isoformat(),
+        "end_date": default_reservation.end_date.isoformat(),
+    }
+    headers = {"Authorization": f"Bearer {default_user_token.access_token}"}
+
+    response = client.get(
+        "/rooms/all-rooms-reservations",
+        params=params,
+        headers={**headers, "Accept": "application/x-ndjson"},
+    )
+    assert 200 == response.status_code
+    assert response.headers["content-type"].startswith("application/x-ndjson")
+    lines = [json.loads(line) for line in response.text.splitlines()]
+    assert [default_room.id, other_room.id] == [line["id"] for line in lines]
+    assert [default_reservation.id] == [
+        reservation["id"] for reservation in lines[0]["reservations"]
+    ]
+    assert [] == lines[1]["reservations"]
+    # the occurrences of the rule are generated only between the dates
+    assert [] == lines[0]["occurrences"]
+    assert [rule.id] == [
+        occurrence["rule_id"] for occurrence in lines[1]["occurrences"]
+    ]
+
+    # same content as the JSON response
+    response = client.get(
+        "/rooms/all-rooms-reservations", params=params, headers=headers
+    )
+    assert response.json() == lines
+
+
+# Create reservations :
+
+
+def test_create_reservations(db_session, default_user_token, default_room, client):
+    other_room = create_room(db_session, "Room 2")
+    start_date, end_date = get_start_and_end_date()
+    reservations = [
+        {
+            "room_id": room.id,
+            "start_date": (start_date + timedelta(days=week * 7)).isoformat(),
+            "end_date": (end_date + timedelta(days=week * 7)).isoformat(),
+        }
+        for week in range(13)
+        for room in (default_room, other_room)
+    ]
+
+    response = client.post(
+        "/rooms/create-reservations",
+        headers={"Authorization": f"Bearer {default_user_token.access_token}"},
+        json={"reservations": reservations},
+    )
+    assert 200 == response.status_code
+    response_json = response.json()
+    assert 26 == response_json["created"]
+    assert {"created"} == {result["status"] for result in response_json["results"]}
+    reservation_ids = [result["reservation_id"] for result in response_json["results"]]
+    db_session.expire_all()
+    assert sorted(reservation_ids) == sorted(
+        reservation.id
+        for reservation in default_room.reservations + other_room.reservations
+    )
+    # the reservations are in the index
+    assert reservation_index.find_overlapping(default_room.id, start_date, end_date)
+
+
+def test_create_reservations_all_or_nothing(
+    db_session, default_user, default_user_token, default_room, client
+):
+    start_date, end_date = get_start_and_end_date()
+    create_room_reservation(
+        db_session,
+        default_room,
+        default_user,
+        start_date + timedelta(days=1),
+        end_date + timedelta(days=1),
+    )
+    reservations = [
+        {
+            "room_id": default_room.id,
+            "start_date": (start_date + timedelta(days=day)).isoformat(),
+            "end_date": (end_date + timedelta(days=day)).isoformat(),
+        }
+        for day in range(3)
+    ]
+
+    response = client.post(
+        "/rooms/create-reservations",
+        headers={"Authorization": f"Bearer {default_user_token.access_token}"},
+        json={"reservations": reservations},
+    )
+    assert 200 == response.status_code
+    response_json = response.json()
+    assert 0 == response_json["created"]
+    assert ["not_created", "conflict", "not_created"] == [
+        result["status"] for result in response_json["results"]
+    ]
+    assert response_json["results"][1]["detail"].startswith(
+        ROOM_RESERVATION_CREATION_ALREADY_RESERVED_ERROR
+    )
+    db_session.expire_all()
+    assert 1 == len(default_room.reservations)
+
+
+def test_create_reservations_best_effort(
+    db_session, default_user_token, default_room, client
+):
+    start_date, end_date = get_start_and_end_date()
+    reservations = [
+        {
+            "room_id": default_room.id,
+            "start_date": start_date.isoformat(),
+            "end_date": (end_date + timedelta(hours=1)).isoformat(),
+        },
+        # conflicts with the previous one
+        {
+            "room_id": default_room.id,
+            "start_date": end_date.isoformat(),
+            "end_date": (end_date + timedelta(hours=2)).isoformat(),
+        },
+        {
+            "room_id": default_room.id + 1,
+            "start_date": start_date.isoformat(),
+            "end_date": end_date.isoformat(),
+        },
+        {
+            "room_id": default_room.id,
+            "start_date": (start_date - timedelta(days=2)).isoformat(),
+            "end_date": (end_date - timedelta(days=2)).isoformat(),
+        },
+        {
+            "room_id": default_room.id,
+            "start_date": (start_date + timedelta(days=1)).isoformat(),
+            "end_date": (end_date + timedelta(days=1)).isoformat(),
+        },
+    ]
+
+    response = client.post(
+        "/rooms/create-reservations",
+        headers={"Authorization": f"Bearer {default_user_token.access_token}"},
+        json={"reservations": reservations, "all_or_nothing": False},
+    )
+    assert 200 == response.status_code
+    response_json = response.json()
+    assert 2 == response_json["created"]
+    results = response_json["results"]
+    assert ["created", "conflict", "invalid", "invalid", "created"] == [
+        result["status"] for result in results
+    ]
+    assert results[1]["detail"].endswith(f"{BULK_RESERVATION_CONFLICT_ERROR}0")
+    assert ROOM_NOT_FOUND_ERROR == results[2]["detail"]
+    assert ROOM_RESERVATION_CREATION_INVALID_DATES_ERROR == results[3]["detail"]
+    db_session.expire_all()
+    assert sorted(
+        [results[0]["reservation_id"], results[4]["reservation_id"]]
+    ) == sorted(reservation.id for reservation in default_room.reservations)
+
+
+# Reservation rules :
+
+
+def test_create_reservation_rule(
+    db_session, default_room, default_user, default_user_token, client
+):
+    start_date, end_date = get_start_and_end_date()
+    headers = {"Authorization": f"Bearer {default_user_token.access_token}"}
+    until = end_date + timedelta(weeks=9)
+
+    response = client.post(
+        f"/rooms/{default_room.id}/create-reservation-rule",
+        headers=headers,
+        json={
+            "start_date": start_date.isoformat(),
+            "end_date": end_date.isoformat(),
+            "frequency": "weekly",
+            "until": until.isoformat(),
+        },
+    )
+    assert 201 == response.status_code
+    response_json = response.json()
+    assert default_room.id == response_json["room"]["id"]
+    assert default_user.id == response_json["user"]["id"]
+    assert start_date == datetime.fromisoformat(response_json["start_date"])
+    assert until == datetime.fromisoformat(response_json["until"])
+    assert 1 == response_json["interval"]
+    assert [] == response_json["exceptions"]
+
+    # an occurrence of the rule
+    occurrence_start_date = start_date + timedelta(weeks=5)
+    occurrence_end_date = end_date + timedelta(weeks=5)
+    response = client.post(
+        f"/rooms/{default_room.id}/create-reservation",
+        headers=headers,
+        json={
+            "start_date": occurrence_start_date.isoformat(),
+            "end_date": (occurrence_end_date + timedelta(hours=1)).isoformat(),
+        },
+    )
+    assert 400 == response.status_code
+    assert (
+        ROOM_RESERVATION_CREATION_ALREADY_RESERVED_ERROR
+        + f"{occurrence_start_date.isoformat()} - {occurrence_end_date.isoformat()}"
+        == response.json()["detail"]
+    )
+
+    params = {
+        "start_date": occurrence_start_date.isoformat(),
+        "end_date": occurrence_end_date.isoformat(),
+    }
+    response = client.get("/rooms/availables", params=params, headers=headers)
+    assert 200 == response.status_code
+    assert [] == response.json()
+
+    response = client.get(
+        "/rooms/all-rooms-reservations", params=params, headers=headers
+    )
+    assert 200 == response.status_code
+    occurrences = response.json()[0]["occurrences"]
+    assert 1 == len(occurrences)
+    assert occurrence_start_date == datetime.fromisoformat(occurrences[0]["start_date"])
+    assert occurrence_end_date == datetime.fromisoformat(occurrences[0]["end_date"])
+    assert default_user.id == occurrences[0]["user"]["id"]
+
+    # after the end of the rule
+    params = {
+        "start_date": (start_date + timedelta(weeks=10)).isoformat(),
+        "end_date": (end_date + timedelta(weeks=10)).isoformat(),
+    }
+    response = client.get("/rooms/availables", params=params, headers=headers)
+    assert [default_room.id] == [room["id"] for room in response.json()]
+
+
+def test_create_reservation_rule_already_reserved(
+    db_session, default_room, default_user, default_user_token, client
+):
+    start_date, end_date = get_start_and_end_date()
+    headers = {"Authorization": f"Bearer {default_user_token.access_token}"}
+    reservation_start_date = start_date + timedelta(weeks=20)
+    reservation_end_date = end_date + timedelta(weeks=20)
+    create_room_reservation(
+        db_session,
+        default_room,
+        default_user,
+        reservation_start_date,
+        reservation_end_date,
+    )
+
+    response = client.post(
+        f"/rooms/{default_room.id}/create-reservation-rule",
+        headers=headers,
+        json={
+            "start_date": start_date.isoformat(),
+            "end_date": end_date.isoformat(),
+            "frequency": "daily",
+            "interval": 7,
+        },
+    )
+    assert 400 == response.status_code
+    assert (
+        ROOM_RESERVATION_CREATION_ALREADY_RESERVED_ERROR
+        + f"{reservation_start_date.isoformat()} - {reservation_end_date.isoformat()}"
+        == response.json()["detail"]
+    )
+
+
+def test_create_reservation_rule_invalid(default_room, default_user_token, client):
+    start_date, end_date = get_start_and_end_date()
+    headers = {"Authorization": f"Bearer {default_user_token.access_token}"}
+
+    # longer than a day
+    response = client.post(
+        f"/rooms/{default_room.id}/create-reservation-rule",
+        headers=headers,
+        json={
+            "start_date": start_date.isoformat(),
+            "end_date": (end_date + timedelta(days=1)).isoformat(),
+            "frequency": "daily",
+        },
+    )
+    assert 400 == response.status_code
+    assert ROOM_RESERVATION_RULE_INVALID_DURATION_ERROR == response.json()["detail"]
+
+    response = client.post(
+        f"/rooms/{default_room.id}/create-reservation-rule",
+        headers=headers,
+        json={
+            "start_date": start_date.isoformat(),
+            "end_date": end_date.isoformat(),
+            "frequency": "daily",
+            "until": start_date.isoformat(),
+        },
+    )
+    assert 400 == response.status_code
+    assert ROOM_RESERVATION_RULE_INVALID_UNTIL_ERROR == response.json()["detail"]
+
+
+def test_get_free_slots(db_session, default_room, default_user_token, client):
+    start_date, end_date = get_start_and_end_date()
+    headers = {"Authorization": f"Bearer {default_user_token.access_token}"}
+    client.post(
+        f"/rooms/{default_room.id}/create-reservation",
+        headers=headers,
+        json={"start_date": start_date.isoformat(), "end_date": end_date.isoformat()},
+    )
+
+    response = client.get(
+        "/rooms/free-slots",
+        headers=headers,
+        params={
+            # not on a whole hour
+            "start_date": (start_date - timedelta(minutes=30)).isoformat(),
+            "end_date": (end_date + timedelta(hours=3)).isoformat(),
+            "duration_hours": 2,
+            "limit": 5,
+            "room_ids": [default_room.id],
+        },
+    )
+    assert 200 == response.status_code
+    assert [
+        (end_date, end_date + timedelta(hours=2)),
+        (end_date + timedelta(hours=1), end_date + timedelta(hours=3)),
+    ] == [
+        (
+            datetime.fromisoformat(free_slot["start_date"]),
+            datetime.fromisoformat(free_slot["end_date"]),
+        )
+        for free_slot in response.json()
+    ]
+    assert {default_room.id} == {
+        free_slot["room"]["id"] for free_slot in response.json()
+    }
+
+
+def test_get_available_rooms_cache(default_room, default_user_token, client):
+    start_date, end_date = get_start_and_end_date()
+    headers = {"Authorization": f"Bearer {default_user_token.access_token}"}
+    params = {"start_date": start_date.isoformat(), "end_date": end_date.isoformat()}
+    hits = availability_cache.hits.value
+
+    for _ in range(3):
+        response = client.get("/rooms/availables", params=params, headers=headers)
+        assert [default_room.id] == [room["id"] for room in response.json()]
+    assert hits + 2 == availability_cache.hits.value
+
+    client.post(
+        f"/rooms/{default_room.id}/create-reservation",
+        headers=headers,
+        json={"start_date": start_date.isoformat(), "end_date": end_date.isoformat()},
+    )
+    response = client.get("/rooms/availables", params=params, headers=headers)
+    assert [] == response.json()
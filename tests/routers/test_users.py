@@ -1,4 +1,11 @@
-from datetime import datetime
+import json
+from datetime import datetime, timedelta, timezone
+
+from db.repositories.room_reservations import (
+    create_room_reservation,
+    delete_room_reservation,
+)
+from tests.conftest import create_test_user
 
 
 def test_get_my_reservations(client, default_user_token, default_reservation):
@@ -39,3 +46,121 @@ def test_get_my_reservations_without_auth(client):
     response_json = response.json()
     assert "detail" in response_json
     assert "Not authenticated" == response_json["detail"]
+
+
+def test_get_my_reservations_ndjson(client, default_user_token, default_reservation):
+    headers = {"Authorization": f"Bearer {default_user_token.access_token}"}
+    response = client.get(
+        "/users/my-reservations",
+        headers={**headers, "Accept": "application/x-ndjson"},
+    )
+    assert 200 == response.status_code
+    assert response.headers["content-type"].startswith("application/x-ndjson")
+    lines = [json.loads(line) for line in response.text.splitlines()]
+
+    # same reservations as the JSON response
+    response = client.get("/users/my-reservations", headers=headers)
+    assert response.json()["reservations"] == lines
+
+
+def test_get_my_reservations_not_modified(
+    client, db_session, default_user, default_user_token, default_room
+):
+    headers = {"Authorization": f"Bearer {default_user_token.access_token}"}
+    response = client.get("/users/my-reservations", headers=headers)
+    assert 200 == response.status_code
+    etag = response.headers["etag"]
+
+    response = client.get(
+        "/users/my-reservations", headers={**headers, "If-None-Match": etag}
+    )
+    assert 304 == response.status_code
+    assert etag == response.headers["etag"]
+
+    # the reservations of another user don't change the etag
+    other_user, _ = create_test_user("other@test.com", "password", db_session)
+    start_date = datetime(2030, 1, 1, 8, tzinfo=timezone.utc)
+    other_reservation = create_room_reservation(
+        db_session,
+        default_room,
+        other_user,
+        start_date,
+        start_date + timedelta(hours=1),
+    )
+    response = client.get(
+        "/users/my-reservations", headers={**headers, "If-None-Match": etag}
+    )
+    assert 304 == response.status_code
+
+    delete_room_reservation(db_session, other_reservation)
+    create_room_reservation(
+        db_session,
+        default_room,
+        default_user,
+        start_date,
+        start_date + timedelta(hours=1),
+    )
+    response = client.get(
+        "/users/my-reservations", headers={**headers, "If-None-Match": etag}
+    )
+    assert 200 == response.status_code
+    assert etag != response.headers["etag"]
+    assert 1 == response.json()["total"]
+
+
+def test_get_my_reservations_with_cursor(
+    client, db_session, default_user, default_user_token, default_room
+):
+    headers = {"Authorization": f"Bearer {default_user_token.access_token}"}
+    start_date = datetime(2030, 1, 1, 8, tzinfo=timezone.utc)
+    for day in range(5):
+        create_room_reservation(
+            db_session,
+            default_room,
+            default_user,
+            start_date + timedelta(days=day),
+            start_date + timedelta(days=day, hours=1),
+        )
+    response = client.get(
+        "/users/my-reservations", headers=headers, params={"limit": 5}
+    )
+    all_reservations = response.json()["reservations"]
+
+    response = client.get(
+        "/users/my-reservations", headers=headers, params={"limit": 2}
+    )
+    assert 200 == response.status_code
+    response_json = response.json()
+    reservations = response_json["reservations"]
+    assert 5 == response_json["total"]
+    next_cursor = response_json["next_cursor"]
+    while response_json["next_cursor"] is not None:
+        response = client.get(
+            "/users/my-reservations",
+            headers=headers,
+            params={"limit": 2, "cursor": response_json["next_cursor"]},
+        )
+        assert 200 == response.status_code
+        response_json = response.json()
+        assert response_json["page"] is None
+        # no count by default with a cursor
+        assert response_json["total"] is None
+        reservations += response_json["reservations"]
+
+    assert all_reservations == reservations
+    response = client.get(
+        "/users/my-reservations",
+        headers=headers,
+        params={"limit": 2, "cursor": next_cursor, "with_total": True},
+    )
+    assert 5 == response.json()["total"]
+
+
+def test_get_my_reservations_with_invalid_cursor(client, default_user_token):
+    response = client.get(
+        "/users/my-reservations",
+        headers={"Authorization": f"Bearer {default_user_token.access_token}"},
+        params={"cursor": "not a cursor"},
+    )
+    assert 400 == response.status_code
+    assert "Invalid cursor" == response.json()["detail"]
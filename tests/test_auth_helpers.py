@@ -0,0 +1,144 @@
+import asyncio
+
+import pytest
+from auth_helpers import (
+    PasswordHashingPool,
+    PasswordHashingPoolFull,
+    authenticated_users_cache,
+    encode_password,
+    get_current_user,
+    verify_password,
+)
+from db.models.users import User
+from sqlalchemy import event
+from tests.conftest import TEST_PASSWORD, AsyncSessionTesting, async_engine
+
+
+def get_rooms(client, token):
+    return client.get(
+        "/rooms/",
+        headers={
+            "Content-Type": "application/json",
+            "Accept": "application/json",
+            "Authorization": f"Bearer {token.access_token}",
+        },
+    )
+
+
+def test_get_current_user_is_cached(client, default_user, default_user_token):
+    statements = []
+
+    def before_cursor_execute(conn, cursor, statement, *args):
+        statements.append(statement)
+
+    assert 200 == get_rooms(client, default_user_token).status_code
+    hits = authenticated_users_cache.hits.value
+    event.listen(
+        async_engine.sync_engine, "before_cursor_execute", before_cursor_execute
+    )
+    try:
+        assert 200 == get_rooms(client, default_user_token).status_code
+    finally:
+        event.remove(
+            async_engine.sync_engine, "before_cursor_execute", before_cursor_execute
+        )
+
+    assert not [statement for statement in statements if "FROM user" in statement]
+    assert hits + 1 == authenticated_users_cache.hits.value
+
+
+def test_get_current_user_single_lookup(default_user, default_user_token):
+    statements = []
+
+    def before_cursor_execute(conn, cursor, statement, *args):
+        statements.append(statement)
+
+    async def get_user():
+        async with AsyncSessionTesting() as db:
+            return await get_current_user(default_user_token.access_token, db)
+
+    async def run():
+        return await asyncio.gather(*[get_user() for _ in range(10)])
+
+    event.listen(
+        async_engine.sync_engine, "before_cursor_execute", before_cursor_execute
+    )
+    try:
+        users = asyncio.run(run())
+    finally:
+        event.remove(
+            async_engine.sync_engine, "before_cursor_execute", before_cursor_execute
+        )
+
+    assert [default_user.id] * 10 == [user.id for user in users]
+    # the concurrent requests of a user missing from the cache share one lookup
+    assert 1 == len([statement for statement in statements if "FROM user" in statement])
+
+
+def test_get_current_user_cache_invalidated(
+    db_session, client, default_user, default_user_token
+):
+    assert 200 == get_rooms(client, default_user_token).status_code
+    assert default_user.id in authenticated_users_cache.keys()
+
+    user = db_session.get(User, default_user.id)
+    user.email = "new@test.com"
+    db_session.commit()
+
+    assert default_user.id not in authenticated_users_cache.keys()
+    # the token was created for the previous email
+    assert 401 == get_rooms(client, default_user_token).status_code
+
+
+def test_password_hashing_pool():
+    pool = PasswordHashingPool("thread", size=1, queue_limit=0, name="test_pool")
+
+    async def hash_and_verify():
+        hashed_password = await pool.run(encode_password, TEST_PASSWORD)
+        return await pool.run(verify_password, TEST_PASSWORD, hashed_password)
+
+    try:
+        assert asyncio.run(hash_and_verify())
+    finally:
+        pool.shutdown()
+    assert 2 == pool.duration.count
+
+
+def test_password_hashing_process_pool():
+    pool = PasswordHashingPool(
+        "process", size=1, queue_limit=0, name="test_process_pool", start_method="spawn"
+    )
+    pool.start()
+    try:
+        assert "spawn" == pool._executor._mp_context.get_start_method()
+        hashed_password = encode_password(TEST_PASSWORD)
+        assert asyncio.run(pool.run(verify_password, TEST_PASSWORD, hashed_password))
+    finally:
+        pool.shutdown()
+    assert 1 == pool.duration.count
+    assert 1 == pool.wait_time.count
+
+
+def test_password_hashing_pool_unknown_executor():
+    with pytest.raises(ValueError, match="Unknown password hashing executor 'fork'"):
+        PasswordHashingPool("fork", size=1, queue_limit=0, name="test_pool_unknown")
+
+
+def test_password_hashing_pool_full():
+    pool = PasswordHashingPool("thread", size=1, queue_limit=0, name="test_pool_full")
+
+    async def verify_twice():
+        hashed_password = encode_password(TEST_PASSWORD)
+        return await asyncio.gather(
+            pool.run(verify_password, TEST_PASSWORD, hashed_password),
+            pool.run(verify_password, TEST_PASSWORD, hashed_password),
+            return_exceptions=True,
+        )
+
+    try:
+        results = asyncio.run(verify_twice())
+    finally:
+        pool.shutdown()
+    assert results[0] is True
+    assert isinstance(results[1], PasswordHashingPoolFull)
+    assert 1 == pool.rejected.value
@@ -0,0 +1,25 @@
+import time
+
+from cache_helpers import TTLCache
+
+
+def test_ttl_cache_lru():
+    cache = TTLCache("test_lru", max_size=2, ttl=60)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    assert 1 == cache.get("a")
+    # "b" is the least recently used entry
+    cache.set("c", 3)
+    assert cache.get("b") is None
+    assert 1 == cache.get("a")
+    assert 3 == cache.get("c")
+    assert 3 == cache.hits.value
+    assert 1 == cache.misses.value
+
+
+def test_ttl_cache_expiration():
+    cache = TTLCache("test_expiration", max_size=2, ttl=60)
+    cache.set("a", 1, ttl=0.01)
+    time.sleep(0.02)
+    assert cache.get("a") is None
+    assert 0 == len(cache)
@@ -0,0 +1,64 @@
+import json
+from datetime import datetime, timedelta, timezone
+from types import SimpleNamespace
+
+from db.models.room_reservations import RoomReservation
+from db.models.rooms import Room
+from db.models.users import User
+from http_helpers import LAST_WRITE_COOKIE, dump_json, get_last_write, is_not_modified
+from schemas.room_reservations import RoomReservationDTO, dump_room_reservation_row
+from starlette.requests import Request
+
+
+def get_request(if_none_match: str | None, cookie: str | None = None) -> Request:
+    headers = []
+    if if_none_match is not None:
+        headers.append((b"if-none-match", if_none_match.encode()))
+    if cookie is not None:
+        headers.append((b"cookie", cookie.encode()))
+    return Request({"type": "http", "headers": headers})
+
+
+def test_is_not_modified():
+    assert not is_not_modified(get_request(None), '"1"')
+    assert is_not_modified(get_request('"1"'), '"1"')
+    assert not is_not_modified(get_request('"2"'), '"1"')
+    assert is_not_modified(get_request('"2", W/"1"'), '"1"')
+    assert is_not_modified(get_request("*"), '"1"')
+
+
+def test_get_last_write():
+    assert get_last_write(get_request(None)) is None
+    assert 12.5 == get_last_write(get_request(None, f"{LAST_WRITE_COOKIE}=12.5"))
+    assert get_last_write(get_request(None, f"{LAST_WRITE_COOKIE}=x")) is None
+
+
+def test_dump_json_same_as_response_models():
+    user = User(id=1, email="é@test.com")
+    room = Room(id=2, name="Room 2")
+    utc_date = datetime(2030, 1, 1, 8, 30, 15, 500, tzinfo=timezone.utc)
+    for start_date, end_date in (
+        # naive dates from the database, aware ones from a request
+        (datetime(2030, 1, 1, 8), datetime(2030, 1, 1, 9, 0, 0, 123456)),
+        (utc_date, utc_date.astimezone(timezone(timedelta(hours=2)))),
+    ):
+        reservation = RoomReservation(
+            id=3, user=user, room=room, start_date=start_date, end_date=end_date
+        )
+        # written like the JSONResponse of the response models
+        expected = json.dumps(
+            RoomReservationDTO.model_validate(reservation).model_dump(mode="json"),
+            ensure_ascii=False,
+            separators=(",", ":"),
+        ).encode()
+        # a row of select_reservation_rows
+        row = SimpleNamespace(
+            id=3,
+            user_id=user.id,
+            user_email=user.email,
+            room_id=room.id,
+            room_name=room.name,
+            start_date=start_date,
+            end_date=end_date,
+        )
+        assert expected == dump_json(dump_room_reservation_row(row))
@@ -0,0 +1,9 @@
+import pytest
+from metrics import Counter, Gauge, get_metric
+
+
+def test_duplicate_metric():
+    counter = Counter("test_duplicate_total", "Test counter")
+    with pytest.raises(ValueError, match="test_duplicate_total already registered"):
+        Gauge("test_duplicate_total", "Test gauge")
+    assert counter is get_metric("test_duplicate_total")
@@ -0,0 +1,64 @@
+import json
+from datetime import datetime, timedelta
+
+from reservation_feed import ReservationFeed
+from schemas.room_reservations import RoomReservationEvent
+
+
+def get_event(room_id: int, start_date: datetime) -> RoomReservationEvent:
+    return RoomReservationEvent(
+        type="created",
+        reservation_id=1,
+        room_id=room_id,
+        user_id=1,
+        start_date=start_date,
+        end_date=start_date + timedelta(hours=1),
+    )
+
+
+def get_messages(subscriber) -> list[dict]:
+    messages = []
+    while not subscriber.messages.empty():
+        messages.append(json.loads(subscriber.messages.get_nowait()))
+    return messages
+
+
+def test_reservation_feed_subscriptions():
+    feed = ReservationFeed(buffer_size=10, name="test_subscriptions")
+    start_date = datetime(2030, 1, 1, 8)
+    all_rooms = feed.subscribe()
+    rooms = feed.subscribe([1, 2])
+    day = feed.subscribe([1], start_date, start_date + timedelta(days=1))
+    assert 3 == len(feed)
+
+    feed.publish(get_event(1, start_date))
+    feed.publish(get_event(2, start_date))
+    feed.publish(get_event(1, start_date + timedelta(days=1)))
+    feed.publish(get_event(3, start_date))
+
+    assert [1, 2, 1, 3] == [message["room_id"] for message in get_messages(all_rooms)]
+    assert [1, 2, 1] == [message["room_id"] for message in get_messages(rooms)]
+    assert [start_date.isoformat() + "Z"] == [
+        message["start_date"] for message in get_messages(day)
+    ]
+
+    feed.unsubscribe(rooms)
+    feed.unsubscribe(day)
+    assert 1 == len(feed)
+    feed.publish(get_event(1, start_date))
+    assert [] == get_messages(rooms)
+
+
+def test_reservation_feed_overflow():
+    feed = ReservationFeed(buffer_size=2, name="test_overflow")
+    start_date = datetime(2030, 1, 1, 8)
+    subscriber = feed.subscribe()
+    for _ in range(3):
+        feed.publish(get_event(1, start_date))
+
+    # the pending events are replaced by a resync
+    assert [{"type": "resync"}] == [
+        {key: value for key, value in message.items() if value is not None}
+        for message in get_messages(subscriber)
+    ]
+    assert 1 == feed.resyncs.value
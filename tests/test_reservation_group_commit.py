@@ -0,0 +1,70 @@
+import asyncio
+import json
+from datetime import datetime, timedelta
+
+import pytest
+from db.models.room_reservations import RoomReservation
+from reservation_feed import reservation_feed
+from reservation_group_commit import (
+    ReservationGroupCommit,
+    ReservationGroupCommitError,
+)
+from tests.conftest import AsyncSessionTesting
+
+
+def test_group_commit_cancelled_request(db_session, default_room, default_user):
+    group_commit = ReservationGroupCommit(True, 0.01, 10, "test_cancelled")
+    subscriber = reservation_feed.subscribe()
+    start_date = datetime(2030, 1, 1, 8)
+    end_date = start_date + timedelta(hours=1)
+
+    async def run():
+        request = asyncio.create_task(
+            group_commit.reserve(
+                AsyncSessionTesting, default_room, default_user, start_date, end_date
+            )
+        )
+        await asyncio.sleep(0)
+        # the client is gone before the group is committed
+        request.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await request
+        await asyncio.sleep(0.01)
+        await asyncio.gather(*group_commit._tasks)
+
+    asyncio.run(run())
+
+    reservation = db_session.query(RoomReservation).one()
+    # the reservation is inserted and still published
+    event = json.loads(subscriber.messages.get_nowait())
+    assert ("created", reservation.id) == (event["type"], event["reservation_id"])
+
+
+def test_group_commit_failure(default_room, default_user):
+    group_commit = ReservationGroupCommit(True, 10, 2, "test_failure")
+    start_date = datetime(2030, 1, 1, 8)
+
+    def session_maker(**kwargs):
+        raise ConnectionError("database unavailable")
+
+    async def run():
+        return await asyncio.gather(
+            *[
+                group_commit.reserve(
+                    session_maker,
+                    default_room,
+                    default_user,
+                    start_date + timedelta(hours=hour),
+                    start_date + timedelta(hours=hour + 1),
+                )
+                for hour in range(2)
+            ],
+            return_exceptions=True,
+        )
+
+    errors = asyncio.run(run())
+    assert [ReservationGroupCommitError] * 2 == [type(error) for error in errors]
+    # each request gets its own exception, caused by the error of the group
+    assert errors[0] is not errors[1]
+    assert errors[0].__cause__ is errors[1].__cause__
+    assert isinstance(errors[0].__cause__, ConnectionError)